@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+基准测试 - 写入饱和时的并发读延迟 (default 与 wal 存储模式对比)
+
+用法: python benchmarks/bench_db_read_latency.py [--seconds 5] [--readers 4]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config.database import Database
+
+
+async def _seed(database: Database, groups: int, days: int):
+    """准备测试数据"""
+    for i in range(groups):
+        await database.create_forwarding_group(f'bench_{i}')
+    for day in range(days):
+        rows = [(g + 1, 'system', 10, 9, 1, f'2026-01-{day + 1:02d}') for g in range(groups)]
+        await database._connection.executemany(
+            'INSERT INTO statistics (group_id, account_phone, message_count, success_count, error_count, date) VALUES (?, ?, ?, ?, ?, ?)',
+            rows
+        )
+    await database._connection.commit()
+
+
+async def _writer(database: Database, stop: asyncio.Event, counter: list):
+    """持续写入消息记录（每条单独提交以占满写路径）"""
+    i = 0
+    while not stop.is_set():
+        await database.add_message_record(1, i, i, 100, 200, f'bench_{i}')
+        await database.update_statistics(1, 'system', True)
+        i += 1
+    counter.append(i)
+
+
+async def _reader(database: Database, stop: asyncio.Event, latencies: list, groups: int):
+    """并发执行仪表板查询并记录延迟"""
+    i = 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await database.get_group_statistics(i % groups + 1, 30)
+        await database.get_api_pool_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+        i += 1
+        await asyncio.sleep(0)
+
+
+async def run_mode(mode: str, seconds: float, readers: int, groups: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        database = Database(
+            str(Path(tmp) / 'bench.db'),
+            write_batch_size=1,
+            dedup_capacity=0,
+            storage_mode=mode,
+            read_pool_size=readers
+        )
+        await database.init()
+        await _seed(database, groups, 30)
+
+        stop = asyncio.Event()
+        latencies: list = []
+        written: list = []
+        tasks = [asyncio.create_task(_writer(database, stop, written))]
+        tasks += [asyncio.create_task(_reader(database, stop, latencies, groups)) for _ in range(readers)]
+
+        await asyncio.sleep(seconds)
+        stop.set()
+        await asyncio.gather(*tasks)
+        await database.close()
+
+    latencies.sort()
+    return {
+        'mode': mode,
+        'reads': len(latencies),
+        'writes': written[0] if written else 0,
+        'p50_ms': statistics.median(latencies) if latencies else 0,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] if latencies else 0
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--groups', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'mode':<8} {'reads':>8} {'writes':>8} {'p50(ms)':>10} {'p99(ms)':>10}")
+    for mode in ('default', 'wal'):
+        result = await run_mode(mode, args.seconds, args.readers, args.groups)
+        print(f"{result['mode']:<8} {result['reads']:>8} {result['writes']:>8} "
+              f"{result['p50_ms']:>10.2f} {result['p99_ms']:>10.2f}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
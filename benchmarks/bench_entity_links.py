@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+基准测试 - 删除链接: 正则查找与按消息实体偏移量裁剪对比
+
+生成带链接、@提及和表情符号（UTF-16 代理对）的长消息，并按 Telegram 的方式记录实体偏移量，
+校验两种方式结果一致后比较吞吐量。
+
+用法: python benchmarks/bench_entity_links.py [--messages 2000] [--length 4000]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.filters import MessageFilter
+
+TEXT_PIECES = [
+    '今天的新闻内容，', '这是一段正常的文本。', 'Hello world, ', '😀', '🚀🚀', '✅', '\n', '数字123456 ', '#标签 '
+]
+LINK_PIECES = [
+    ('MessageEntityUrl', 'https://example.com/path?a=1&b=2'),
+    ('MessageEntityUrl', 't.me/channel_name'),
+    ('MessageEntityUrl', 'https://t.me/joinchat/abc'),
+    ('MessageEntityMention', '@someone'),
+]
+
+# 与 Telethon 实体同名的轻量对象（只用到 offset / length）
+ENTITY_CLASSES = {
+    name: type(name, (), {'__init__': lambda self, offset, length: self.__dict__.update(offset=offset, length=length)})
+    for name in ('MessageEntityUrl', 'MessageEntityMention', 'MessageEntityBold')
+}
+
+
+def utf16_len(text: str) -> int:
+    return len(text.encode('utf-16-le')) // 2
+
+
+def make_message(length: int, rng: random.Random):
+    """生成一条消息及其实体（链接后跟空格，正则与实体删除的范围相同）"""
+    parts, entities, offset = [], [], 0
+    while offset < length:
+        if rng.random() < 0.15:
+            entity_type, piece = rng.choice(LINK_PIECES)
+            entities.append(ENTITY_CLASSES[entity_type](offset, utf16_len(piece)))
+            piece += ' '
+        else:
+            piece = rng.choice(TEXT_PIECES)
+            if rng.random() < 0.1:
+                entities.append(ENTITY_CLASSES['MessageEntityBold'](offset, utf16_len(piece)))
+        parts.append(piece)
+        offset += utf16_len(piece)
+    return ''.join(parts), entities
+
+
+def measure(func, items) -> float:
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+    return len(items) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--length', type=int, default=4000)
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    messages = [make_message(args.length, rng) for _ in range(args.messages)]
+    message_filter = MessageFilter(None)
+    plan = message_filter.compile_plan({'remove_links': True})
+
+    prepared = [(text, message_filter.link_spans_from_entities(entities)) for text, entities in messages]
+    for text, spans in prepared:
+        expected = message_filter.apply_plan(text, plan)
+        actual = message_filter.apply_plan(text, plan, link_spans=spans)
+        assert actual == expected, f'输出不一致:\n期望 {expected!r}\n实际 {actual!r}'
+    print(f"equivalence: ok ({len(prepared)} messages)")
+
+    regex_rate = measure(lambda item: message_filter._remove_links(item[0]), prepared)
+    entity_rate = measure(
+        lambda item: message_filter.strip_utf16_spans(item[0], message_filter.link_spans_from_entities(item[1])),
+        messages
+    )
+
+    print(f"{'method':<8} {'msg/s':>10} {'speedup':>8}")
+    print(f"{'regex':<8} {regex_rate:>10.0f} {1.0:>7.1f}x")
+    print(f"{'entity':<8} {entity_rate:>10.0f} {entity_rate / regex_rate:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
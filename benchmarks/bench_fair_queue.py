@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+基准测试 - 监听队列: 单个 FIFO 队列与按组赤字轮询对比
+
+一个源频道刷屏（flood 条消息先到达），其余安静组各有少量消息随后到达，
+统计安静组的消息在第几次出队时被处理（等待位置越小，被刷屏拖累越少），以及内存中的最大积压。
+
+用法: python benchmarks/bench_fair_queue.py [--flood 20000] [--groups 20] [--messages 10] [--queue-size 1000]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+from collections import deque
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.fair_queue import FairQueue
+
+FLOOD_GROUP = 0
+
+
+def arrivals(flood: int, groups: int, messages: int) -> list:
+    """到达顺序: 刷屏组的消息全部在前"""
+    order = [(FLOOD_GROUP, index) for index in range(flood)]
+    for index in range(messages):
+        order += [(group_id, index) for group_id in range(1, groups + 1)]
+    return order
+
+
+def summarize(positions: list) -> str:
+    positions = sorted(positions)
+    p99 = positions[min(len(positions) - 1, int(len(positions) * 0.99))]
+    return f"{statistics.median(positions):>10.0f} {p99:>10.0f}"
+
+
+def run_fifo(order: list):
+    queue = deque(order)
+    peak = len(queue)
+    positions = [position for position, (group_id, _) in enumerate(queue) if group_id != FLOOD_GROUP]
+    return positions, peak
+
+
+async def run_fair(order: list, queue_size: int, overflow: str):
+    fair_queue = FairQueue(max_depth=queue_size, overflow=overflow)
+    for group_id, item in order:
+        await fair_queue.put(group_id, item)
+
+    stats = fair_queue.get_statistics()
+    peak = stats['total_depth']
+    positions = []
+    for position in range(stats['total_depth']):
+        group_id, _ = await fair_queue.get()
+        if group_id != FLOOD_GROUP:
+            positions.append(position)
+    dropped = stats['groups'][FLOOD_GROUP]['dropped']
+    return positions, peak, dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--flood', type=int, default=20000)
+    parser.add_argument('--groups', type=int, default=20)
+    parser.add_argument('--messages', type=int, default=10)
+    parser.add_argument('--queue-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    order = arrivals(args.flood, args.groups, args.messages)
+
+    fifo_positions, fifo_peak = run_fifo(order)
+    unbounded_positions, unbounded_peak, _ = asyncio.run(run_fair(order, len(order), 'block'))
+    bounded_positions, bounded_peak, dropped = asyncio.run(run_fair(order, args.queue_size, 'drop_oldest'))
+
+    assert len(fifo_positions) == len(unbounded_positions) == len(bounded_positions) == args.groups * args.messages
+
+    print(f"{'method':<22} {'p50 wait':>10} {'p99 wait':>10} {'peak depth':>11} {'dropped':>8}")
+    print(f"{'fifo':<22} {summarize(fifo_positions)} {fifo_peak:>11} {0:>8}")
+    print(f"{'drr (unbounded)':<22} {summarize(unbounded_positions)} {unbounded_peak:>11} {0:>8}")
+    print(f"{'drr + drop_oldest':<22} {summarize(bounded_positions)} {bounded_peak:>11} {dropped:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+基准测试 - 批量过滤吞吐量 (逐条 filter_text 与 filter_batch 在 1/4/8 个工作进程下对比)
+
+用法: python benchmarks/bench_filter_batch.py [--messages 20000] [--workers 1,4,8]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.filters import MessageFilter
+from bench_filter_text import FILTERS, make_corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--length', type=int, default=400)
+    parser.add_argument('--workers', default='1,4,8')
+    parser.add_argument('--chunk-size', type=int, default=500)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.messages, args.length, random.Random(11))
+    message_filter = MessageFilter(None)
+
+    start = time.perf_counter()
+    expected = [message_filter.filter_text(text, FILTERS) for text in corpus]
+    baseline = len(corpus) / (time.perf_counter() - start)
+
+    print(f"cpus={os.cpu_count()} messages={len(corpus)}")
+    print(f"{'mode':<14} {'msg/s':>10} {'speedup':>8}")
+    print(f"{'filter_text':<14} {baseline:>10.0f} {1.0:>7.1f}x")
+
+    for workers in (int(w) for w in args.workers.split(',')):
+        # 预热进程池，避免把进程启动时间算进吞吐量
+        message_filter.filter_batch(corpus[:args.chunk_size * workers + 1], FILTERS, workers, args.chunk_size)
+
+        start = time.perf_counter()
+        results = message_filter.filter_batch(corpus, FILTERS, workers, args.chunk_size)
+        rate = len(corpus) / (time.perf_counter() - start)
+
+        assert results == expected, '批量过滤结果与逐条过滤不一致'
+        print(f"{'batch x' + str(workers):<14} {rate:>10.0f} {rate / baseline:>7.1f}x")
+
+    message_filter.close()
+
+
+if __name__ == '__main__':
+    main()
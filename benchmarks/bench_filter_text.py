@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+基准测试 - MessageFilter.filter_text 文本清理 (原逐步处理链与当前实现对比)
+
+校验当前实现与原处理链的输出逐字节一致，并比较吞吐量。
+
+用法: python benchmarks/bench_filter_text.py [--messages 5000] [--length 400]
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.filters import MessageFilter
+
+FILTERS = {
+    'remove_links': True,
+    'remove_emojis': True,
+    'remove_special_chars': True
+}
+
+PIECES = [
+    '今天的新闻内容', '这是一段正常的文本', '，', '。', '！', 'Hello world', ' ', '  ', '\n', '\n\n\n', ' \t\n',
+    'https://example.com/path?a=1&b=2', 'HTTP://EXAMPLE.ORG', 't.me/channel_name', 'https://T.ME/joinchat/abc',
+    '@someone', 'mail@example.com', '😀', '🚀', '✅', '❶', '#标签', '#tag', '[链接]', '(括号)', '...', '　', '\xa0',
+    'ASCII only text, with punctuation!', '数字123456', '\r\n'
+]
+
+
+# 原链接正则
+REFERENCE_URL_PATTERN = re.compile(
+    r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+',
+    re.IGNORECASE
+)
+REFERENCE_TELEGRAM_LINK_PATTERN = re.compile(
+    r'(?:https?://)?(?:www\.)?(?:t\.me|telegram\.me)/\S+',
+    re.IGNORECASE
+)
+
+
+def reference_filter_text(message_filter: MessageFilter, text: str, filters: dict) -> str:
+    """原实现: 每个启用的步骤都对全文做一次完整处理"""
+    if not text:
+        return ""
+    if filters.get('remove_links'):
+        text = REFERENCE_URL_PATTERN.sub('', text)
+        text = REFERENCE_TELEGRAM_LINK_PATTERN.sub('', text)
+        text = message_filter.mention_pattern.sub('', text)
+    if filters.get('remove_emojis'):
+        text = message_filter.emoji_pattern.sub('', text)
+    if filters.get('remove_special_chars'):
+        text = message_filter.special_chars_pattern.sub('', text)
+
+    cleaned_lines = []
+    for line in text.split('\n'):
+        line = line.strip()
+        if line or (cleaned_lines and cleaned_lines[-1]):
+            cleaned_lines.append(line)
+    while cleaned_lines and not cleaned_lines[-1]:
+        cleaned_lines.pop()
+    return '\n'.join(cleaned_lines).strip()
+
+
+def make_corpus(count: int, length: int, rng: random.Random) -> list:
+    """生成测试消息: 中文、纯ASCII、无链接、含链接等多种组合"""
+    corpus = []
+    for i in range(count):
+        pieces = PIECES if i % 3 else [p for p in PIECES if '://' not in p and '.me/' not in p.lower() and '@' not in p]
+        text = []
+        while sum(map(len, text)) < length:
+            text.append(rng.choice(pieces))
+        corpus.append(''.join(text))
+    return corpus
+
+
+def measure(func, corpus: list) -> float:
+    start = time.perf_counter()
+    for text in corpus:
+        func(text)
+    return len(corpus) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=5000)
+    parser.add_argument('--length', type=int, default=400)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    corpus = make_corpus(args.messages, args.length, rng)
+    message_filter = MessageFilter(None)
+
+    # 逐字节一致性校验（包括各过滤器单独启用的情况）
+    for filters in (FILTERS, {'remove_links': True}, {'remove_emojis': True}, {'remove_special_chars': True}, {}):
+        plan = message_filter.compile_plan(filters)
+        for text in corpus:
+            expected = reference_filter_text(message_filter, text, filters)
+            actual = message_filter.apply_plan(text, plan)
+            assert actual == expected, f'输出不一致: {text!r}\n期望 {expected!r}\n实际 {actual!r}'
+    print(f"equivalence: ok ({len(corpus)} messages x 5 filter sets)")
+
+    plan = message_filter.compile_plan(FILTERS)
+    reference_rate = measure(lambda text: reference_filter_text(message_filter, text, FILTERS), corpus)
+    current_rate = measure(lambda text: message_filter.apply_plan(text, plan), corpus)
+
+    ascii_corpus = [text.encode('ascii', 'ignore').decode() for text in corpus]
+    reference_ascii = measure(lambda text: reference_filter_text(message_filter, text, FILTERS), ascii_corpus)
+    current_ascii = measure(lambda text: message_filter.apply_plan(text, plan), ascii_corpus)
+
+    print(f"{'corpus':<8} {'reference(msg/s)':>17} {'current(msg/s)':>15} {'speedup':>8}")
+    print(f"{'mixed':<8} {reference_rate:>17.0f} {current_rate:>15.0f} {current_rate / reference_rate:>7.1f}x")
+    print(f"{'ascii':<8} {reference_ascii:>17.0f} {current_ascii:>15.0f} {current_ascii / reference_ascii:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
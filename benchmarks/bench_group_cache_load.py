@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+基准测试 - 组缓存加载 (逐组查询 N+1 与批量加载对比)
+
+用法: python benchmarks/bench_group_cache_load.py [--groups 10000] [--sources 3] [--targets 2]
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config.database import Database
+
+
+async def _seed(database: Database, groups: int, sources: int, targets: int):
+    """准备测试数据"""
+    await database._connection.executemany(
+        'INSERT INTO forwarding_groups (name, filters) VALUES (?, ?)',
+        [(f'bench_{i}', '{"remove_links": true}') for i in range(groups)]
+    )
+    await database._connection.executemany(
+        'INSERT INTO source_channels (group_id, channel_id) VALUES (?, ?)',
+        [(g + 1, -100_000_000 - g * sources - s) for g in range(groups) for s in range(sources)]
+    )
+    await database._connection.executemany(
+        'INSERT INTO target_channels (group_id, channel_id) VALUES (?, ?)',
+        [(g + 1, -200_000_000 - g * targets - t) for g in range(groups) for t in range(targets)]
+    )
+    await database._connection.commit()
+
+
+async def load_n_plus_one(database: Database) -> dict:
+    """原实现: 先取所有组，再逐组查询频道"""
+    cache = {}
+    for group in await database.get_forwarding_groups():
+        source_channels, target_channels = await database.get_group_channels(group['id'])
+        cache[group['id']] = {
+            'config': group,
+            'source_channels': source_channels,
+            'target_channels': target_channels
+        }
+    return cache
+
+
+async def load_bulk(database: Database) -> dict:
+    """批量加载"""
+    return await database.get_groups_with_channels()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--groups', type=int, default=10000)
+    parser.add_argument('--sources', type=int, default=3)
+    parser.add_argument('--targets', type=int, default=2)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = Database(str(Path(tmp) / 'bench.db'), dedup_capacity=0)
+        await database.init()
+        await _seed(database, args.groups, args.sources, args.targets)
+
+        results = {}
+        for name, loader in (('n+1', load_n_plus_one), ('bulk', load_bulk)):
+            best = float('inf')
+            for _ in range(args.rounds):
+                start = time.perf_counter()
+                cache = await loader(database)
+                best = min(best, time.perf_counter() - start)
+            results[name] = (best, cache)
+
+        await database.close()
+
+    assert results['n+1'][1] == results['bulk'][1], '批量加载结果与逐组查询不一致'
+
+    print(f"groups={args.groups} sources/group={args.sources} targets/group={args.targets}")
+    print(f"{'loader':<8} {'best(s)':>10}")
+    for name, (elapsed, _) in results.items():
+        print(f"{name:<8} {elapsed:>10.3f}")
+    print(f"speedup: {results['n+1'][0] / results['bulk'][0]:.1f}x")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+基准测试 - 广告/垃圾内容检测 (原启发式规则链与特征向量 + 线性模型对比)
+
+在合成语料上校验默认权重下的判定与原规则完全一致，并比较逐条和批量打分的吞吐量。
+
+用法: python benchmarks/bench_spam_scoring.py [--messages 20000] [--length 200] [--abuse-ratio 0.2]
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.filters import MessageFilter, FilterPlan
+from utils import spam_scorer
+
+NORMAL_PIECES = ['今天的新闻内容', '这是一段正常的文本', '，', '。', 'Hello world', ' ', '\n', '数字123', 'Python 3.12 released']
+AD_PIECES = ['广告', '推广', '加微信', '客服', '限时优惠', '加我微信', '联系客服', '免费咨询', '立即下单']
+CONTACT_PIECES = ['13812345678', '+8615912345678', 'QQ：123456789', 'qq 88888', '微信:abc_def12', 'V信 wxid_123456']
+SPAM_PIECES = ['!!!!!!', '？？？', 'BUY NOW CHEAP', 'AAAAAAAAAAAA', '哈哈哈哈哈哈哈哈', 'FREE MONEY']
+
+
+def reference_is_advertisement(message_filter: MessageFilter, text: str) -> bool:
+    """原广告检测规则"""
+    text_lower = text.lower()
+    ad_count = message_filter._ad_keyword_matcher.count(text_lower)
+    if ad_count >= 2:
+        return True
+    contact_count = sum(1 for pattern in (
+        message_filter.phone_pattern, message_filter.qq_pattern, message_filter.wechat_pattern
+    ) if pattern.search(text))
+    if contact_count > 0 and ad_count > 0:
+        return True
+    return message_filter._ad_phrase_matcher.count(text) >= 2
+
+
+def reference_is_spam(text: str) -> bool:
+    """原垃圾内容检测规则"""
+    if len(set(text)) / len(text) < 0.3 and len(text) > 10:
+        return True
+    if text.count('!') + text.count('！') + text.count('?') + text.count('？') > len(text) * 0.2:
+        return True
+    english_chars = re.findall(r'[a-zA-Z]', text)
+    if len(english_chars) > 10:
+        upper_ratio = sum(1 for c in english_chars if c.isupper()) / len(english_chars)
+        if upper_ratio > 0.8:
+            return True
+    return False
+
+
+def make_corpus(count: int, length: int, rng: random.Random, abuse_ratio: float = 0.2) -> list:
+    """生成正常、广告、含联系方式、刷屏等混合消息（abuse_ratio 为混入广告/刷屏内容的比例）"""
+    corpus = []
+    for _ in range(count):
+        kind = rng.random() / abuse_ratio if abuse_ratio else 1.0
+        pieces = list(NORMAL_PIECES)
+        if kind < 0.5:
+            pieces += AD_PIECES + CONTACT_PIECES
+        elif kind < 0.8:
+            pieces += SPAM_PIECES
+        elif kind < 1.0:
+            pieces = SPAM_PIECES
+        target = rng.randint(1, length)
+        text = []
+        while sum(map(len, text)) < target:
+            text.append(rng.choice(pieces))
+        corpus.append(''.join(text))
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--length', type=int, default=200)
+    parser.add_argument('--abuse-ratio', type=float, default=0.2)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.messages, args.length, random.Random(13), args.abuse_ratio)
+    message_filter = MessageFilter(None)
+    plan = FilterPlan({'ad_detection': True, 'smart_filter': True})
+
+    def reference(text):
+        return reference_is_advertisement(message_filter, text) or reference_is_spam(text)
+
+    expected = [reference(text) for text in corpus]
+    assert [message_filter._is_rejected(text, plan) for text in corpus] == expected, '逐条打分判定与原规则不一致'
+    assert message_filter._rejected_batch(corpus, plan) == expected, '批量打分判定与原规则不一致'
+    for text in corpus:
+        assert message_filter._is_advertisement(text) == reference_is_advertisement(message_filter, text)
+        assert message_filter._is_spam_content(text) == reference_is_spam(text)
+    print(f"equivalence: ok ({len(corpus)} messages, {sum(expected)} rejected)")
+
+    def rate(func):
+        start = time.perf_counter()
+        func()
+        return len(corpus) / (time.perf_counter() - start)
+
+    reference_rate = rate(lambda: [reference(text) for text in corpus])
+    single_rate = rate(lambda: [message_filter._is_rejected(text, plan) for text in corpus])
+    batch_rate = rate(lambda: message_filter._rejected_batch(corpus, plan))
+
+    print(f"numpy={'yes' if spam_scorer.numpy is not None else 'no'}")
+    print(f"{'method':<10} {'msg/s':>10} {'speedup':>8}")
+    print(f"{'reference':<10} {reference_rate:>10.0f} {1.0:>7.1f}x")
+    print(f"{'single':<10} {single_rate:>10.0f} {single_rate / reference_rate:>7.1f}x")
+    print(f"{'batch':<10} {batch_rate:>10.0f} {batch_rate / reference_rate:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
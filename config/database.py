@@ -6,32 +6,190 @@ import asyncio
 import aiosqlite
 import json
 import logging
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional, Tuple
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional, Tuple, Callable, Iterable, Union
 from pathlib import Path
 
+from utils.dedup import DedupIndex
+
 
 class Database:
     """数据库管理类"""
     
-    def __init__(self, db_path: str = "data/forwarder.db"):
+    # 数据库迁移: (版本号, 说明, 方法名, 是否在事务中执行)，按版本号顺序执行
+    MIGRATIONS = [
+        (1, '热点查询的组合索引与唯一约束', '_migrate_v1_composite_indexes', True),
+        (2, '启用增量自动回收 (auto_vacuum=INCREMENTAL)', '_migrate_v2_incremental_vacuum', False),
+        (3, '消息记录分区登记表', '_migrate_v3_history_partitions', True),
+    ]
+    
+    # 消息记录分区视图（合并 message_history 与所有分区表）
+    HISTORY_VIEW = 'message_history_all'
+    HISTORY_COLUMNS = ('id, group_id, source_message_id, target_message_id, source_channel_id, '
+                       'target_channel_id, content_hash, status, sent_at')
+    
+    def __init__(self, db_path: str = "data/forwarder.db", write_batch_size: int = 100,
+                 write_flush_interval: float = 2.0, write_max_pending: int = 10000,
+                 dedup_capacity: int = 600000, dedup_lru_size: int = 50000,
+                 storage_mode: str = 'default', read_pool_size: int = 3,
+                 cache_size_kb: int = 16384, mmap_size: int = 268435456,
+                 cleanup_batch_size: int = 5000, cleanup_pause: float = 0.05,
+                 partition_mode: str = 'none', migration_vacuum: bool = True):
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(exist_ok=True)
         self._connection = None
         
+        # 写缓冲 (message_history / statistics 批量写入)
+        self.write_batch_size = max(1, write_batch_size)
+        self.write_flush_interval = write_flush_interval
+        self.write_max_pending = max(self.write_batch_size, write_max_pending)
+        self._pending_messages: List[Tuple] = []
+        self._pending_statistics: Dict[Tuple, List[int]] = {}
+        self._pending_hashes: Dict[str, int] = {}
+        # 重建去重索引期间新增的哈希，换入新索引前补回（重建期间的 flush 会把它们移出 _pending_hashes）
+        self._rebuild_hashes: Optional[List[str]] = None
+        self._flush_lock = asyncio.Lock()
+        self._flush_task = None
+        self.write_buffer_stats = {
+            'flushes': 0,
+            'flushed_messages': 0,
+            'flushed_statistics': 0,
+            'dropped_messages': 0,
+            'errors': 0
+        }
+        
+        # 去重索引 (dedup_capacity <= 0 时关闭)
+        self.dedup_capacity = dedup_capacity
+        self.dedup_lru_size = dedup_lru_size
+        self.dedup_index: Optional[DedupIndex] = None
+        
+        # 存储模式: default 单连接 / wal 一个写连接 + 只读连接池
+        self.storage_mode = storage_mode if storage_mode in ('default', 'wal') else 'default'
+        self.read_pool_size = max(1, read_pool_size)
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self._read_connections: List[aiosqlite.Connection] = []
+        self._read_pool: Optional[asyncio.Queue] = None
+        
+        # 数据清理
+        self.cleanup_batch_size = max(1, cleanup_batch_size)
+        self.cleanup_pause = cleanup_pause
+        self.last_retention_report: Dict[str, Any] = {}
+        
+        # 迁移 v2 是否在启动时执行 VACUUM（重写整个数据库文件，期间阻塞启动）
+        self.migration_vacuum = migration_vacuum
+        
+        # 消息记录分区: none 不分区 / day 按天 / week 按周
+        self.partition_mode = partition_mode if partition_mode in ('none', 'day', 'week') else 'none'
+        self._partitions: Dict[str, Tuple[str, str]] = {}
+        
+        # 变更通知订阅者: callback(entity, entity_id)，可为协程函数
+        self._subscribers: List[Callable] = []
+        
     async def init(self):
         """初始化数据库"""
         self._connection = await aiosqlite.connect(self.db_path)
         self._connection.row_factory = aiosqlite.Row
+        
+        if self.storage_mode == 'wal':
+            await self._connection.execute('PRAGMA journal_mode = WAL')
+            await self._connection.execute('PRAGMA synchronous = NORMAL')
+            await self._apply_read_pragmas(self._connection)
+        
         await self._create_tables()
+        await self._run_migrations()
+        await self._ensure_incremental_vacuum()
+        await self._load_partitions()
+        
+        if self.storage_mode == 'wal':
+            await self._open_read_pool()
+        
+        # 预热去重索引
+        await self.rebuild_dedup_index()
+        
+        # 启动定时刷新任务
+        self._flush_task = asyncio.create_task(self._flush_loop())
         logging.info(f"数据库初始化完成: {self.db_path}")
 
     async def close(self):
         """关闭数据库连接"""
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        
+        # 关闭只读连接池
+        for conn in self._read_connections:
+            try:
+                await conn.close()
+            except Exception as e:
+                logging.error(f"关闭只读连接失败: {e}")
+        self._read_connections.clear()
+        self._read_pool = None
+        
         if self._connection:
+            # 关闭前写入缓冲区中的剩余记录
+            await self.flush()
             await self._connection.close()
             self._connection = None
 
+    async def _apply_read_pragmas(self, conn: aiosqlite.Connection):
+        """设置缓存相关的PRAGMA"""
+        await conn.execute(f'PRAGMA cache_size = -{int(self.cache_size_kb)}')
+        await conn.execute(f'PRAGMA mmap_size = {int(self.mmap_size)}')
+        await conn.execute('PRAGMA temp_store = MEMORY')
+
+    async def _open_read_pool(self):
+        """打开只读连接池 (WAL模式下读不阻塞写)"""
+        self._read_pool = asyncio.Queue()
+        uri = f"{self.db_path.resolve().as_uri()}?mode=ro"
+        
+        for _ in range(self.read_pool_size):
+            conn = await aiosqlite.connect(uri, uri=True)
+            conn.row_factory = aiosqlite.Row
+            await self._apply_read_pragmas(conn)
+            await conn.execute('PRAGMA query_only = ON')
+            self._read_connections.append(conn)
+            self._read_pool.put_nowait(conn)
+        
+        logging.info(f"数据库WAL模式已启用，只读连接池: {self.read_pool_size}")
+
+    @asynccontextmanager
+    async def _reader(self):
+        """获取用于只读查询的连接"""
+        if self._read_pool is None:
+            yield self._connection
+            return
+        
+        conn = await self._read_pool.get()
+        try:
+            yield conn
+        finally:
+            self._read_pool.put_nowait(conn)
+
+    async def checkpoint(self):
+        """将WAL内容写回主数据库文件（备份前调用）"""
+        if self.storage_mode != 'wal' or not self._connection:
+            return
+        try:
+            await self.flush()
+            await self._connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        except Exception as e:
+            logging.error(f"WAL检查点失败: {e}")
+
+    def get_storage_status(self) -> Dict[str, Any]:
+        """获取存储模式状态"""
+        return {
+            'storage_mode': self.storage_mode,
+            'read_pool_size': len(self._read_connections),
+            'idle_readers': self._read_pool.qsize() if self._read_pool else 0
+        }
+
     async def _create_tables(self):
         """创建数据库表"""
         
@@ -161,6 +319,262 @@ class Database:
 
         await self._connection.commit()
 
+    # 数据库迁移
+    async def _run_migrations(self):
+        """按顺序执行尚未应用的迁移"""
+        await self._connection.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        await self._connection.commit()
+        
+        current = await self.get_schema_version()
+        
+        for version, description, method_name, transactional in self.MIGRATIONS:
+            if version <= current:
+                continue
+            
+            try:
+                if transactional:
+                    await self._connection.execute('BEGIN')
+                await getattr(self, method_name)()
+                await self._connection.execute(
+                    'INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                    (version, description)
+                )
+                await self._connection.commit()
+                logging.info(f"数据库迁移完成: v{version} {description}")
+                
+            except Exception as e:
+                await self._connection.rollback()
+                logging.error(f"数据库迁移失败 v{version}: {e}")
+                raise
+
+    async def get_schema_version(self) -> int:
+        """获取当前数据库结构版本"""
+        cursor = await self._connection.execute('SELECT MAX(version) FROM schema_version')
+        row = await cursor.fetchone()
+        return row[0] or 0
+
+    async def _migrate_v1_composite_indexes(self):
+        """v1: 为 update_statistics / update_last_message_id / get_group_channels / cleanup_old_data 添加索引"""
+        
+        # 合并重复的统计记录，保留每组最小ID
+        await self._connection.execute('''
+            UPDATE statistics SET
+                message_count = (SELECT SUM(s.message_count) FROM statistics s
+                                 WHERE s.group_id IS statistics.group_id AND s.account_phone IS statistics.account_phone AND s.date IS statistics.date),
+                success_count = (SELECT SUM(s.success_count) FROM statistics s
+                                 WHERE s.group_id IS statistics.group_id AND s.account_phone IS statistics.account_phone AND s.date IS statistics.date),
+                error_count = (SELECT SUM(s.error_count) FROM statistics s
+                               WHERE s.group_id IS statistics.group_id AND s.account_phone IS statistics.account_phone AND s.date IS statistics.date)
+            WHERE id IN (
+                SELECT MIN(id) FROM statistics GROUP BY group_id, account_phone, date HAVING COUNT(*) > 1
+            )
+        ''')
+        await self._connection.execute('''
+            DELETE FROM statistics WHERE id NOT IN (
+                SELECT MIN(id) FROM statistics GROUP BY group_id, account_phone, date
+            )
+        ''')
+        await self._connection.execute(
+            'CREATE UNIQUE INDEX IF NOT EXISTS idx_statistics_group_phone_date ON statistics(group_id, account_phone, date)'
+        )
+        
+        # 源频道/目标频道按 (group_id, channel_id) 去重，保留最新记录
+        await self._connection.execute('''
+            UPDATE source_channels SET last_message_id = (
+                SELECT MAX(s.last_message_id) FROM source_channels s
+                WHERE s.group_id = source_channels.group_id AND s.channel_id = source_channels.channel_id
+            )
+            WHERE id IN (
+                SELECT MAX(id) FROM source_channels GROUP BY group_id, channel_id HAVING COUNT(*) > 1
+            )
+        ''')
+        for table in ('source_channels', 'target_channels'):
+            await self._connection.execute(f'''
+                DELETE FROM {table} WHERE id NOT IN (
+                    SELECT MAX(id) FROM {table} GROUP BY group_id, channel_id
+                )
+            ''')
+            await self._connection.execute(
+                f'CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_group_channel ON {table}(group_id, channel_id)'
+            )
+            await self._connection.execute(
+                f'CREATE INDEX IF NOT EXISTS idx_{table}_group_status ON {table}(group_id, status)'
+            )
+        
+        await self._connection.execute(
+            'CREATE INDEX IF NOT EXISTS idx_message_history_sent_at ON message_history(sent_at)'
+        )
+
+    async def _migrate_v2_incremental_vacuum(self):
+        """v2: 切换到增量自动回收
+
+        转换由每次启动时的 _ensure_incremental_vacuum 检查执行（可由 migration_vacuum 关闭，
+        之后打开时仍会转换），这里只登记版本。
+        """
+
+    async def _ensure_incremental_vacuum(self):
+        """数据库还不是增量自动回收时转换，清理后可用 incremental_vacuum 缩小文件
+
+        修改 auto_vacuum 需要 VACUUM 重建整个数据库文件（不能在事务中执行），
+        耗时与文件大小成正比，期间启动被阻塞，并临时需要与数据库等量的磁盘空间。
+        migration_vacuum 关闭时跳过，数据清理仍会删除数据但不缩小文件。
+        """
+        cursor = await self._connection.execute('PRAGMA auto_vacuum')
+        if (await cursor.fetchone())[0] == 2:
+            return
+        
+        size_mb = self.db_path.stat().st_size / 1024 / 1024 if self.db_path.exists() else 0.0
+        if not self.migration_vacuum:
+            logging.warning(f"未启用增量自动回收 ({size_mb:.1f} MB)，清理后文件不会缩小；"
+                            f"打开 database.migration_vacuum 后下次启动时转换")
+            return
+        
+        logging.info(f"启用增量自动回收: 正在 VACUUM 数据库 ({size_mb:.1f} MB)，完成前启动会暂停...")
+        start = time.perf_counter()
+        await self._connection.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        await self._connection.execute('VACUUM')
+        logging.info(f"VACUUM 完成，耗时 {time.perf_counter() - start:.1f}s")
+
+    async def _migrate_v3_history_partitions(self):
+        """v3: 分区登记表，记录每个分区表覆盖的时间段 [period_start, period_end)"""
+        await self._connection.execute('''
+            CREATE TABLE IF NOT EXISTS message_history_partitions (
+                name TEXT PRIMARY KEY,
+                period_start TEXT NOT NULL,
+                period_end TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+    # 消息记录分区
+    async def _load_partitions(self):
+        """加载已有分区并重建合并视图"""
+        cursor = await self._connection.execute(
+            'SELECT name, period_start, period_end FROM message_history_partitions ORDER BY period_start'
+        )
+        self._partitions = {row['name']: (row['period_start'], row['period_end']) for row in await cursor.fetchall()}
+        await self._rebuild_history_view()
+        
+        if self.partition_mode != 'none':
+            logging.info(f"消息记录分区模式: {self.partition_mode}, 现有分区 {len(self._partitions)} 个")
+
+    def _history_tables(self) -> List[str]:
+        """按时间顺序返回所有消息记录表（未分区的旧表在前）"""
+        return ['message_history'] + list(self._partitions)
+
+    @property
+    def _history_source(self) -> str:
+        """读取消息记录时使用的表或视图"""
+        return self.HISTORY_VIEW if self._partitions else 'message_history'
+
+    async def _rebuild_history_view(self):
+        """重建 message_history 与分区表的 UNION ALL 视图"""
+        await self._connection.execute(f'DROP VIEW IF EXISTS {self.HISTORY_VIEW}')
+        if self._partitions:
+            selects = [f'SELECT {self.HISTORY_COLUMNS} FROM {table}' for table in self._history_tables()]
+            await self._connection.execute(
+                f'CREATE VIEW {self.HISTORY_VIEW} AS ' + ' UNION ALL '.join(selects)
+            )
+        await self._connection.commit()
+
+    def _partition_for(self, sent_at: str) -> Tuple[str, str, str]:
+        """根据发送时间计算分区表名和时间段"""
+        day = datetime.strptime(sent_at[:10], '%Y-%m-%d').date()
+        if self.partition_mode == 'week':
+            start = day - timedelta(days=day.weekday())
+            end = start + timedelta(days=7)
+            name = f'message_history_w{start:%Y%m%d}'
+        else:
+            start = day
+            end = day + timedelta(days=1)
+            name = f'message_history_d{start:%Y%m%d}'
+        return name, start.isoformat(), end.isoformat()
+
+    async def _ensure_partition(self, name: str, period_start: str, period_end: str):
+        """创建分区表（已存在则跳过）"""
+        if name in self._partitions:
+            return
+        
+        await self._connection.execute(f'''
+            CREATE TABLE IF NOT EXISTS {name} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                group_id INTEGER NOT NULL,
+                source_message_id INTEGER NOT NULL,
+                target_message_id INTEGER,
+                source_channel_id INTEGER NOT NULL,
+                target_channel_id INTEGER NOT NULL,
+                content_hash TEXT,
+                status TEXT DEFAULT 'sent',
+                sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (group_id) REFERENCES forwarding_groups (id)
+            )
+        ''')
+        await self._connection.execute(f'CREATE INDEX IF NOT EXISTS idx_{name}_hash ON {name}(content_hash)')
+        await self._connection.execute(f'CREATE INDEX IF NOT EXISTS idx_{name}_group ON {name}(group_id)')
+        await self._connection.execute(
+            'INSERT OR IGNORE INTO message_history_partitions (name, period_start, period_end) VALUES (?, ?, ?)',
+            (name, period_start, period_end)
+        )
+        
+        self._partitions[name] = (period_start, period_end)
+        self._partitions = dict(sorted(self._partitions.items(), key=lambda item: item[1][0]))
+        await self._rebuild_history_view()
+        logging.info(f"创建消息记录分区: {name} [{period_start}, {period_end})")
+
+    async def _drop_expired_partitions(self, cutoff_date) -> Tuple[int, int]:
+        """删除整个时间段都早于截止日期的分区，返回 (分区数, 估算行数)"""
+        cutoff = str(cutoff_date)
+        expired = [name for name, (_, period_end) in self._partitions.items() if period_end <= cutoff]
+        if not expired:
+            return 0, 0
+        
+        rows = 0
+        for name in expired:
+            # 分区表只追加不删除，MAX(id) 即行数
+            cursor = await self._connection.execute(f'SELECT MAX(id) FROM {name}')
+            rows += (await cursor.fetchone())[0] or 0
+            
+            del self._partitions[name]
+            await self._rebuild_history_view()
+            await self._connection.execute(f'DROP TABLE IF EXISTS {name}')
+            await self._connection.execute('DELETE FROM message_history_partitions WHERE name = ?', (name,))
+            await self._connection.commit()
+            logging.info(f"删除过期分区: {name}")
+            
+            await asyncio.sleep(self.cleanup_pause)
+        
+        return len(expired), rows
+
+    # 变更通知
+    def subscribe(self, callback: Callable):
+        """订阅配置变更事件，回调参数为 (entity, entity_id)
+
+        批量变更只发布一个事件: entity 为 'groups'，entity_id 为组ID列表。
+        """
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable):
+        """取消订阅"""
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    async def _publish(self, entity: str, entity_id: Union[int, List[int]]):
+        """发布变更事件（提交成功后调用）"""
+        for callback in list(self._subscribers):
+            try:
+                result = callback(entity, entity_id)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logging.error(f"变更通知回调失败 {entity}:{entity_id}: {e}")
+
     # API池管理
     async def add_api(self, app_id: str, app_hash: str, max_accounts: int = 3) -> bool:
         """添加API ID到池中"""
@@ -177,13 +591,14 @@ class Database:
 
     async def get_available_api(self) -> Optional[Dict[str, Any]]:
         """获取可用的API ID"""
-        cursor = await self._connection.execute('''
-            SELECT * FROM api_pool 
-            WHERE status = 'active' AND current_accounts < max_accounts
-            ORDER BY current_accounts ASC, id ASC
-            LIMIT 1
-        ''')
-        row = await cursor.fetchone()
+        async with self._reader() as conn:
+            cursor = await conn.execute('''
+                SELECT * FROM api_pool 
+                WHERE status = 'active' AND current_accounts < max_accounts
+                ORDER BY current_accounts ASC, id ASC
+                LIMIT 1
+            ''')
+            row = await cursor.fetchone()
         return dict(row) if row else None
 
     async def assign_api_to_account(self, app_id: str, phone: str) -> bool:
@@ -238,16 +653,17 @@ class Database:
 
     async def get_api_pool_status(self) -> List[Dict[str, Any]]:
         """获取API池状态"""
-        cursor = await self._connection.execute('''
-            SELECT 
-                ap.*,
-                GROUP_CONCAT(la.phone) as assigned_accounts
-            FROM api_pool ap
-            LEFT JOIN listener_accounts la ON ap.app_id = la.api_id
-            GROUP BY ap.id
-            ORDER BY ap.id
-        ''')
-        rows = await cursor.fetchall()
+        async with self._reader() as conn:
+            cursor = await conn.execute('''
+                SELECT 
+                    ap.*,
+                    GROUP_CONCAT(la.phone) as assigned_accounts
+                FROM api_pool ap
+                LEFT JOIN listener_accounts la ON ap.app_id = la.api_id
+                GROUP BY ap.id
+                ORDER BY ap.id
+            ''')
+            rows = await cursor.fetchall()
         result = []
         for row in rows:
             data = dict(row)
@@ -271,11 +687,12 @@ class Database:
 
     async def get_listener_accounts(self, status: str = 'active') -> List[Dict[str, Any]]:
         """获取监听账号列表"""
-        cursor = await self._connection.execute(
-            'SELECT * FROM listener_accounts WHERE status = ? ORDER BY id',
-            (status,)
-        )
-        rows = await cursor.fetchall()
+        async with self._reader() as conn:
+            cursor = await conn.execute(
+                'SELECT * FROM listener_accounts WHERE status = ? ORDER BY id',
+                (status,)
+            )
+            rows = await cursor.fetchall()
         return [dict(row) for row in rows]
 
     async def update_account_status(self, phone: str, status: str, error_count: int = None) -> bool:
@@ -306,6 +723,7 @@ class Database:
                 (name, description)
             )
             await self._connection.commit()
+            await self._publish('group', cursor.lastrowid)
             return cursor.lastrowid
         except Exception as e:
             logging.error(f"创建搬运组失败: {e}")
@@ -313,41 +731,68 @@ class Database:
 
     async def get_forwarding_groups(self) -> List[Dict[str, Any]]:
         """获取所有搬运组"""
-        cursor = await self._connection.execute(
-            'SELECT * FROM forwarding_groups ORDER BY id'
-        )
-        rows = await cursor.fetchall()
-        groups = []
-        for row in rows:
-            group = dict(row)
-            # 解析过滤器JSON
-            if group['filters']:
-                try:
-                    group['filters'] = json.loads(group['filters'])
-                except:
-                    group['filters'] = {}
-            else:
+        async with self._reader() as conn:
+            cursor = await conn.execute(
+                'SELECT * FROM forwarding_groups ORDER BY id'
+            )
+            rows = await cursor.fetchall()
+        return [self._parse_group_row(row) for row in rows]
+
+    @staticmethod
+    def _parse_group_row(row) -> Dict[str, Any]:
+        """转换搬运组记录并解析过滤器JSON"""
+        group = dict(row)
+        if group['filters']:
+            try:
+                group['filters'] = json.loads(group['filters'])
+            except:
                 group['filters'] = {}
-            groups.append(group)
+        else:
+            group['filters'] = {}
+        return group
+
+    async def get_groups_with_channels(self, group_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict[str, Any]]:
+        """批量加载搬运组及其活跃频道（group_ids 为 None 时加载全部）
+
+        三条集合查询取代逐组查询，结构与 get_group_channels 一致:
+        {group_id: {'config': ..., 'source_channels': [...], 'target_channels': [...]}}
+        """
+        # 指定组时用 json_each 展开ID列表，不受 SQL 参数个数限制
+        if group_ids is None:
+            group_filter, channel_filter, params = '', '', ()
+        else:
+            group_filter = 'WHERE id IN (SELECT value FROM json_each(?))'
+            channel_filter = 'AND group_id IN (SELECT value FROM json_each(?))'
+            params = (json.dumps(list(group_ids)),)
+        
+        async with self._reader() as conn:
+            cursor = await conn.execute(f'SELECT * FROM forwarding_groups {group_filter} ORDER BY id', params)
+            groups = {
+                row['id']: {'config': self._parse_group_row(row), 'source_channels': [], 'target_channels': []}
+                for row in await cursor.fetchall()
+            }
+            
+            for table, key in (('source_channels', 'source_channels'), ('target_channels', 'target_channels')):
+                cursor = await conn.execute(
+                    f'SELECT * FROM {table} WHERE status = "active" {channel_filter} ORDER BY group_id, id', params
+                )
+                for row in await cursor.fetchall():
+                    group = groups.get(row['group_id'])
+                    if group is not None:
+                        group[key].append(dict(row))
+        
         return groups
 
     async def get_forwarding_group(self, group_id: int) -> Optional[Dict[str, Any]]:
         """获取单个搬运组"""
-        cursor = await self._connection.execute(
-            'SELECT * FROM forwarding_groups WHERE id = ?',
-            (group_id,)
-        )
-        row = await cursor.fetchone()
+        async with self._reader() as conn:
+            cursor = await conn.execute(
+                'SELECT * FROM forwarding_groups WHERE id = ?',
+                (group_id,)
+            )
+            row = await cursor.fetchone()
         if row:
-            group = dict(row)
-            if group['filters']:
-                try:
-                    group['filters'] = json.loads(group['filters'])
-                except:
-                    group['filters'] = {}
-            else:
-                group['filters'] = {}
-            return group
+            return self._parse_group_row(row)
         return None
 
     async def update_group_filters(self, group_id: int, filters: Dict[str, Any]) -> bool:
@@ -358,6 +803,7 @@ class Database:
                 (json.dumps(filters), group_id)
             )
             await self._connection.commit()
+            await self._publish('group', group_id)
             return True
         except Exception as e:
             logging.error(f"更新组过滤器失败: {e}")
@@ -371,20 +817,56 @@ class Database:
                 (start_time, end_time, group_id)
             )
             await self._connection.commit()
+            await self._publish('group', group_id)
             return True
         except Exception as e:
             logging.error(f"设置组调度失败: {e}")
             return False
 
+    async def update_group_status(self, group_id: int, status: str) -> bool:
+        """更新组状态"""
+        try:
+            await self._connection.execute(
+                'UPDATE forwarding_groups SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+                (status, group_id)
+            )
+            await self._connection.commit()
+            await self._publish('group', group_id)
+            return True
+        except Exception as e:
+            logging.error(f"更新组状态失败: {e}")
+            return False
+
+    async def update_group_statuses(self, updates: List[Tuple[int, str]]) -> bool:
+        """批量更新组状态（一次事务）"""
+        if not updates:
+            return True
+        try:
+            await self._connection.executemany(
+                'UPDATE forwarding_groups SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+                [(status, group_id) for group_id, status in updates]
+            )
+            await self._connection.commit()
+            await self._publish('groups', list(dict.fromkeys(group_id for group_id, _ in updates)))
+            return True
+        except Exception as e:
+            logging.error(f"批量更新组状态失败: {e}")
+            return False
+
     # 频道管理
     async def add_source_channel(self, group_id: int, channel_id: int, channel_username: str = None, channel_title: str = None) -> bool:
         """添加源频道"""
         try:
             await self._connection.execute(
-                'INSERT OR REPLACE INTO source_channels (group_id, channel_id, channel_username, channel_title) VALUES (?, ?, ?, ?)',
+                '''INSERT INTO source_channels (group_id, channel_id, channel_username, channel_title) VALUES (?, ?, ?, ?)
+                   ON CONFLICT(group_id, channel_id) DO UPDATE SET
+                       channel_username = COALESCE(excluded.channel_username, channel_username),
+                       channel_title = COALESCE(excluded.channel_title, channel_title),
+                       status = "active"''',
                 (group_id, channel_id, channel_username, channel_title)
             )
             await self._connection.commit()
+            await self._publish('group', group_id)
             return True
         except Exception as e:
             logging.error(f"添加源频道失败: {e}")
@@ -394,10 +876,15 @@ class Database:
         """添加目标频道"""
         try:
             await self._connection.execute(
-                'INSERT OR REPLACE INTO target_channels (group_id, channel_id, channel_username, channel_title) VALUES (?, ?, ?, ?)',
+                '''INSERT INTO target_channels (group_id, channel_id, channel_username, channel_title) VALUES (?, ?, ?, ?)
+                   ON CONFLICT(group_id, channel_id) DO UPDATE SET
+                       channel_username = COALESCE(excluded.channel_username, channel_username),
+                       channel_title = COALESCE(excluded.channel_title, channel_title),
+                       status = "active"''',
                 (group_id, channel_id, channel_username, channel_title)
             )
             await self._connection.commit()
+            await self._publish('group', group_id)
             return True
         except Exception as e:
             logging.error(f"添加目标频道失败: {e}")
@@ -405,19 +892,20 @@ class Database:
 
     async def get_group_channels(self, group_id: int) -> Tuple[List[Dict], List[Dict]]:
         """获取组的源频道和目标频道"""
-        # 获取源频道
-        cursor = await self._connection.execute(
-            'SELECT * FROM source_channels WHERE group_id = ? AND status = "active"',
-            (group_id,)
-        )
-        source_channels = [dict(row) for row in await cursor.fetchall()]
+        async with self._reader() as conn:
+            # 获取源频道
+            cursor = await conn.execute(
+                'SELECT * FROM source_channels WHERE group_id = ? AND status = "active"',
+                (group_id,)
+            )
+            source_channels = [dict(row) for row in await cursor.fetchall()]
 
-        # 获取目标频道
-        cursor = await self._connection.execute(
-            'SELECT * FROM target_channels WHERE group_id = ? AND status = "active"',
-            (group_id,)
-        )
-        target_channels = [dict(row) for row in await cursor.fetchall()]
+            # 获取目标频道
+            cursor = await conn.execute(
+                'SELECT * FROM target_channels WHERE group_id = ? AND status = "active"',
+                (group_id,)
+            )
+            target_channels = [dict(row) for row in await cursor.fetchall()]
 
         return source_channels, target_channels
 
@@ -437,24 +925,93 @@ class Database:
     # 消息记录
     async def is_message_forwarded(self, content_hash: str) -> bool:
         """检查消息是否已转发"""
-        cursor = await self._connection.execute(
-            'SELECT 1 FROM message_history WHERE content_hash = ? LIMIT 1',
-            (content_hash,)
-        )
-        row = await cursor.fetchone()
+        # 缓冲区中尚未写入的记录
+        if content_hash in self._pending_hashes:
+            return True
+        
+        # 内存索引能确定结果时不查询数据库
+        if self.dedup_index:
+            cached = self.dedup_index.lookup(content_hash)
+            if cached is not None:
+                return cached
+        
+        async with self._reader() as conn:
+            cursor = await conn.execute(
+                f'SELECT 1 FROM {self._history_source} WHERE content_hash = ? LIMIT 1',
+                (content_hash,)
+            )
+            row = await cursor.fetchone()
+        
+        if self.dedup_index:
+            self.dedup_index.record_db_result(content_hash, row is not None)
         return row is not None
 
+    async def rebuild_dedup_index(self):
+        """从 message_history 重建去重索引"""
+        if self.dedup_capacity <= 0 or self._rebuild_hashes is not None:
+            return
+        
+        self._rebuild_hashes = []
+        try:
+            cursor = await self._connection.execute(
+                f'SELECT COUNT(*) FROM {self._history_source} WHERE content_hash IS NOT NULL'
+            )
+            row_count = (await cursor.fetchone())[0]
+            
+            # 现有记录超出配置容量时按实际数量扩容
+            capacity = max(self.dedup_capacity, row_count * 2)
+            index = DedupIndex(capacity, self.dedup_lru_size)
+            
+            # 按时间顺序逐表加载，LRU中保留的是最近的记录
+            for table in self._history_tables():
+                cursor = await self._connection.execute(
+                    f'SELECT content_hash FROM {table} WHERE content_hash IS NOT NULL ORDER BY id'
+                )
+                while True:
+                    rows = await cursor.fetchmany(5000)
+                    if not rows:
+                        break
+                    for row in rows:
+                        index.add(row[0])
+            
+            # 缓冲区中尚未写入的记录，以及重建期间新增的记录（可能已被 flush 写入已读过的表）
+            for content_hash in self._pending_hashes:
+                index.add(content_hash)
+            for content_hash in self._rebuild_hashes:
+                index.add(content_hash)
+            
+            self.dedup_index = index
+            logging.info(f"去重索引加载完成: {index.bloom.count} 条记录")
+            
+        except Exception as e:
+            logging.error(f"重建去重索引失败: {e}")
+        finally:
+            self._rebuild_hashes = None
+
+    def get_dedup_stats(self) -> Dict[str, Any]:
+        """获取去重索引统计"""
+        if not self.dedup_index:
+            return {'enabled': False}
+        return {'enabled': True, **self.dedup_index.get_stats()}
+
     async def add_message_record(self, group_id: int, source_message_id: int, target_message_id: int,
                                source_channel_id: int, target_channel_id: int, content_hash: str) -> bool:
-        """添加消息记录"""
+        """添加消息记录（写入缓冲区，批量提交）"""
         try:
-            await self._connection.execute(
-                '''INSERT INTO message_history 
-                   (group_id, source_message_id, target_message_id, source_channel_id, target_channel_id, content_hash) 
-                   VALUES (?, ?, ?, ?, ?, ?)''',
-                (group_id, source_message_id, target_message_id, source_channel_id, target_channel_id, content_hash)
+            # sent_at 在入队时确定，与 CURRENT_TIMESTAMP 格式一致 (UTC)
+            sent_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+            self._pending_messages.append(
+                (group_id, source_message_id, target_message_id, source_channel_id,
+                 target_channel_id, content_hash, sent_at)
             )
-            await self._connection.commit()
+            if content_hash:
+                self._pending_hashes[content_hash] = self._pending_hashes.get(content_hash, 0) + 1
+                if self.dedup_index:
+                    self.dedup_index.add(content_hash)
+                if self._rebuild_hashes is not None:
+                    self._rebuild_hashes.append(content_hash)
+            
+            await self._after_enqueue()
             return True
         except Exception as e:
             logging.error(f"添加消息记录失败: {e}")
@@ -462,103 +1019,309 @@ class Database:
 
     # 统计
     async def update_statistics(self, group_id: int, account_phone: str, success: bool = True) -> bool:
-        """更新统计信息"""
+        """更新统计信息（在缓冲区中累加，批量提交）"""
         try:
-            today = datetime.now().date()
-            
-            # 检查今天的记录是否存在
-            cursor = await self._connection.execute(
-                'SELECT id FROM statistics WHERE group_id = ? AND account_phone = ? AND date = ?',
-                (group_id, account_phone, today)
-            )
-            row = await cursor.fetchone()
+            key = (group_id, account_phone, datetime.now().date())
+            counts = self._pending_statistics.get(key)
+            if counts is None:
+                counts = self._pending_statistics[key] = [0, 0, 0]
             
-            if row:
-                # 更新现有记录
-                if success:
-                    await self._connection.execute(
-                        'UPDATE statistics SET message_count = message_count + 1, success_count = success_count + 1 WHERE id = ?',
-                        (row['id'],)
-                    )
-                else:
-                    await self._connection.execute(
-                        'UPDATE statistics SET message_count = message_count + 1, error_count = error_count + 1 WHERE id = ?',
-                        (row['id'],)
-                    )
+            counts[0] += 1
+            if success:
+                counts[1] += 1
             else:
-                # 创建新记录
-                success_count = 1 if success else 0
-                error_count = 0 if success else 1
-                await self._connection.execute(
-                    'INSERT INTO statistics (group_id, account_phone, message_count, success_count, error_count, date) VALUES (?, ?, 1, ?, ?, ?)',
-                    (group_id, account_phone, success_count, error_count, today)
-                )
+                counts[2] += 1
             
-            await self._connection.commit()
+            await self._after_enqueue()
             return True
         except Exception as e:
             logging.error(f"更新统计失败: {e}")
             return False
 
+    # 写缓冲
+    def _pending_count(self) -> int:
+        """缓冲区中待写入的行数"""
+        return len(self._pending_messages) + len(self._pending_statistics)
+
+    async def _after_enqueue(self):
+        """入队后检查是否达到批量阈值"""
+        if self._pending_count() >= self.write_batch_size:
+            await self.flush()
+        self._enforce_write_ceiling()
+
+    def _enforce_write_ceiling(self):
+        """限制缓冲区内存上限，超出时丢弃最旧的消息记录"""
+        overflow = self._pending_count() - self.write_max_pending
+        if overflow <= 0 or not self._pending_messages:
+            return
+        
+        dropped = self._pending_messages[:overflow]
+        del self._pending_messages[:overflow]
+        self._release_pending_hashes(dropped)
+        
+        self.write_buffer_stats['dropped_messages'] += len(dropped)
+        logging.warning(f"写缓冲区已满，丢弃 {len(dropped)} 条最旧的消息记录")
+
+    def _release_pending_hashes(self, rows: List[Tuple]):
+        """从待写入哈希索引中移除记录"""
+        for row in rows:
+            content_hash = row[5]
+            if not content_hash:
+                continue
+            remaining = self._pending_hashes.get(content_hash, 0) - 1
+            if remaining > 0:
+                self._pending_hashes[content_hash] = remaining
+            else:
+                self._pending_hashes.pop(content_hash, None)
+
+    async def flush(self) -> bool:
+        """将缓冲区中的消息记录和统计在一个事务中批量写入"""
+        async with self._flush_lock:
+            if not self._connection or not self._pending_count():
+                return True
+            
+            messages = self._pending_messages
+            statistics = self._pending_statistics
+            self._pending_messages = []
+            self._pending_statistics = {}
+            
+            try:
+                # 按分区表归类（未启用分区时全部写入 message_history）
+                batches: Dict[str, List[Tuple]] = {}
+                for row in messages:
+                    if self.partition_mode == 'none':
+                        table = 'message_history'
+                    else:
+                        table, period_start, period_end = self._partition_for(row[6])
+                        await self._ensure_partition(table, period_start, period_end)
+                    batches.setdefault(table, []).append(row)
+                
+                for table, rows in batches.items():
+                    await self._connection.executemany(
+                        f'''INSERT INTO {table} 
+                           (group_id, source_message_id, target_message_id, source_channel_id, target_channel_id, content_hash, sent_at) 
+                           VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                        rows
+                    )
+                
+                if statistics:
+                    await self._connection.executemany(
+                        '''INSERT INTO statistics (group_id, account_phone, date, message_count, success_count, error_count)
+                           VALUES (?, ?, ?, ?, ?, ?)
+                           ON CONFLICT(group_id, account_phone, date) DO UPDATE SET
+                               message_count = message_count + excluded.message_count,
+                               success_count = success_count + excluded.success_count,
+                               error_count = error_count + excluded.error_count''',
+                        [key + tuple(counts) for key, counts in statistics.items()]
+                    )
+                
+                await self._connection.commit()
+                
+            except Exception as e:
+                logging.error(f"批量写入失败，记录保留在缓冲区: {e}")
+                self.write_buffer_stats['errors'] += 1
+                try:
+                    await self._connection.rollback()
+                except Exception:
+                    pass
+                
+                # 放回缓冲区，等待下次刷新
+                self._pending_messages = messages + self._pending_messages
+                for key, counts in statistics.items():
+                    pending = self._pending_statistics.setdefault(key, [0, 0, 0])
+                    for i in range(3):
+                        pending[i] += counts[i]
+                self._enforce_write_ceiling()
+                return False
+            
+            self._release_pending_hashes(messages)
+            self.write_buffer_stats['flushes'] += 1
+            self.write_buffer_stats['flushed_messages'] += len(messages)
+            self.write_buffer_stats['flushed_statistics'] += len(statistics)
+            return True
+
+    async def _flush_loop(self):
+        """按时间阈值定期刷新写缓冲"""
+        while True:
+            try:
+                await asyncio.sleep(self.write_flush_interval)
+                await self.flush()
+                
+                # 去重索引元素超出容量时重建
+                if self.dedup_index and self.dedup_index.needs_rebuild():
+                    await self.rebuild_dedup_index()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logging.error(f"写缓冲刷新异常: {e}")
+
+    def get_write_buffer_status(self) -> Dict[str, Any]:
+        """获取写缓冲状态"""
+        return {
+            'pending_messages': len(self._pending_messages),
+            'pending_statistics': len(self._pending_statistics),
+            'batch_size': self.write_batch_size,
+            'flush_interval': self.write_flush_interval,
+            'max_pending': self.write_max_pending,
+            **self.write_buffer_stats
+        }
+
     async def get_group_statistics(self, group_id: int, days: int = 7) -> List[Dict[str, Any]]:
         """获取组统计信息"""
         start_date = (datetime.now() - timedelta(days=days)).date()
-        cursor = await self._connection.execute(
-            '''SELECT 
-                date,
-                SUM(message_count) as total_messages,
-                SUM(success_count) as total_success,
-                SUM(error_count) as total_errors,
-                ROUND(SUM(success_count) * 100.0 / SUM(message_count), 2) as success_rate
-               FROM statistics 
-               WHERE group_id = ? AND date >= ?
-               GROUP BY date
-               ORDER BY date DESC''',
-            (group_id, start_date)
-        )
-        rows = await cursor.fetchall()
+        async with self._reader() as conn:
+            cursor = await conn.execute(
+                '''SELECT 
+                    date,
+                    SUM(message_count) as total_messages,
+                    SUM(success_count) as total_success,
+                    SUM(error_count) as total_errors,
+                    ROUND(SUM(success_count) * 100.0 / SUM(message_count), 2) as success_rate
+                   FROM statistics 
+                   WHERE group_id = ? AND date >= ?
+                   GROUP BY date
+                   ORDER BY date DESC''',
+                (group_id, start_date)
+            )
+            rows = await cursor.fetchall()
         return [dict(row) for row in rows]
 
     async def get_account_statistics(self, account_phone: str, days: int = 7) -> List[Dict[str, Any]]:
         """获取账号统计信息"""
         start_date = (datetime.now() - timedelta(days=days)).date()
-        cursor = await self._connection.execute(
-            '''SELECT 
-                fg.name as group_name,
-                SUM(s.message_count) as total_messages,
-                SUM(s.success_count) as total_success,
-                SUM(s.error_count) as total_errors,
-                ROUND(SUM(s.success_count) * 100.0 / SUM(s.message_count), 2) as success_rate
-               FROM statistics s
-               LEFT JOIN forwarding_groups fg ON s.group_id = fg.id
-               WHERE s.account_phone = ? AND s.date >= ?
-               GROUP BY s.group_id
-               ORDER BY total_messages DESC''',
-            (account_phone, start_date)
-        )
-        rows = await cursor.fetchall()
+        async with self._reader() as conn:
+            cursor = await conn.execute(
+                '''SELECT 
+                    fg.name as group_name,
+                    SUM(s.message_count) as total_messages,
+                    SUM(s.success_count) as total_success,
+                    SUM(s.error_count) as total_errors,
+                    ROUND(SUM(s.success_count) * 100.0 / SUM(s.message_count), 2) as success_rate
+                   FROM statistics s
+                   LEFT JOIN forwarding_groups fg ON s.group_id = fg.id
+                   WHERE s.account_phone = ? AND s.date >= ?
+                   GROUP BY s.group_id
+                   ORDER BY total_messages DESC''',
+                (account_phone, start_date)
+            )
+            rows = await cursor.fetchall()
         return [dict(row) for row in rows]
 
     # 清理
     async def cleanup_old_data(self, days: int = 30) -> bool:
         """清理旧数据"""
         try:
-            cutoff_date = (datetime.now() - timedelta(days=days)).date()
+            report = await self.run_retention(days)
             
-            # 清理旧的消息记录
-            await self._connection.execute(
-                'DELETE FROM message_history WHERE sent_at < ?',
-                (cutoff_date,)
+            # 过期记录已删除，重建去重索引
+            if report['deleted']:
+                await self.rebuild_dedup_index()
+            return True
+        except Exception as e:
+            logging.error(f"清理旧数据失败: {e}")
+            return False
+
+    async def run_retention(self, days: int = 30) -> Dict[str, Any]:
+        """分批删除过期数据，每批单独提交并让出事件循环，最后增量回收空间"""
+        cutoff_date = (datetime.now() - timedelta(days=days)).date()
+        start = time.perf_counter()
+        
+        # 先写入缓冲区，避免过期判断遗漏
+        await self.flush()
+        
+        # 分区表整表删除，未分区的旧表逐批删除
+        dropped_partitions, partition_rows = await self._drop_expired_partitions(cutoff_date)
+        
+        tables = {
+            'message_history': await self._delete_in_batches('message_history', 'sent_at', cutoff_date),
+            'message_history_partitions': partition_rows,
+            'statistics': await self._delete_in_batches('statistics', 'date', cutoff_date)
+        }
+        freed_pages = await self._incremental_vacuum()
+        
+        elapsed = time.perf_counter() - start
+        deleted = sum(tables.values())
+        report = {
+            'cutoff': str(cutoff_date),
+            'tables': tables,
+            'dropped_partitions': dropped_partitions,
+            'deleted': deleted,
+            'freed_pages': freed_pages,
+            'elapsed': round(elapsed, 3),
+            'rows_per_second': round(deleted / elapsed, 1) if elapsed > 0 else 0
+        }
+        self.last_retention_report = report
+        logging.info(f"数据清理完成: 删除 {deleted} 行, 回收 {freed_pages} 页, "
+                     f"耗时 {report['elapsed']}s ({report['rows_per_second']} 行/秒)")
+        return report
+
+    async def _delete_in_batches(self, table: str, column: str, cutoff) -> int:
+        """按rowid区间分批删除 column < cutoff 的记录"""
+        # 过期记录中最大的ID作为上界（只扫描索引中的过期区间，无需全表扫描）
+        cursor = await self._connection.execute(
+            f'SELECT MAX(id) FROM {table} WHERE {column} < ?',
+            (cutoff,)
+        )
+        upper = (await cursor.fetchone())[0]
+        if upper is None:
+            return 0
+        
+        cursor = await self._connection.execute(f'SELECT MIN(id) FROM {table}')
+        current = (await cursor.fetchone())[0]
+        
+        deleted = 0
+        batches = 0
+        start = time.perf_counter()
+        
+        while current is not None and current <= upper:
+            batch_end = min(current + self.cleanup_batch_size, upper + 1)
+            cursor = await self._connection.execute(
+                f'DELETE FROM {table} WHERE id >= ? AND id < ? AND {column} < ?',
+                (current, batch_end, cutoff)
             )
+            await self._connection.commit()
             
-            # 清理旧的统计数据
-            await self._connection.execute(
-                'DELETE FROM statistics WHERE date < ?',
-                (cutoff_date,)
-            )
+            deleted += max(cursor.rowcount, 0)
+            batches += 1
+            current = batch_end
+            
+            if batches % 20 == 0:
+                elapsed = time.perf_counter() - start
+                logging.info(f"清理 {table}: 已删除 {deleted} 行, 进度 ID {current}/{upper}, "
+                             f"{deleted / elapsed:.0f} 行/秒")
+            
+            # 让出事件循环和写锁
+            await asyncio.sleep(self.cleanup_pause)
+        
+        return deleted
+
+    async def _incremental_vacuum(self) -> int:
+        """增量回收空闲页，返回回收的页数"""
+        try:
+            cursor = await self._connection.execute('PRAGMA auto_vacuum')
+            if (await cursor.fetchone())[0] != 2:
+                return 0
+            
+            cursor = await self._connection.execute('PRAGMA freelist_count')
+            before = (await cursor.fetchone())[0]
+            remaining = before
+            
+            while remaining > 0:
+                cursor = await self._connection.execute(
+                    f'PRAGMA incremental_vacuum({self.cleanup_batch_size})'
+                )
+                await cursor.fetchall()
+                await self._connection.commit()
+                
+                cursor = await self._connection.execute('PRAGMA freelist_count')
+                after = (await cursor.fetchone())[0]
+                if after >= remaining:
+                    break
+                remaining = after
+                await asyncio.sleep(self.cleanup_pause)
+            
+            return before - remaining
             
-            await self._connection.commit()
-            return True
         except Exception as e:
-            logging.error(f"清理旧数据失败: {e}")
-            return False
\ No newline at end of file
+            logging.error(f"增量回收空间失败: {e}")
+            return 0
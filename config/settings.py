@@ -176,6 +176,14 @@ class Settings:
     def media_timeout(self) -> int:
         return self.get('global_settings.media_timeout', 300)
 
+    @property
+    def sender_workers(self) -> int:
+        return self.get('global_settings.sender_workers', 2)  # 发送串行通道数，同一目标频道的消息按提交顺序发送
+
+    @property
+    def media_group_wait(self) -> float:
+        return self.get('global_settings.media_group_wait', 5)  # 媒体组最长收集时间（秒），学习到项间隔后通常提前关闭
+
     # 轮换设置
     @property
     def rotation_strategy(self) -> str:
@@ -193,6 +201,35 @@ class Settings:
     def rest_time(self) -> int:
         return self.get('rotation.rest_time', 30)
 
+    @property
+    def listen_sharding(self) -> bool:
+        return self.get('rotation.sharding', False)  # 按一致性哈希把源频道分配给各监听账号，每个频道只由一个账号处理
+
+    # 监听队列设置
+    @property
+    def listener_workers(self) -> int:
+        return self.get('listener.workers', 3)  # 串行通道数，同一源频道的消息总在同一通道内按顺序处理
+
+    @property
+    def listener_lane_capacity(self) -> int:
+        return self.get('listener.lane_capacity', 16)  # 每个串行通道缓存的投递数
+
+    @property
+    def listener_queue_size(self) -> int:
+        return self.get('listener.queue_size', 1000)  # 每个组的队列上限
+
+    @property
+    def listener_overflow(self) -> str:
+        return self.get('listener.overflow', 'block')  # 队列满时: block 等待（不限制内存）/ drop_oldest 丢弃最旧 / spill 写入磁盘
+
+    @property
+    def listener_group_weights(self) -> dict:
+        return self.get('listener.group_weights', {}) or {}  # 组ID -> 调度权重，默认 1
+
+    @property
+    def listener_spill_dir(self) -> str:
+        return self.get('listener.spill_dir', 'data/spill')  # spill 策略的溢出文件目录
+
     # 过滤设置
     @property
     def remove_links(self) -> bool:
@@ -214,6 +251,96 @@ class Settings:
     def smart_filter(self) -> bool:
         return self.get('filters.smart_filter', True)
 
+    @property
+    def filter_cache_entries(self) -> int:
+        return self.get('filters.cache_entries', 10000)  # 0 表示禁用过滤结果缓存
+
+    @property
+    def filter_cache_max_bytes(self) -> int:
+        return self.get('filters.cache_max_bytes', 32 * 1024 * 1024)
+
+    @property
+    def filter_execution_mode(self) -> str:
+        return self.get('filters.execution_mode', 'inline')  # inline/thread/process
+
+    @property
+    def filter_offload_workers(self) -> int:
+        return self.get('filters.offload_workers', 2)
+
+    @property
+    def filter_offload_threshold(self) -> int:
+        return self.get('filters.offload_threshold', 50000)  # 估算成本（字符数 x 阶段权重）低于此值时在事件循环内执行
+
+    @property
+    def filter_regex_budget_ms(self) -> float:
+        return self.get('filters.regex_budget_ms', 50)  # 单条自定义正则的执行时间预算，超出后对该组停用，0 表示不限制
+
+    @property
+    def filter_profile_sample_rate(self) -> float:
+        return self.get('filters.profile_sample_rate', 0.01)  # 过滤性能采样比例，0 表示关闭
+
+    @property
+    def filter_scoring_models(self) -> dict:
+        return self.get('filters.scoring', {})  # 广告/垃圾内容打分模型: {'ad': {'weights': {...}, 'bias': -0.5}, 'spam': {...}}
+
+    @property
+    def filter_batch_workers(self) -> int:
+        return self.get('filters.batch_workers', 1)  # 批量过滤的工作进程数，1 表示不使用进程池
+
+    # 数据库设置
+    @property
+    def db_write_batch_size(self) -> int:
+        return self.get('database.write_batch_size', 100)
+
+    @property
+    def db_write_flush_interval(self) -> float:
+        return self.get('database.write_flush_interval', 2.0)
+
+    @property
+    def db_write_max_pending(self) -> int:
+        return self.get('database.write_max_pending', 10000)
+
+    @property
+    def db_storage_mode(self) -> str:
+        return self.get('database.storage_mode', 'default')  # default/wal
+
+    @property
+    def db_read_pool_size(self) -> int:
+        return self.get('database.read_pool_size', 3)
+
+    @property
+    def db_cache_size_kb(self) -> int:
+        return self.get('database.cache_size_kb', 16384)
+
+    @property
+    def db_mmap_size(self) -> int:
+        return self.get('database.mmap_size', 268435456)
+
+    @property
+    def db_cleanup_batch_size(self) -> int:
+        return self.get('database.cleanup_batch_size', 5000)
+
+    @property
+    def db_cleanup_pause(self) -> float:
+        return self.get('database.cleanup_pause', 0.05)
+
+    @property
+    def db_partition_mode(self) -> str:
+        return self.get('database.partition_mode', 'none')  # none/day/week
+
+    @property
+    def db_migration_vacuum(self) -> bool:
+        return self.get('database.migration_vacuum', True)  # 启动时执行 VACUUM 转换为增量自动回收（只需一次，阻塞启动）
+
+    # 去重设置
+    @property
+    def dedup_expected_daily_messages(self) -> int:
+        return self.get('dedup.expected_daily_messages', 20000)
+
+    @property
+    def dedup_lru_size(self) -> int:
+        return self.get('dedup.lru_size', 50000)
+
     # 安全设置
     @property
     def session_encryption(self) -> bool:
@@ -6,12 +6,18 @@ import asyncio
 import logging
 import time
 import random
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any, Set, Tuple
 from pathlib import Path
 from telethon import TelegramClient
 from telethon.errors import SessionPasswordNeededError, PhoneCodeInvalidError, PasswordHashInvalidError
+from telethon.errors import UserNotParticipantError, ChannelPrivateError
 from telethon.sessions import StringSession
 
+from utils.hash_ring import HashRing
+
+# 更新速率的统计窗口（秒）
+RATE_WINDOW = 60
+
 
 class AccountManager:
     """账号管理器"""
@@ -31,6 +37,22 @@ class AccountManager:
         # 登录状态管理
         self.login_sessions: Dict[str, Dict] = {}
         
+        # 客户端增减通知，回调参数为 (event, phone, client)，event 为 'added' / 'removed'
+        self._client_subscribers: List[Callable] = []
+        
+        # 分片监听: 源频道按一致性哈希分配给活跃账号
+        self.shard_ring = HashRing()
+        self.shard_channels: Set[int] = set()
+        self.channel_assignments: Dict[int, str] = {}
+        self.last_rebalance_moved = 0
+        
+        # 账号是否已加入频道: {频道: {账号: True/False}}，没有记录的按已加入处理，由后台任务核实
+        self.channel_members: Dict[int, Dict[str, bool]] = {}
+        self._membership_task = None
+        
+        # 各账号收到的更新数: {账号: {'total', 'window_start', 'window_count', 'rate'}}
+        self.update_rates: Dict[str, Dict[str, float]] = {}
+        
         # 运行状态
         self.is_running = False
         self.rotation_task = None
@@ -61,6 +83,14 @@ class AccountManager:
             except asyncio.CancelledError:
                 pass
         
+        if self._membership_task:
+            self._membership_task.cancel()
+            try:
+                await self._membership_task
+            except asyncio.CancelledError:
+                pass
+            self._membership_task = None
+        
         # 断开所有客户端
         for phone, client in self.clients.items():
             try:
@@ -72,6 +102,9 @@ class AccountManager:
         
         self.clients.clear()
         self.client_status.clear()
+        self.shard_ring = HashRing()
+        self.channel_assignments.clear()
+        self.channel_members.clear()
         
         self.logger.info("✅ 账号管理器已停止")
 
@@ -140,6 +173,7 @@ class AccountManager:
                     'error_count': 0,
                     'api_id': api['app_id']
                 }
+                self._notify_client('added', phone, client)
                 
                 self.logger.info(f"✅ 账号 {phone} ({me.username or me.id}) 连接成功")
                 return True
@@ -223,6 +257,7 @@ class AccountManager:
                 'error_count': 0,
                 'api_id': session['api']['app_id']
             }
+            self._notify_client('added', phone, client)
             
             # 清理登录会话
             del self.login_sessions[phone]
@@ -270,6 +305,7 @@ class AccountManager:
                 'error_count': 0,
                 'api_id': session['api']['app_id']
             }
+            self._notify_client('added', phone, client)
             
             # 清理登录会话
             del self.login_sessions[phone]
@@ -293,10 +329,15 @@ class AccountManager:
                 if client.is_connected():
                     await client.disconnect()
                 del self.clients[phone]
+                self._notify_client('removed', phone, client)
             
             # 清理状态
             if phone in self.client_status:
                 del self.client_status[phone]
+            self.update_rates.pop(phone, None)
+            for members in self.channel_members.values():
+                members.pop(phone, None)
+            self._refresh_shard_ring()
             
             # 释放API
             await self.api_pool_manager.release_api_from_account(phone)
@@ -320,6 +361,25 @@ class AccountManager:
             self.logger.error(f"❌ 移除账号失败 {phone}: {e}")
             return False
 
+    def subscribe_clients(self, callback: Callable):
+        """订阅客户端增减事件（同步回调）"""
+        if callback not in self._client_subscribers:
+            self._client_subscribers.append(callback)
+
+    def unsubscribe_clients(self, callback: Callable):
+        """取消订阅"""
+        if callback in self._client_subscribers:
+            self._client_subscribers.remove(callback)
+
+    def _notify_client(self, event: str, phone: str, client: TelegramClient):
+        """通知客户端增减"""
+        self._refresh_shard_ring()
+        for callback in list(self._client_subscribers):
+            try:
+                callback(event, phone, client)
+            except Exception as e:
+                self.logger.error(f"❌ 客户端通知回调失败 {phone}: {e}")
+
     async def get_current_client(self) -> Optional[TelegramClient]:
         """获取当前轮换的客户端"""
         if not self.clients:
@@ -338,6 +398,208 @@ class AccountManager:
         phone = list(active_clients)[self.current_client_index % len(active_clients)][0]
         return self.clients[phone], phone
 
+    # 分片监听
+    @property
+    def sharding_enabled(self) -> bool:
+        return bool(self.settings.listen_sharding)
+
+    def _refresh_shard_ring(self):
+        """按当前活跃账号更新哈希环，账号集合变化时重新分配频道"""
+        active = {phone for phone in self.clients
+                  if self.client_status.get(phone, {}).get('status') == 'active'}
+        current = set(self.shard_ring.nodes)
+        if active == current:
+            return
+        
+        for phone in current - active:
+            self.shard_ring.remove_node(phone)
+        for phone in active - current:
+            self.shard_ring.add_node(phone)
+        
+        self._rebalance_channels()
+
+    def _pick_owner(self, channel_id: int) -> Optional[str]:
+        """沿哈希环选出第一个没有确认未加入该频道的账号，全部未加入时为 None"""
+        members = self.channel_members.get(channel_id, {})
+        for phone in self.shard_ring.get_nodes(channel_id):
+            if members.get(phone) is not False:
+                return phone
+        return None
+
+    def _rebalance_channels(self):
+        """重新计算所有频道的归属，只有哈希区间变化的频道会迁移"""
+        moved = 0
+        for channel_id in self.shard_channels:
+            owner = self._pick_owner(channel_id)
+            if self.channel_assignments.get(channel_id) != owner:
+                moved += 1
+            self.channel_assignments[channel_id] = owner
+        
+        self.last_rebalance_moved = moved
+        if moved and self.sharding_enabled:
+            self.logger.info(f"🔀 分片重新分配: {moved}/{len(self.shard_channels)} 个频道迁移，活跃账号 {len(self.shard_ring)} 个")
+        self._schedule_membership_check()
+
+    def add_shard_channel(self, channel_id: int):
+        """登记需要分片监听的源频道"""
+        if channel_id not in self.shard_channels:
+            self.shard_channels.add(channel_id)
+            self.channel_assignments[channel_id] = self._pick_owner(channel_id)
+            self._schedule_membership_check()
+
+    def remove_shard_channel(self, channel_id: int):
+        """取消登记源频道"""
+        self.shard_channels.discard(channel_id)
+        self.channel_assignments.pop(channel_id, None)
+        self.channel_members.pop(channel_id, None)
+
+    def mark_channel_member(self, phone: str, channel_id: int, is_member: bool = True):
+        """记录账号是否已加入频道，归属因此改变时重新分配该频道"""
+        members = self.channel_members.setdefault(channel_id, {})
+        if members.get(phone) == is_member:
+            return
+        members[phone] = is_member
+        
+        if channel_id not in self.shard_channels:
+            return
+        owner = self._pick_owner(channel_id)
+        previous = self.channel_assignments.get(channel_id)
+        if owner != previous:
+            self.channel_assignments[channel_id] = owner
+            if owner is None:
+                self.logger.warning(f"⚠️ 频道 {channel_id} 没有已加入的监听账号，该频道的更新由所有账号处理")
+            else:
+                self.logger.info(f"🔀 频道 {channel_id} 改由 {owner} 监听（{previous} 未加入该频道）")
+
+    def _schedule_membership_check(self):
+        """后台核实各频道的负责账号是否已加入该频道"""
+        if not self.sharding_enabled:
+            return
+        if self._membership_task and not self._membership_task.done():
+            return
+        try:
+            self._membership_task = asyncio.get_running_loop().create_task(self._verify_membership())
+        except RuntimeError:
+            # 没有运行中的事件循环（启动前），由之后的分配再触发
+            pass
+
+    async def _verify_membership(self):
+        """逐个核实负责账号的成员身份，未加入时回退到哈希环上的下一个账号，直到所有负责账号都核实过"""
+        attempted: Set[Tuple[int, str]] = set()
+        while True:
+            pending = [(channel_id, owner) for channel_id, owner in self.channel_assignments.items()
+                       if owner is not None and (channel_id, owner) not in attempted
+                       and self.channel_members.get(channel_id, {}).get(owner) is None]
+            if not pending:
+                return
+            
+            for channel_id, owner in pending:
+                attempted.add((channel_id, owner))
+                is_member = await self._check_membership(owner, channel_id)
+                if is_member is not None and self.channel_assignments.get(channel_id) == owner:
+                    self.mark_channel_member(owner, channel_id, is_member)
+
+    async def _check_membership(self, phone: str, channel_id: int) -> Optional[bool]:
+        """查询账号是否已加入频道，无法确定时返回 None"""
+        client = self.clients.get(phone)
+        if client is None:
+            return None
+        try:
+            await client.get_permissions(channel_id, 'me')
+            return True
+        except (UserNotParticipantError, ChannelPrivateError):
+            return False
+        except Exception as e:
+            self.logger.debug(f"无法确认 {phone} 是否已加入频道 {channel_id}: {e}")
+            return None
+
+    def get_channel_owner(self, channel_id: int) -> Optional[str]:
+        """负责该频道的账号（没有活跃账号时为 None）"""
+        owner = self.channel_assignments.get(channel_id)
+        if owner is None and channel_id not in self.channel_assignments:
+            owner = self.shard_ring.get_node(channel_id)
+        return owner
+
+    def owns_channel(self, phone: str, channel_id: int) -> bool:
+        """该账号是否应处理这个频道的更新（未开启分片时所有账号都处理）"""
+        if not self.sharding_enabled:
+            return True
+        owner = self.get_channel_owner(channel_id)
+        return owner is None or owner == phone
+
+    async def get_client_for_channel(self, channel_id: int):
+        """获取负责该频道的客户端，未开启分片时按轮换策略选择"""
+        if self.sharding_enabled:
+            owner = self.get_channel_owner(channel_id)
+            if owner in self.clients:
+                return self.clients[owner], owner
+        return await self.get_current_client()
+
+    def record_update(self, phone: str, channel_id: Optional[int] = None):
+        """记录账号收到的一条更新，收到频道的更新说明账号已加入该频道"""
+        if channel_id is not None and self.channel_members.get(channel_id, {}).get(phone) is not True:
+            self.mark_channel_member(phone, channel_id)
+        
+        now = time.time()
+        counter = self.update_rates.get(phone)
+        if counter is None:
+            counter = self.update_rates[phone] = {'total': 0, 'window_start': now, 'window_count': 0, 'rate': 0.0}
+        
+        elapsed = now - counter['window_start']
+        if elapsed >= RATE_WINDOW:
+            counter['rate'] = counter['window_count'] / elapsed
+            counter['window_start'] = now
+            counter['window_count'] = 0
+        
+        counter['total'] += 1
+        counter['window_count'] += 1
+
+    def _update_rate(self, phone: str) -> float:
+        """账号每分钟收到的更新数（上一个完整窗口，窗口未满时用当前窗口估计）"""
+        counter = self.update_rates.get(phone)
+        if not counter:
+            return 0.0
+        
+        elapsed = time.time() - counter['window_start']
+        if elapsed >= RATE_WINDOW:
+            return counter['window_count'] / elapsed * 60
+        if counter['rate']:
+            return counter['rate'] * 60
+        return counter['window_count'] / max(elapsed, 1.0) * 60
+
+    def get_shard_statistics(self) -> Dict[str, Any]:
+        """分片统计: 各账号负责的频道数和更新速率"""
+        channel_counts: Dict[str, int] = {}
+        unverified_counts: Dict[str, int] = {}
+        unjoined_channels = []
+        for channel_id, owner in self.channel_assignments.items():
+            if owner is not None:
+                channel_counts[owner] = channel_counts.get(owner, 0) + 1
+                if self.channel_members.get(channel_id, {}).get(owner) is None:
+                    unverified_counts[owner] = unverified_counts.get(owner, 0) + 1
+            elif len(self.shard_ring):
+                unjoined_channels.append(channel_id)
+        
+        accounts = {}
+        for phone in sorted(set(self.clients) | set(self.update_rates)):
+            counter = self.update_rates.get(phone, {})
+            accounts[phone] = {
+                'in_ring': phone in self.shard_ring,
+                'channels': channel_counts.get(phone, 0),
+                'unverified_channels': unverified_counts.get(phone, 0),
+                'updates': counter.get('total', 0),
+                'updates_per_minute': round(self._update_rate(phone), 2)
+            }
+        
+        return {
+            'enabled': self.sharding_enabled,
+            'channels': len(self.shard_channels),
+            'unassigned_channels': sum(1 for owner in self.channel_assignments.values() if owner is None),
+            'unjoined_channels': sorted(unjoined_channels),
+            'last_rebalance_moved': self.last_rebalance_moved,
+            'accounts': accounts
+        }
+
     def _should_rotate(self) -> bool:
         """判断是否需要轮换"""
         strategy = self.settings.rotation_strategy
@@ -421,6 +683,7 @@ class AccountManager:
             else:
                 self.logger.warning(f"⚠️ 账号 {phone} 需要重新登录")
                 self.client_status[phone]['status'] = 'unauthorized'
+            self._refresh_shard_ring()
                 
         except Exception as e:
             self.logger.error(f"❌ 重连失败 {phone}: {e}")
@@ -439,6 +702,7 @@ class AccountManager:
             if error_count >= 5:
                 self.client_status[phone]['status'] = 'suspended'
                 self.logger.warning(f"⚠️ 账号 {phone} 错误次数过多，已暂停使用")
+                self._refresh_shard_ring()
 
     async def get_account_list(self) -> List[Dict[str, Any]]:
         """获取账号列表"""
@@ -476,7 +740,8 @@ class AccountManager:
                 'error': error,
                 'offline': offline,
                 'usage_rate': round(active / total * 100, 2) if total > 0 else 0,
-                'accounts': accounts
+                'accounts': accounts,
+                'sharding': self.get_shard_statistics()
             }
             
         except Exception as e:
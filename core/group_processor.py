@@ -3,11 +3,21 @@
 """
 
 import asyncio
+import functools
 import logging
-from typing import Dict, List, Any, Optional
-from datetime import datetime, time as dt_time
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
+from datetime import datetime
 
-from utils.filters import MessageFilter
+from utils.filters import MessageFilter, FilterPlan, SLOW_RULE_SUSPEND
+from utils.filter_cache import FilterResultCache
+from utils.regex_guard import check_regex
+from utils.schedule_window import ScheduleWindow
+
+# 正则规则只按耗时判断超出预算（未被 regex 模块中断）累计达到该次数时，才在组配置中停用
+SLOW_RULE_STRIKES = 3
 
 
 class GroupProcessor:
@@ -20,11 +30,30 @@ class GroupProcessor:
         
         # 过滤器
         self.message_filter = MessageFilter(settings)
+        self.filter_cache = FilterResultCache(settings.filter_cache_entries, settings.filter_cache_max_bytes)
+        
+        # 过滤执行模式: inline 在事件循环内执行 / thread 线程池 / process 进程池
+        self.filter_execution_mode = settings.filter_execution_mode
+        if self.filter_execution_mode not in ('inline', 'thread', 'process'):
+            self.filter_execution_mode = 'inline'
+        self.filter_offload_threshold = settings.filter_offload_threshold
+        self._filter_executor = None
+        
+        # 每条消息的执行决策（最近记录 + 累计计数）
+        self.filter_decisions = deque(maxlen=200)
+        self.filter_decision_counts = {'cache': 0, 'inline': 0, 'thread': 0, 'process': 0}
+        
+        # 正则规则超出时间预算的累计次数: (组ID, 模式) -> 次数
+        self.slow_rule_strikes: Dict[Tuple[int, str], int] = {}
         
         # 组状态缓存
         self.group_cache: Dict[int, Dict] = {}
         self.cache_update_time = 0
         
+        # 调度窗口计时任务: 在窗口边界翻转各组的 in_schedule 标记
+        self._schedule_task: Optional[asyncio.Task] = None
+        self._schedule_changed: Optional[asyncio.Event] = None
+        
         # 运行状态
         self.is_running = False
 
@@ -32,10 +61,20 @@ class GroupProcessor:
         """启动组处理器"""
         self.logger.info("🔄 启动组处理器...")
         
-        # 加载组配置
+        # 加载组配置，之后由变更通知按组增量更新
         await self._load_groups()
+        self.database.subscribe(self._on_database_change)
+        
+        # 过滤工作池
+        workers = max(1, self.settings.filter_offload_workers)
+        if self.filter_execution_mode == 'thread':
+            self._filter_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='filter')
+        elif self.filter_execution_mode == 'process':
+            self._filter_executor = ProcessPoolExecutor(max_workers=workers)
         
         self.is_running = True
+        self._schedule_changed = asyncio.Event()
+        self._schedule_task = asyncio.create_task(self._schedule_ticker())
         self.logger.info("✅ 组处理器启动完成")
 
     async def stop(self):
@@ -43,25 +82,32 @@ class GroupProcessor:
         self.logger.info("🛑 停止组处理器...")
         self.is_running = False
         
+        self.database.unsubscribe(self._on_database_change)
+        if self._schedule_task:
+            self._schedule_task.cancel()
+            try:
+                await self._schedule_task
+            except asyncio.CancelledError:
+                pass
+            self._schedule_task = None
         self.group_cache.clear()
+        self.filter_cache.clear()
+        self.message_filter.close()
+        if self._filter_executor:
+            self._filter_executor.shutdown(wait=False, cancel_futures=True)
+            self._filter_executor = None
         self.logger.info("✅ 组处理器已停止")
 
     async def _load_groups(self):
         """加载组配置"""
         try:
-            groups = await self.database.get_forwarding_groups()
-            
-            for group in groups:
-                group_id = group['id']
-                
-                # 获取组的频道
-                source_channels, target_channels = await self.database.get_group_channels(group_id)
-                
-                self.group_cache[group_id] = {
-                    'config': group,
-                    'source_channels': source_channels,
-                    'target_channels': target_channels
-                }
+            # 批量加载组和频道，整体替换缓存（已删除的组随之移除）
+            group_cache = await self.database.get_groups_with_channels()
+            for group_id, group_data in group_cache.items():
+                self._attach_filter_plan(group_data, self.group_cache.get(group_id))
+                self._attach_schedule(group_data)
+            self.group_cache = group_cache
+            self._notify_schedule_changed()
             
             self.cache_update_time = datetime.now().timestamp()
             self.logger.info(f"📋 加载 {len(self.group_cache)} 个搬运组")
@@ -69,6 +115,332 @@ class GroupProcessor:
         except Exception as e:
             self.logger.error(f"❌ 加载组配置失败: {e}")
 
+    async def _on_database_change(self, entity: str, entity_id):
+        """数据库变更通知: 只刷新受影响的组（批量变更一次查询）"""
+        if entity == 'group':
+            await self._refresh_groups([entity_id])
+        elif entity == 'groups':
+            await self._refresh_groups(entity_id)
+
+    async def _refresh_groups(self, group_ids: List[int]):
+        """用集合查询重新加载指定组的缓存条目，已删除的组从缓存移除"""
+        try:
+            loaded = await self.database.get_groups_with_channels(group_ids)
+            for group_id in group_ids:
+                group_data = loaded.get(group_id)
+                if group_data:
+                    self._attach_filter_plan(group_data, self.group_cache.get(group_id))
+                    self._attach_schedule(group_data)
+                    self.group_cache[group_id] = group_data
+                else:
+                    self.group_cache.pop(group_id, None)
+            if loaded:
+                self._notify_schedule_changed()
+            
+        except Exception as e:
+            self.logger.error(f"❌ 刷新组缓存失败 {group_ids}: {e}")
+
+    def _attach_filter_plan(self, group_data: Dict, previous: Optional[Dict] = None):
+        """为缓存条目附加过滤计划，过滤器配置未变化时沿用旧计划"""
+        filters = group_data['config'].get('filters', {})
+        previous_plan = previous.get('filter_plan') if previous else None
+        
+        if previous_plan and previous_plan.fingerprint == FilterPlan.fingerprint_of(filters):
+            group_data['filter_plan'] = previous_plan
+        else:
+            group_data['filter_plan'] = self.message_filter.compile_plan(filters)
+
+    def _attach_schedule(self, group_data: Dict):
+        """编译组的调度窗口并计算当前是否在窗口内"""
+        config = group_data['config']
+        try:
+            window = ScheduleWindow.parse(config.get('schedule_start'), config.get('schedule_end'))
+        except ValueError as e:
+            # 调度时间无效时不限制时间
+            self.logger.error(f"❌ 组{config.get('id')} 调度时间无效: {e}")
+            window = None
+        
+        group_data['schedule'] = window
+        group_data['in_schedule'] = window.contains(ScheduleWindow.second_of_day()) if window else True
+
+    def _notify_schedule_changed(self):
+        """组调度变化后唤醒计时任务重新计算下一个边界"""
+        if self._schedule_changed:
+            self._schedule_changed.set()
+
+    async def _schedule_ticker(self):
+        """单个计时任务: 睡眠到最近的窗口边界，翻转到达边界的组的 in_schedule 标记"""
+        while self.is_running:
+            try:
+                self._schedule_changed.clear()
+                now = ScheduleWindow.now()
+                second = ScheduleWindow.second_of_day(now)
+                delay = 60
+                
+                for group_data in list(self.group_cache.values()):
+                    window = group_data.get('schedule')
+                    if not window:
+                        continue
+                    
+                    active = window.contains(second)
+                    if active != group_data.get('in_schedule'):
+                        group_data['in_schedule'] = active
+                        self.logger.debug(f"⏰ 组{group_data['config'].get('id')} {'进入' if active else '离开'}调度时间")
+                    delay = min(delay, window.seconds_until_change(second))
+                
+                # 醒在边界那一秒的开头（最长 60 秒重新校准一次，应对系统时间调整）
+                timeout = max(0.0, delay - now.microsecond / 1_000_000) + 0.001
+                try:
+                    await asyncio.wait_for(self._schedule_changed.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                    
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"❌ 调度计时任务出错: {e}")
+                await asyncio.sleep(1)
+
+    async def _run_filter(self, text: str, plan: FilterPlan, group_id: int = None, message_id: int = None,
+                          link_spans: Optional[tuple] = None) -> str:
+        """执行过滤计划
+
+        相同文本和相同过滤配置复用缓存结果；估算成本超过阈值时转到工作池执行，
+        避免长消息和复杂正则阻塞事件循环。每条消息的执行方式都会被记录。
+        """
+        plan.resume_slow_rules()
+        rules_version = plan.rules_version
+        
+        key = None
+        if self.filter_cache.enabled:
+            key = self.filter_cache.make_key(text, plan.fingerprint, self.message_filter.keywords_version, link_spans,
+                                             rules_version)
+            result = self.filter_cache.get(key)
+            if result is not None:
+                self._record_filter_decision('cache', group_id, message_id, len(text), 0, 0)
+                return result
+        
+        cost = plan.estimate_cost(text)
+        mode = 'inline'
+        if self._filter_executor and cost >= self.filter_offload_threshold:
+            mode = self.filter_execution_mode
+        
+        start = time.perf_counter()
+        if mode == 'thread':
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                self._filter_executor, self.message_filter.apply_plan, text, plan, group_id, link_spans
+            )
+        elif mode == 'process':
+            future = self.message_filter.submit_to_pool(self._filter_executor, text, plan, link_spans)
+            results, slow_rules = await asyncio.wrap_future(future)
+            result = results[0]
+            plan.merge_slow_rules(slow_rules)
+        else:
+            result = self.message_filter.apply_plan(text, plan, group_id, link_spans)
+        elapsed = time.perf_counter() - start
+        
+        self._record_filter_decision(mode, group_id, message_id, len(text), cost, elapsed)
+        
+        slow_rules = plan.take_slow_rules()
+        if slow_rules and group_id is not None:
+            await self._disable_slow_rules(group_id, slow_rules)
+        
+        # 本次过滤中有规则超时被暂停: 结果缺少该规则的作用，不缓存
+        if key is not None and rules_version == plan.rules_version:
+            self.filter_cache.put(key, result)
+        return result
+
+    async def _disable_slow_rules(self, group_id: int, slow_rules: Dict[str, Tuple[float, bool]]):
+        """处理超出时间预算的正则规则
+
+        规则已在过滤计划中暂停，SLOW_RULE_SUSPEND 秒后恢复。只有被 regex 模块的超时中断，
+        或累计超出预算 SLOW_RULE_STRIKES 次，才在组配置中标记为停用并保存；
+        单次按耗时判断的超出可能来自事件循环繁忙或垃圾回收停顿。
+        """
+        try:
+            persist = {}
+            for pattern, (elapsed_ms, timed_out) in slow_rules.items():
+                key = (group_id, pattern)
+                strikes = self.slow_rule_strikes[key] = self.slow_rule_strikes.get(key, 0) + 1
+                if timed_out or strikes >= SLOW_RULE_STRIKES:
+                    persist[pattern] = (elapsed_ms, timed_out, strikes)
+                else:
+                    self.logger.warning(f"⚠️ 组{group_id} 正则规则 {pattern!r} 暂停 {SLOW_RULE_SUSPEND}s"
+                                        f"（超出预算 {strikes}/{SLOW_RULE_STRIKES} 次）")
+            
+            group_data = self.group_cache.get(group_id)
+            if not persist or not group_data:
+                return
+            
+            filters = dict(group_data['config'].get('filters', {}))
+            rules = [dict(rule) if isinstance(rule, dict) else rule for rule in filters.get('custom_rules') or []]
+            budget_ms = self.message_filter.regex_budget_ms
+            
+            disabled = []
+            for rule in rules:
+                if not isinstance(rule, dict) or rule.get('disabled') or rule.get('type') != 'regex':
+                    continue
+                if rule.get('pattern') not in persist:
+                    continue
+                elapsed_ms, timed_out, strikes = persist[rule['pattern']]
+                rule['disabled'] = True
+                if timed_out:
+                    rule['disabled_reason'] = f'执行超过预算 {budget_ms}ms 被中断'
+                else:
+                    rule['disabled_reason'] = f'累计 {strikes} 次执行耗时超过预算 {budget_ms}ms（最近 {elapsed_ms}ms）'
+                rule['disabled_at'] = datetime.now().isoformat()
+                disabled.append(rule['pattern'])
+            
+            for pattern in persist:
+                self.slow_rule_strikes.pop((group_id, pattern), None)
+            if not disabled:
+                return
+            
+            filters['custom_rules'] = rules
+            if await self.database.update_group_filters(group_id, filters):
+                self.logger.warning(f"⚠️ 组{group_id} 已停用超时正则规则: {disabled}")
+            
+        except Exception as e:
+            self.logger.error(f"❌ 停用超时规则失败 {group_id}: {e}")
+
+    @staticmethod
+    def _describe_disabled_rules(group_data: Dict) -> List[Dict[str, Any]]:
+        """列出组中已停用（超时）和被静态检查拒绝的规则"""
+        described = []
+        rules = group_data['config'].get('filters', {}).get('custom_rules') or []
+        for index, rule in enumerate(rules):
+            if isinstance(rule, dict) and rule.get('disabled'):
+                described.append({
+                    'index': index,
+                    'pattern': rule.get('pattern'),
+                    'reason': rule.get('disabled_reason', ''),
+                    'disabled_at': rule.get('disabled_at')
+                })
+        
+        plan = group_data.get('filter_plan')
+        if plan:
+            for pattern, reason in plan.rejected_rules.items():
+                described.append({'index': None, 'pattern': pattern, 'reason': reason, 'disabled_at': None})
+        return described
+
+    def get_disabled_rules(self) -> Dict[int, List[Dict[str, Any]]]:
+        """获取所有组中已停用的自定义规则"""
+        result = {}
+        for group_id, group_data in self.group_cache.items():
+            described = self._describe_disabled_rules(group_data)
+            if described:
+                result[group_id] = described
+        return result
+
+    def get_filter_profile(self, group_id: Optional[int] = None) -> Dict[str, Any]:
+        """获取过滤阶段和自定义规则的采样性能统计（进程池中执行的过滤不计入）"""
+        return self.message_filter.profiler.get_profile(group_id)
+
+    def _record_filter_decision(self, mode: str, group_id: Optional[int], message_id: Optional[int],
+                                chars: int, cost: int, elapsed: float):
+        """记录单条消息的过滤执行决策"""
+        self.filter_decision_counts[mode] += 1
+        self.filter_decisions.append({
+            'time': datetime.now().isoformat(),
+            'group_id': group_id,
+            'message_id': message_id,
+            'mode': mode,
+            'chars': chars,
+            'cost': cost,
+            'elapsed_ms': round(elapsed * 1000, 3)
+        })
+
+    def get_filter_execution_status(self) -> Dict[str, Any]:
+        """获取过滤执行模式和最近的执行决策"""
+        return {
+            'mode': self.filter_execution_mode,
+            'offload_threshold': self.filter_offload_threshold,
+            'counts': dict(self.filter_decision_counts),
+            'recent': list(self.filter_decisions)[-20:]
+        }
+
+    def _message_text(self, message, plan: FilterPlan):
+        """取出待过滤的文本和链接位置
+
+        默认使用 message.text（保留格式和文字链接）。需要删除链接且实体中标出了链接时改用原始文本:
+        实体偏移量基于原始文本，按偏移量删除可见的链接和提及；文字链接的地址不在原始文本中，
+        锚文字保留。没有可见链接实体时链接位置为 None，由正则查找链接。
+        """
+        entities = getattr(message, 'entities', None)
+        raw_text = getattr(message, 'raw_text', None)
+        if raw_text is not None and entities and 'remove_links' in plan.stages:
+            link_spans = self.message_filter.link_spans_from_entities(entities)
+            if link_spans is not None or self.message_filter.has_hidden_links(entities):
+                return raw_text, link_spans
+        return message.text or getattr(message, 'caption', None) or "", None
+
+    async def filter_batch(self, group_id: int, texts: List[str],
+                           link_spans: Optional[List[Optional[tuple]]] = None) -> List[str]:
+        """按组的过滤计划批量过滤文本（历史同步、重放），结果顺序与输入一致"""
+        group_data = await self._get_group_data(group_id)
+        if not group_data:
+            return []
+        
+        # 在线程中执行，避免大批量过滤阻塞事件循环
+        plan = group_data['filter_plan']
+        plan.resume_slow_rules()
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(
+            None,
+            functools.partial(self.message_filter.filter_batch, link_spans=link_spans),
+            texts,
+            plan,
+            self.settings.filter_batch_workers
+        )
+        
+        slow_rules = plan.take_slow_rules()
+        if slow_rules:
+            await self._disable_slow_rules(group_id, slow_rules)
+        return results
+
+    async def process_history(self, group_id: int, entries: List[Tuple[Any, str]]) -> int:
+        """处理一批历史消息，返回发送的条数
+
+        entries 按时间顺序排列，每项为 (消息, 内容哈希) 或 (媒体组项列表, 内容哈希)。
+        所有文本消息先用 filter_batch 整批过滤，再按原顺序和媒体组一起发送。
+        """
+        if not entries or not await self._should_process_group(group_id):
+            return 0
+        
+        group_data = await self._get_group_data(group_id)
+        if not group_data:
+            return 0
+        
+        plan = group_data['filter_plan']
+        texts, link_spans = [], []
+        for item, _ in entries:
+            if not isinstance(item, list):
+                text, spans = self._message_text(item, plan)
+                texts.append(text)
+                link_spans.append(spans)
+        filtered_texts = iter(await self.filter_batch(group_id, texts, link_spans))
+        
+        footer = group_data['config'].get('footer', '')
+        sent = 0
+        for item, content_hash in entries:
+            if isinstance(item, list):
+                filtered_media = await self._filter_media_group(group_data, item)
+                if filtered_media:
+                    await self._send_media_group_to_targets(group_data, filtered_media, content_hash, item[0]['message'].id)
+                    sent += 1
+                continue
+            
+            filtered_text = next(filtered_texts)
+            if not filtered_text.strip():
+                continue
+            if footer:
+                filtered_text += f"\n\n{footer}"
+            await self._send_to_targets(group_data, filtered_text, content_hash, item.id)
+            sent += 1
+        
+        return sent
+
     async def process_message(self, group_id: int, message, content_hash: str):
         """处理单条消息"""
         try:
@@ -131,40 +503,15 @@ class GroupProcessor:
             if config['status'] != 'active':
                 return False
             
-            # 检查调度时间
-            if config['schedule_start'] and config['schedule_end']:
-                return self._is_in_schedule_time(config['schedule_start'], config['schedule_end'])
-            
-            return True
+            # 检查调度时间（窗口状态由调度计时任务维护）
+            return group_data.get('in_schedule', True)
             
         except Exception as e:
             self.logger.error(f"❌ 检查组处理状态失败: {e}")
             return False
 
-    def _is_in_schedule_time(self, start_time: str, end_time: str) -> bool:
-        """检查是否在调度时间内"""
-        try:
-            now = datetime.now().time()
-            start = dt_time.fromisoformat(start_time)
-            end = dt_time.fromisoformat(end_time)
-            
-            if start <= end:
-                # 同一天的时间段
-                return start <= now <= end
-            else:
-                # 跨天的时间段
-                return now >= start or now <= end
-                
-        except Exception as e:
-            self.logger.error(f"❌ 检查调度时间失败: {e}")
-            return True
-
     async def _get_group_data(self, group_id: int) -> Optional[Dict]:
-        """获取组数据"""
-        # 检查缓存是否需要更新
-        if datetime.now().timestamp() - self.cache_update_time > 300:  # 5分钟
-            await self._load_groups()
-        
+        """获取组数据（缓存由变更通知保持最新）"""
         return self.group_cache.get(group_id)
 
     async def _filter_message(self, group_data: Dict, message) -> Optional[str]:
@@ -174,10 +521,11 @@ class GroupProcessor:
                 return None
             
             config = group_data['config']
-            filters = config.get('filters', {})
+            plan = group_data['filter_plan']
             
-            # 应用过滤器
-            filtered_text = self.message_filter.filter_text(message.text, filters)
+            # 应用过滤计划
+            text, link_spans = self._message_text(message, plan)
+            filtered_text = await self._run_filter(text, plan, config['id'], message.id, link_spans)
             
             # 如果过滤后为空，返回None
             if not filtered_text.strip():
@@ -198,7 +546,7 @@ class GroupProcessor:
         """过滤媒体组"""
         try:
             config = group_data['config']
-            filters = config.get('filters', {})
+            plan = group_data['filter_plan']
             
             filtered_media = []
             
@@ -206,9 +554,9 @@ class GroupProcessor:
                 message = msg_data['message']
                 
                 # 处理文本
-                text = message.text or message.caption or ""
+                text, link_spans = self._message_text(message, plan)
                 if text:
-                    filtered_text = self.message_filter.filter_text(text, filters)
+                    filtered_text = await self._run_filter(text, plan, config['id'], message.id, link_spans)
                 else:
                     filtered_text = ""
                 
@@ -332,9 +680,6 @@ class GroupProcessor:
             group_id = await self.database.create_forwarding_group(name, description)
             
             if group_id:
-                # 更新缓存
-                await self._load_groups()
-                
                 self.logger.info(f"✅ 创建搬运组成功: {name} (ID: {group_id})")
                 return {
                     'status': 'success',
@@ -354,9 +699,6 @@ class GroupProcessor:
             success = await self.database.add_source_channel(group_id, channel_id, channel_username, channel_title)
             
             if success:
-                # 更新缓存
-                await self._load_groups()
-                
                 self.logger.info(f"✅ 添加源频道成功: 组{group_id} -> 频道{channel_id}")
                 return {'status': 'success', 'message': '源频道添加成功'}
             else:
@@ -372,9 +714,6 @@ class GroupProcessor:
             success = await self.database.add_target_channel(group_id, channel_id, channel_username, channel_title)
             
             if success:
-                # 更新缓存
-                await self._load_groups()
-                
                 self.logger.info(f"✅ 添加目标频道成功: 组{group_id} -> 频道{channel_id}")
                 return {'status': 'success', 'message': '目标频道添加成功'}
             else:
@@ -392,9 +731,10 @@ class GroupProcessor:
                 return {'status': 'error', 'message': '搬运组不存在'}
             
             # 获取当前过滤器配置
-            current_filters = group_data['config'].get('filters', {})
+            current_filters = dict(group_data['config'].get('filters', {}))
             
             # 更新过滤器
+            warnings = []
             if filter_type == 'remove_links':
                 current_filters['remove_links'] = enabled
             elif filter_type == 'remove_emojis':
@@ -406,16 +746,22 @@ class GroupProcessor:
             elif filter_type == 'smart_filter':
                 current_filters['smart_filter'] = enabled
             elif filter_type == 'custom' and rules:
+                # 静态检查自定义正则，拒绝可能出现灾难性回溯的模式
+                for rule in rules:
+                    if isinstance(rule, dict) and rule.get('type') == 'regex' and rule.get('pattern'):
+                        issues = check_regex(rule['pattern'])
+                        if issues['errors']:
+                            return {'status': 'error', 'message': f"正则 {rule['pattern']!r} 不安全: {'; '.join(issues['errors'])}"}
+                        warnings.extend(f"{rule['pattern']!r}: {warning}" for warning in issues['warnings'])
                 current_filters['custom_rules'] = rules
             
             # 保存到数据库
             success = await self.database.update_group_filters(group_id, current_filters)
             
             if success:
-                # 更新缓存
-                await self._load_groups()
-                
                 self.logger.info(f"✅ 更新组过滤器成功: 组{group_id}, 类型{filter_type}")
+                if warnings:
+                    return {'status': 'success', 'message': '过滤器设置成功', 'warnings': warnings}
                 return {'status': 'success', 'message': '过滤器设置成功'}
             else:
                 return {'status': 'error', 'message': '更新过滤器失败'}
@@ -430,9 +776,6 @@ class GroupProcessor:
             success = await self.database.set_group_schedule(group_id, start_time, end_time)
             
             if success:
-                # 更新缓存
-                await self._load_groups()
-                
                 self.logger.info(f"✅ 设置组调度成功: 组{group_id}, {start_time}-{end_time}")
                 return {'status': 'success', 'message': f'调度设置成功: {start_time}-{end_time}'}
             else:
@@ -507,6 +850,7 @@ class GroupProcessor:
                     'end': config.get('schedule_end')
                 },
                 'filters': config.get('filters', {}),
+                'disabled_rules': self._describe_disabled_rules(group_data),
                 'footer': config.get('footer', ''),
                 'source_channels': source_channels,
                 'target_channels': target_channels,
@@ -534,6 +878,8 @@ class GroupProcessor:
                 'inactive_groups': total_groups - active_groups,
                 'total_source_channels': total_sources,
                 'total_target_channels': total_targets,
+                'filter_cache': self.filter_cache.get_stats(),
+                'filter_execution': self.get_filter_execution_status(),
                 'is_running': self.is_running
             }
             
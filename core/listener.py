@@ -5,29 +5,83 @@
 import asyncio
 import logging
 import hashlib
-from typing import Dict, List, Set, Any
+from collections import OrderedDict
+from typing import Callable, Dict, List, Set, Any, Optional, Tuple
 from telethon import events
 from telethon.tl.types import MessageMediaPhoto, MessageMediaDocument
 
+from utils.fair_queue import FairQueue, OVERFLOW_POLICIES
+from utils.keyed_executor import KeyedExecutor
+from .media_aggregator import MediaAggregator
+
+
+# 最近入队的 (频道ID, 消息ID)，多个账号收到同一条消息时只入队一次
+RECENT_MESSAGES_LIMIT = 4096
+
 
 class MessageListener:
-    """消息监听器"""
+    """消息监听器
+
+    每个客户端只注册一个 NewMessage 处理器，不按频道过滤；
+    处理器在 channel_groups 路由索引 (频道ID -> 组ID元组) 中查找订阅的组，
+    每条消息构造一个信封放入所有订阅组的有界队列，哈希和去重结果在信封上只计算一次。
+    分发协程按赤字轮询从各组队列取消息，按源频道哈希交给串行通道执行，
+    同一频道的消息按顺序处理（直到发送器），不同频道并行，单个频道刷屏不会饿死其他组。
+    增删频道只修改索引，不重新注册处理器。
+    """
     
-    def __init__(self, settings, database, group_processor):
+    def __init__(self, settings, database, group_processor, account_manager=None):
         self.settings = settings
         self.database = database
         self.group_processor = group_processor
+        self.account_manager = account_manager
         self.logger = logging.getLogger(__name__)
         
         # 监听状态
         self.is_running = False
-        self.listening_channels: Set[int] = set()
-        self.media_groups: Dict[int, List] = {}  # 媒体组缓存
-        self.media_group_timers: Dict[int, asyncio.Task] = {}
         
-        # 处理队列
-        self.message_queue = asyncio.Queue()
+        # 路由索引: 频道ID -> 订阅组ID元组（替换而不原地修改，已入队的信封不受影响）
+        self.channel_groups: Dict[int, Tuple[int, ...]] = {}
+        # 反向索引: 组ID -> 源频道ID集合，用于按组增量同步
+        self.group_channels: Dict[int, Set[int]] = {}
+        
+        # 已注册的事件处理器: 账号 -> (客户端, 处理器)
+        self._handlers: Dict[str, Tuple[Any, Callable]] = {}
+        self._recent_messages: OrderedDict = OrderedDict()
+        
+        # 统计
+        self.envelopes = 0
+        self.deliveries = 0
+        self.duplicate_events = 0
+        
+        # 媒体组聚合（单个任务按截止时间关闭相册）
+        self.media_aggregator = MediaAggregator(self._on_album_complete, settings.media_group_wait)
+        
+        # 处理队列: 每组一个有界队列，赤字轮询调度
+        overflow = settings.listener_overflow
+        if overflow not in OVERFLOW_POLICIES:
+            self.logger.warning(f"⚠️ 未知的队列溢出策略 {overflow}，使用 block")
+            overflow = 'block'
+        self.group_queues = FairQueue(
+            max_depth=settings.listener_queue_size,
+            overflow=overflow,
+            weights=settings.listener_group_weights,
+            cost=self._delivery_cost,
+            spill_dir=settings.listener_spill_dir,
+            spill_record=self._spill_record,
+            restore=self._restore_spilled
+        )
         self.queue_processors = []
+        self._album_dispatches: Set[asyncio.Task] = set()
+        
+        # 串行通道: 同一源频道的投递总在同一通道内按顺序执行
+        self.delivery_lanes = KeyedExecutor(
+            self._run_delivery,
+            lanes=settings.listener_workers,
+            capacity=settings.listener_lane_capacity,
+            on_space=self.group_queues.notify,
+            name='监听'
+        )
 
     async def start(self):
         """启动消息监听器"""
@@ -37,11 +91,21 @@ class MessageListener:
         await self._setup_listeners()
         
         # 启动消息处理队列
-        for i in range(3):  # 启动3个处理器
-            processor = asyncio.create_task(self._message_processor())
-            self.queue_processors.append(processor)
-        
         self.is_running = True
+        await self.media_aggregator.start()
+        self.group_queues.load_spill()
+        await self.delivery_lanes.start()
+        self.queue_processors.append(asyncio.create_task(self._message_processor()))
+        
+        # 为每个客户端注册一个处理器，之后登录的账号通过通知注册
+        if self.account_manager:
+            for phone, client in list(self.account_manager.clients.items()):
+                self._register_client(phone, client)
+            self.account_manager.subscribe_clients(self._on_client_change)
+        
+        # 组处理器先于监听器订阅，收到通知时它的组缓存已经刷新
+        self.database.subscribe(self._on_database_change)
+        
         self.logger.info("✅ 消息监听器启动完成")
 
     async def stop(self):
@@ -49,9 +113,17 @@ class MessageListener:
         self.logger.info("🛑 停止消息监听器...")
         self.is_running = False
         
-        # 停止媒体组定时器
-        for timer in self.media_group_timers.values():
-            timer.cancel()
+        # 注销事件处理器
+        self.database.unsubscribe(self._on_database_change)
+        if self.account_manager:
+            self.account_manager.unsubscribe_clients(self._on_client_change)
+        for phone in list(self._handlers):
+            self._unregister_client(phone)
+        
+        # 停止媒体组聚合
+        await self.media_aggregator.stop()
+        for task in list(self._album_dispatches):
+            task.cancel()
         
         # 停止队列处理器
         for processor in self.queue_processors:
@@ -60,174 +132,369 @@ class MessageListener:
         # 等待处理器完成
         if self.queue_processors:
             await asyncio.gather(*self.queue_processors, return_exceptions=True)
+        await self.delivery_lanes.stop()
+        await self.group_queues.close()
         
         self.queue_processors.clear()
-        self.listening_channels.clear()
+        self._clear_index()
+        self._recent_messages.clear()
         
         self.logger.info("✅ 消息监听器已停止")
 
+    @property
+    def listening_channels(self) -> Set[int]:
+        """正在监听的频道"""
+        return set(self.channel_groups)
+
     async def _setup_listeners(self):
-        """设置监听器"""
+        """由组处理器的缓存建立路由索引
+
+        所有组的源频道都进入索引，组状态和调度时间由组处理器在处理时判断，
+        调度切换组状态时不需要改动索引。
+        """
         try:
-            groups = await self.database.get_forwarding_groups()
+            self._clear_index()
             
-            for group in groups:
-                if group['status'] != 'active':
-                    continue
-                
-                # 获取组的源频道
-                source_channels, _ = await self.database.get_group_channels(group['id'])
-                
-                for channel in source_channels:
-                    channel_id = channel['channel_id']
-                    if channel_id not in self.listening_channels:
-                        await self._add_channel_listener(channel_id, group['id'])
-                        self.listening_channels.add(channel_id)
+            for group_id, group_data in self.group_processor.group_cache.items():
+                self._sync_group_channels(group_id, group_data)
             
-            self.logger.info(f"📡 监听 {len(self.listening_channels)} 个频道")
+            self.logger.info(f"📡 监听 {len(self.channel_groups)} 个频道")
             
         except Exception as e:
             self.logger.error(f"❌ 设置监听器失败: {e}")
 
-    async def _add_channel_listener(self, channel_id: int, group_id: int):
-        """为频道添加监听器"""
+    def _clear_index(self):
+        """清空路由索引"""
+        if self.account_manager:
+            for channel_id in self.channel_groups:
+                self.account_manager.remove_shard_channel(channel_id)
+        self.channel_groups.clear()
+        self.group_channels.clear()
+
+    def _sync_group_channels(self, group_id: int, group_data: Optional[Dict]):
+        """按组的当前源频道增量更新路由索引"""
+        channels = {channel['channel_id'] for channel in group_data['source_channels']} if group_data else set()
+        current = self.group_channels.get(group_id, set())
+        
+        for channel_id in current - channels:
+            self._unlink(channel_id, group_id)
+        for channel_id in channels - current:
+            self._link(channel_id, group_id)
+
+    def _link(self, channel_id: int, group_id: int) -> bool:
+        """把组加入频道的订阅列表"""
+        group_ids = self.channel_groups.get(channel_id, ())
+        if group_id in group_ids:
+            return False
+        
+        self.channel_groups[channel_id] = group_ids + (group_id,)
+        self.group_channels.setdefault(group_id, set()).add(channel_id)
+        if not group_ids and self.account_manager:
+            self.account_manager.add_shard_channel(channel_id)
+        return True
+
+    def _unlink(self, channel_id: int, group_id: int) -> bool:
+        """把组从频道的订阅列表中移除"""
+        group_ids = self.channel_groups.get(channel_id, ())
+        if group_id not in group_ids:
+            return False
+        
+        remaining = tuple(gid for gid in group_ids if gid != group_id)
+        if remaining:
+            self.channel_groups[channel_id] = remaining
+        else:
+            del self.channel_groups[channel_id]
+            if self.account_manager:
+                self.account_manager.remove_shard_channel(channel_id)
+        
+        channels = self.group_channels.get(group_id)
+        if channels is not None:
+            channels.discard(channel_id)
+            if not channels:
+                del self.group_channels[group_id]
+        return True
+
+    async def _on_database_change(self, entity: str, entity_id):
+        """数据库变更通知: 只同步受影响组的源频道"""
+        if entity == 'group':
+            group_ids = [entity_id]
+        elif entity == 'groups':
+            group_ids = entity_id
+        else:
+            return
+        
+        for group_id in group_ids:
+            try:
+                self._sync_group_channels(group_id, self.group_processor.group_cache.get(group_id))
+            except Exception as e:
+                self.logger.error(f"❌ 同步组监听频道失败 {group_id}: {e}")
+
+    def _on_client_change(self, event: str, phone: str, client):
+        """账号增减通知"""
+        if event == 'added':
+            self._register_client(phone, client)
+        elif event == 'removed':
+            self._unregister_client(phone)
+
+    def _register_client(self, phone: str, client):
+        """为客户端注册（唯一的）新消息处理器"""
+        if phone in self._handlers:
+            if self._handlers[phone][0] is client:
+                return
+            self._unregister_client(phone)
+        
         try:
-            # 从账号管理器获取客户端
-            from core.manager import ForwarderManager
-            
-            # 这里需要通过依赖注入或其他方式获取账号管理器
-            # 暂时使用简化的方式
-            pass
+            handler = self._make_handler(phone)
+            client.add_event_handler(handler, events.NewMessage())
+            self._handlers[phone] = (client, handler)
+            self.logger.info(f"📡 账号 {phone} 已注册消息处理器")
             
         except Exception as e:
-            self.logger.error(f"❌ 添加频道监听器失败 {channel_id}: {e}")
+            self.logger.error(f"❌ 注册消息处理器失败 {phone}: {e}")
+
+    def _unregister_client(self, phone: str):
+        """注销客户端的新消息处理器"""
+        entry = self._handlers.pop(phone, None)
+        if not entry:
+            return
+        
+        client, handler = entry
+        try:
+            client.remove_event_handler(handler)
+        except Exception as e:
+            self.logger.error(f"❌ 注销消息处理器失败 {phone}: {e}")
+
+    def _make_handler(self, phone: str):
+        """创建新消息处理器: 查路由索引，把信封放入订阅组的队列"""
+        async def on_new_message(event):
+            channel_id = event.chat_id
+            group_ids = self.channel_groups.get(channel_id)
+            if group_ids is None:
+                # 数据库中也可能保存的是不带 -100 前缀的频道ID
+                peer_channel_id = getattr(event.message.peer_id, 'channel_id', None)
+                group_ids = self.channel_groups.get(peer_channel_id)
+                if group_ids is None:
+                    return
+                channel_id = peer_channel_id
+            
+            # 分片模式下只处理分配给本账号的频道
+            if self.account_manager:
+                self.account_manager.record_update(phone, channel_id)
+                if not self.account_manager.owns_channel(phone, channel_id):
+                    return
+            
+            key = (channel_id, event.message.id)
+            if key in self._recent_messages:
+                self.duplicate_events += 1
+                return
+            self._recent_messages[key] = None
+            if len(self._recent_messages) > RECENT_MESSAGES_LIMIT:
+                self._recent_messages.popitem(last=False)
+            
+            # 媒体组项直接交给聚合器，收集完成后作为一个信封入队
+            if event.message.grouped_id:
+                await self._handle_media_group(event.message, group_ids, channel_id)
+                return
+            
+            await self._dispatch({
+                'message': event.message,
+                'channel_id': channel_id,
+                'group_ids': group_ids
+            })
+        
+        return on_new_message
+
+    async def _dispatch(self, envelope: Dict):
+        """把信封放入每个订阅组的队列（各组分别等待空位，一个组满了不耽误其他组）"""
+        self.envelopes += 1
+        group_ids = envelope['group_ids']
+        if len(group_ids) == 1:
+            await self.group_queues.put(group_ids[0], envelope)
+        else:
+            await asyncio.gather(*(self.group_queues.put(group_id, envelope) for group_id in group_ids))
+
+    @staticmethod
+    def _delivery_cost(envelope: Dict) -> int:
+        """轮询成本: 媒体组按项数计"""
+        album = envelope.get('album')
+        return len(album) if album else 1
+
+    def _lane_ready(self, envelope: Dict) -> bool:
+        """信封所在的串行通道是否还有空位"""
+        return self.delivery_lanes.has_space(envelope['channel_id'])
 
     async def _message_processor(self):
-        """消息处理器"""
+        """分发协程: 按赤字轮询取消息，交给源频道对应的串行通道
+
+        只有一个分发协程，同一频道的投递按出队顺序进入通道；
+        通道已满的组本轮跳过，不阻塞其他通道。
+        """
         while self.is_running:
             try:
-                # 从队列获取消息
-                message_data = await asyncio.wait_for(
-                    self.message_queue.get(),
-                    timeout=1.0
-                )
-                
-                await self._process_message(message_data)
+                group_id, envelope = await self.group_queues.get(ready=self._lane_ready)
+                self.delivery_lanes.submit(envelope['channel_id'], (group_id, envelope))
                 
-            except asyncio.TimeoutError:
-                continue
             except asyncio.CancelledError:
                 break
             except Exception as e:
-                self.logger.error(f"❌ 处理消息异常: {e}")
+                self.logger.error(f"❌ 分发消息异常: {e}")
 
-    async def _process_message(self, message_data: Dict):
-        """处理单条消息"""
-        try:
-            message = message_data['message']
-            group_id = message_data['group_id']
-            channel_id = message_data['channel_id']
-            
-            # 检查消息是否有媒体组
-            if message.grouped_id:
-                await self._handle_media_group(message, group_id, channel_id)
+    async def _run_delivery(self, delivery: Tuple[int, Dict]):
+        """串行通道执行一次投递"""
+        group_id, envelope = delivery
+        await self._deliver(group_id, envelope)
+
+    def _content_hash(self, envelope: Dict) -> str:
+        """信封的内容哈希（首次使用时计算）"""
+        content_hash = envelope.get('content_hash')
+        if content_hash is None:
+            album = envelope.get('album')
+            if album:
+                content_hash = self._generate_media_group_hash(album)
             else:
-                # 单条消息直接处理
-                await self._handle_single_message(message, group_id, channel_id)
-                
-        except Exception as e:
-            self.logger.error(f"❌ 处理消息失败: {e}")
+                content_hash = self._generate_message_hash(envelope['message'])
+            envelope['content_hash'] = content_hash
+        return content_hash
+
+    async def _is_forwarded(self, envelope: Dict) -> bool:
+        """去重检查每个信封只做一次，所有订阅组看到相同的结果
+
+        先处理的组转发后会写入去重记录，后处理的组若各自查询会被误判为已转发。
+        """
+        verdict = envelope.get('forwarded')
+        if verdict is None:
+            verdict = envelope['forwarded'] = asyncio.get_running_loop().create_future()
+            try:
+                verdict.set_result(await self.database.is_message_forwarded(self._content_hash(envelope)))
+            except Exception as e:
+                verdict.set_exception(e)
+        return await asyncio.shield(verdict)
 
-    async def _handle_single_message(self, message, group_id: int, channel_id: int):
-        """处理单条消息"""
+    async def _deliver(self, group_id: int, envelope: Dict):
+        """把信封交给一个组处理"""
         try:
-            # 生成消息哈希用于去重
-            content_hash = self._generate_message_hash(message)
+            album = envelope.get('album')
             
             # 检查是否已经转发过
-            if await self.database.is_message_forwarded(content_hash):
-                self.logger.debug(f"📋 消息已转发，跳过: {message.id}")
+            if await self._is_forwarded(envelope):
+                if album:
+                    self.logger.debug(f"📋 媒体组已转发，跳过: {album[0]['message'].grouped_id}")
+                else:
+                    self.logger.debug(f"📋 消息已转发，跳过: {envelope['message'].id}")
                 return
             
-            # 更新最后处理的消息ID
-            await self.database.update_last_message_id(group_id, channel_id, message.id)
-            
-            # 发送给组处理器
-            await self.group_processor.process_message(group_id, message, content_hash)
+            content_hash = self._content_hash(envelope)
+            if album:
+                # 更新最后处理的消息ID（使用最后一条消息的ID）
+                await self.database.update_last_message_id(group_id, envelope['channel_id'], album[-1]['message'].id)
+                
+                # 发送给组处理器
+                await self.group_processor.process_media_group(group_id, album, content_hash)
+            else:
+                message = envelope['message']
+                
+                # 更新最后处理的消息ID
+                await self.database.update_last_message_id(group_id, envelope['channel_id'], message.id)
+                
+                # 发送给组处理器
+                await self.group_processor.process_message(group_id, message, content_hash)
+            self.deliveries += 1
             
         except Exception as e:
-            self.logger.error(f"❌ 处理单条消息失败: {e}")
+            self.logger.error(f"❌ 处理消息失败 组{group_id}: {e}")
 
-    async def _handle_media_group(self, message, group_id: int, channel_id: int):
-        """处理媒体组消息"""
+    async def _handle_media_group(self, message, group_ids: Tuple[int, ...], channel_id: int):
+        """处理媒体组消息（交给聚合器收集）"""
         try:
-            grouped_id = message.grouped_id
-            
-            # 初始化媒体组
-            if grouped_id not in self.media_groups:
-                self.media_groups[grouped_id] = []
-            
-            # 添加消息到媒体组
-            self.media_groups[grouped_id].append({
+            await self.media_aggregator.add(channel_id, message.grouped_id, {
                 'message': message,
-                'group_id': group_id,
+                'group_ids': group_ids,
                 'channel_id': channel_id
             })
             
-            # 取消之前的定时器
-            if grouped_id in self.media_group_timers:
-                self.media_group_timers[grouped_id].cancel()
-            
-            # 设置新的定时器（5秒后处理媒体组）
-            timer = asyncio.create_task(
-                self._process_media_group_delayed(grouped_id)
-            )
-            self.media_group_timers[grouped_id] = timer
-            
         except Exception as e:
             self.logger.error(f"❌ 处理媒体组失败: {e}")
 
-    async def _process_media_group_delayed(self, grouped_id: int):
-        """延迟处理媒体组"""
-        try:
-            # 等待5秒收集完整的媒体组
-            await asyncio.sleep(5)
+    async def _on_album_complete(self, messages: List[Dict]):
+        """相册收集完成，作为一个信封放入订阅组的队列
+
+        在聚合任务中调用，不能等待队列空位（block 策略下一个满的组会卡住所有频道的相册收集），
+        入队放到单独的任务中进行。
+        """
+        # 按消息ID排序确保顺序
+        messages.sort(key=lambda x: x['message'].id)
+        
+        # 使用第一条消息的信息
+        first_msg_data = messages[0]
+        task = asyncio.create_task(self._dispatch({
+            'album': messages,
+            'channel_id': first_msg_data['channel_id'],
+            'group_ids': first_msg_data['group_ids']
+        }))
+        self._album_dispatches.add(task)
+        task.add_done_callback(self._album_dispatches.discard)
+
+    async def _spill_record(self, group_id: int, envelope: Dict) -> Optional[Dict]:
+        """溢出到磁盘的记录: 只保存消息ID，恢复时重新获取（已转发的消息不保存）"""
+        if await self._is_forwarded(envelope):
+            return None
+        
+        album = envelope.get('album')
+        messages = [item['message'] for item in album] if album else [envelope['message']]
+        return {
+            'channel_id': envelope['channel_id'],
+            'message_ids': [message.id for message in messages],
+            'album': bool(album),
+            'content_hash': self._content_hash(envelope)
+        }
+
+    async def _restore_spilled(self, group_id: int, records: List[Dict]) -> List[Dict]:
+        """按溢出记录重新获取消息，重建只属于该组的信封"""
+        by_channel: Dict[int, List[int]] = {}
+        for record in records:
+            by_channel.setdefault(record['channel_id'], []).extend(record['message_ids'])
+        
+        fetched: Dict[Tuple[int, int], Any] = {}
+        for channel_id, message_ids in by_channel.items():
+            if not self.account_manager:
+                break
+            selected = await self.account_manager.get_client_for_channel(channel_id)
+            if not selected:
+                self.logger.warning(f"⚠️ 没有可用账号恢复溢出消息: 频道{channel_id}")
+                continue
             
-            if grouped_id in self.media_groups:
-                messages = self.media_groups[grouped_id]
-                
-                if messages:
-                    # 使用第一条消息的信息
-                    first_msg_data = messages[0]
-                    group_id = first_msg_data['group_id']
-                    channel_id = first_msg_data['channel_id']
-                    
-                    # 按消息ID排序确保顺序
-                    messages.sort(key=lambda x: x['message'].id)
-                    
-                    # 生成媒体组哈希
-                    content_hash = self._generate_media_group_hash(messages)
-                    
-                    # 检查是否已经转发过
-                    if not await self.database.is_message_forwarded(content_hash):
-                        # 更新最后处理的消息ID（使用最后一条消息的ID）
-                        last_message = messages[-1]['message']
-                        await self.database.update_last_message_id(group_id, channel_id, last_message.id)
-                        
-                        # 发送给组处理器
-                        await self.group_processor.process_media_group(group_id, messages, content_hash)
-                    else:
-                        self.logger.debug(f"📋 媒体组已转发，跳过: {grouped_id}")
-                
-                # 清理媒体组缓存
-                del self.media_groups[grouped_id]
+            client, _ = selected
+            messages = await client.get_messages(channel_id, ids=message_ids)
+            for message in messages:
+                if message is not None:
+                    fetched[(channel_id, message.id)] = message
+        
+        envelopes = []
+        for record in records:
+            channel_id = record['channel_id']
+            messages = [fetched.get((channel_id, message_id)) for message_id in record['message_ids']]
+            if not messages or any(message is None for message in messages):
+                continue
             
-            # 清理定时器
-            if grouped_id in self.media_group_timers:
-                del self.media_group_timers[grouped_id]
-                
-        except Exception as e:
-            self.logger.error(f"❌ 延迟处理媒体组失败: {e}")
+            # 去重检查已在溢出时完成
+            verdict = asyncio.get_running_loop().create_future()
+            verdict.set_result(False)
+            envelope = {
+                'channel_id': channel_id,
+                'group_ids': (group_id,),
+                'content_hash': record['content_hash'],
+                'forwarded': verdict
+            }
+            if record['album']:
+                envelope['album'] = [
+                    {'message': message, 'group_ids': (group_id,), 'channel_id': channel_id}
+                    for message in messages
+                ]
+            else:
+                envelope['message'] = messages[0]
+            envelopes.append(envelope)
+        
+        return envelopes
 
     def _generate_message_hash(self, message) -> str:
         """生成消息哈希用于去重"""
@@ -292,23 +559,62 @@ class MessageListener:
             return f"group_{first_message.grouped_id}_{first_message.chat_id}"
 
     async def sync_history(self, group_id: int, channel_id: int, limit: int = 100) -> Dict[str, Any]:
-        """同步历史消息"""
+        """同步历史消息
+
+        用负责该频道的账号取出最近 limit 条消息，跳过已转发的内容，
+        交给组处理器按时间顺序整批过滤并发送。
+        """
         try:
             self.logger.info(f"🔄 开始同步历史消息: 组{group_id}, 频道{channel_id}, 限制{limit}")
             
-            # 获取账号管理器的客户端
-            # 这里需要依赖注入，暂时省略具体实现
-            # client, phone = await self.account_manager.get_current_client()
-            
-            synced_count = 0
+            selected = await self.account_manager.get_client_for_channel(channel_id) if self.account_manager else None
+            if not selected:
+                return {'status': 'error', 'synced_count': 0, 'error_count': 0, 'message': '没有可用的监听账号'}
+            client, _ = selected
+            
+            # get_messages 按从新到旧返回
+            messages = list(reversed(await client.get_messages(channel_id, limit=limit)))
+            
+            # 媒体组项按 grouped_id 合并，没有文本的单条消息不转发
+            entries = []
+            albums: Dict[int, List[Dict]] = {}
+            for message in messages:
+                if message.grouped_id:
+                    album = albums.get(message.grouped_id)
+                    if album is None:
+                        album = albums[message.grouped_id] = []
+                        entries.append(album)
+                    album.append({'message': message, 'group_ids': (group_id,), 'channel_id': channel_id})
+                elif message.text:
+                    entries.append(message)
+            
+            # 跳过已转发的内容和本批中重复的内容
+            pending = []
+            seen: Set[str] = set()
             error_count = 0
+            for item in entries:
+                try:
+                    if isinstance(item, list):
+                        content_hash = self._generate_media_group_hash(item)
+                    else:
+                        content_hash = self._generate_message_hash(item)
+                    if content_hash in seen:
+                        continue
+                    seen.add(content_hash)
+                    if not await self.database.is_message_forwarded(content_hash):
+                        pending.append((item, content_hash))
+                except Exception as e:
+                    error_count += 1
+                    self.logger.error(f"❌ 检查历史消息失败: {e}")
             
-            # 这里应该实现实际的历史消息同步逻辑
-            # 遍历历史消息并处理
+            synced_count = await self.group_processor.process_history(group_id, pending)
+            if messages:
+                await self.database.update_last_message_id(group_id, channel_id, messages[-1].id)
             
             result = {
                 'status': 'success',
                 'synced_count': synced_count,
+                'skipped_count': len(entries) - len(pending) - error_count,
                 'error_count': error_count,
                 'message': f'同步完成: {synced_count} 条消息'
             }
@@ -326,22 +632,21 @@ class MessageListener:
             }
 
     async def add_channel_to_listen(self, channel_id: int, group_id: int):
-        """添加频道到监听列表"""
+        """添加频道到监听列表（只更新路由索引）"""
         try:
-            if channel_id not in self.listening_channels:
-                await self._add_channel_listener(channel_id, group_id)
-                self.listening_channels.add(channel_id)
-                self.logger.info(f"📡 添加频道监听: {channel_id}")
+            if self._link(channel_id, group_id):
+                self.logger.info(f"📡 添加频道监听: {channel_id} -> 组{group_id}")
                 
         except Exception as e:
             self.logger.error(f"❌ 添加频道监听失败: {e}")
 
-    async def remove_channel_from_listen(self, channel_id: int):
-        """从监听列表移除频道"""
+    async def remove_channel_from_listen(self, channel_id: int, group_id: Optional[int] = None):
+        """从监听列表移除频道（未指定组时移除该频道的所有订阅）"""
         try:
-            if channel_id in self.listening_channels:
-                self.listening_channels.remove(channel_id)
-                self.logger.info(f"📡 移除频道监听: {channel_id}")
+            group_ids = [group_id] if group_id is not None else list(self.channel_groups.get(channel_id, ()))
+            removed = [gid for gid in group_ids if self._unlink(channel_id, gid)]
+            if removed:
+                self.logger.info(f"📡 移除频道监听: {channel_id} (组{removed})")
                 
         except Exception as e:
             self.logger.error(f"❌ 移除频道监听失败: {e}")
@@ -350,8 +655,17 @@ class MessageListener:
         """获取监听状态"""
         return {
             'is_running': self.is_running,
-            'listening_channels': list(self.listening_channels),
-            'active_media_groups': len(self.media_groups),
-            'queue_size': self.message_queue.qsize(),
-            'processors': len(self.queue_processors)
+            'listening_channels': list(self.channel_groups),
+            'routes': sum(len(group_ids) for group_ids in self.channel_groups.values()),
+            'handlers': list(self._handlers),
+            'envelopes': self.envelopes,
+            'deliveries': self.deliveries,
+            'duplicate_events': self.duplicate_events,
+            'active_media_groups': self.media_aggregator.pending,
+            'media_groups': self.media_aggregator.get_statistics(),
+            'queue_size': self.group_queues.get_statistics()['total_depth'],
+            'queues': self.group_queues.get_statistics(),
+            'processors': self.delivery_lanes.lanes,
+            'lanes': self.delivery_lanes.get_statistics(),
+            'dedup': self.database.get_dedup_stats()
         }
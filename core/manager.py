@@ -37,7 +37,7 @@ class ForwarderManager:
         self.message_sender = MessageSender(settings, database)
         self.group_processor = GroupProcessor(settings, database)
         self.task_scheduler = TaskScheduler(settings, database)
-        self.message_listener = MessageListener(settings, database, self.group_processor)
+        self.message_listener = MessageListener(settings, database, self.group_processor, self.account_manager)
         
         # Bot应用 - 仅用于Web登录验证
         self.bot_app = None
@@ -255,6 +255,14 @@ class ForwarderManager:
         """获取组详情"""
         return await self.group_processor.get_group_info(group_id)
 
+    async def get_disabled_filter_rules(self) -> Dict:
+        """获取各组已停用的自定义过滤规则"""
+        return self.group_processor.get_disabled_rules()
+
+    async def get_filter_profile(self, group_id: int = None) -> Dict:
+        """获取过滤性能采样统计"""
+        return self.group_processor.get_filter_profile(group_id)
+
     async def create_group(self, name: str, description: str = None) -> Dict:
         """创建搬运组"""
         return await self.group_processor.create_group(name, description)
@@ -0,0 +1,224 @@
+"""
+媒体组聚合器 - 用截止时间堆收集相册消息，单个任务按截止时间关闭相册
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque, OrderedDict
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+
+# Telegram 相册最多 10 项，收齐即关闭
+MAX_ALBUM_ITEMS = 10
+
+# 学习到的项间隔的倍数和下限（秒）：等待 max(下限, 间隔 * 倍数) 没有新项即认为相册完整
+GAP_FACTOR = 3.0
+MIN_GAP_TIMEOUT = 0.5
+
+# 项间隔的指数平滑系数
+GAP_SMOOTHING = 0.2
+
+# 记住最近关闭的相册，用于识别并丢弃迟到的项
+RECENT_ALBUMS_LIMIT = 1024
+
+# 延迟统计的样本数
+LATENCY_SAMPLES = 1024
+
+
+class _Album:
+    """收集中的相册"""
+
+    __slots__ = ('key', 'channel_id', 'items', 'arrivals', 'first_at', 'deadline')
+
+    def __init__(self, key: Tuple[int, int], channel_id: int, now: float):
+        self.key = key
+        self.channel_id = channel_id
+        self.items: List[Dict] = []
+        self.arrivals: List[float] = []
+        self.first_at = now
+        self.deadline = now
+
+
+class MediaAggregator:
+    """媒体组聚合器
+
+    每个相册在堆中以 (截止时间, 序号, 键) 登记，新项到达时推入新的截止时间，
+    旧的堆项在弹出时按截止时间不一致丢弃。截止时间为
+    min(最后一项到达 + 该频道的间隔超时, 第一项到达 + max_wait)；
+    频道还没有间隔样本时间隔超时取 max_wait。收齐 MAX_ALBUM_ITEMS 项时立即关闭。
+    关闭后才到达的项（最近关闭的相册中仍有记录）丢弃并放宽该频道的间隔，不会开始第二个相册。
+    """
+
+    def __init__(self, on_complete: Callable[[List[Dict]], Awaitable], max_wait: float = 5.0):
+        self.on_complete = on_complete
+        self.max_wait = max_wait
+        self.logger = logging.getLogger(__name__)
+
+        self._albums: Dict[Tuple[int, int], _Album] = {}
+        self._heap: List[Tuple[float, int, Tuple[int, int]]] = []
+        self._sequence = itertools.count()
+        self._channel_gaps: Dict[int, float] = {}
+        self._recent_albums: OrderedDict = OrderedDict()
+
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+        # 统计
+        self.albums = 0
+        self.items = 0
+        self.closed_full = 0
+        self.closed_gap = 0
+        self.closed_timeout = 0
+        self.late_items = 0
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+
+    async def start(self):
+        """启动聚合任务"""
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止聚合任务（未关闭的相册丢弃）"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._albums.clear()
+        self._heap.clear()
+
+    @property
+    def pending(self) -> int:
+        return len(self._albums)
+
+    def gap_timeout(self, channel_id: int) -> float:
+        """该频道相册项之间允许的最大间隔"""
+        gap = self._channel_gaps.get(channel_id)
+        if gap is None:
+            return self.max_wait
+        return min(self.max_wait, max(MIN_GAP_TIMEOUT, gap * GAP_FACTOR))
+
+    async def add(self, channel_id: int, grouped_id: int, item: Dict):
+        """加入一个相册项"""
+        now = time.monotonic()
+        key = (channel_id, grouped_id)
+        self.items += 1
+
+        album = self._albums.get(key)
+        if album is None:
+            if key in self._recent_albums:
+                # 相册已按学习到的间隔关闭: 放宽该频道的间隔，丢弃这一项（不拆成第二个相册）
+                self.late_items += 1
+                self._channel_gaps[channel_id] = max(self._channel_gaps.get(channel_id, 0.0) * 2, now - self._recent_albums[key])
+                self.logger.warning(
+                    f"⚠️ 媒体组关闭后迟到的项已丢弃: 频道{channel_id} 组{grouped_id}，"
+                    f"间隔超时放宽到 {self.gap_timeout(channel_id):.2f}s"
+                )
+                return
+
+            album = self._albums[key] = _Album(key, channel_id, now)
+            self.albums += 1
+
+        album.items.append(item)
+        album.arrivals.append(now)
+
+        if len(album.items) >= MAX_ALBUM_ITEMS:
+            self.closed_full += 1
+            await self._close(album, now)
+            return
+
+        album.deadline = min(now + self.gap_timeout(channel_id), album.first_at + self.max_wait)
+        heapq.heappush(self._heap, (album.deadline, next(self._sequence), key))
+
+        # 新的截止时间成为堆顶时唤醒聚合任务
+        if self._wakeup and self._heap[0][2] == key:
+            self._wakeup.set()
+
+    async def _close(self, album: _Album, now: float):
+        """关闭相册: 学习项间隔、记录延迟并交给回调"""
+        self._albums.pop(album.key, None)
+        self._learn_gap(album)
+        self._latencies.append(now - album.first_at)
+
+        self._recent_albums[album.key] = now
+        if len(self._recent_albums) > RECENT_ALBUMS_LIMIT:
+            self._recent_albums.popitem(last=False)
+
+        try:
+            await self.on_complete(album.items)
+        except Exception as e:
+            self.logger.error(f"❌ 提交媒体组失败: {e}")
+
+    def _learn_gap(self, album: _Album):
+        """用相册内最大的项间隔更新频道的平滑间隔"""
+        if len(album.arrivals) < 2:
+            return
+
+        sample = max(later - earlier for earlier, later in zip(album.arrivals, album.arrivals[1:]))
+        previous = self._channel_gaps.get(album.channel_id)
+        if previous is None:
+            self._channel_gaps[album.channel_id] = sample
+        else:
+            self._channel_gaps[album.channel_id] = previous + (sample - previous) * GAP_SMOOTHING
+
+    async def _run(self):
+        """睡眠到最近的截止时间，关闭所有到期的相册"""
+        while True:
+            try:
+                self._wakeup.clear()
+                now = time.monotonic()
+
+                while self._heap and self._heap[0][0] <= now:
+                    deadline, _, key = heapq.heappop(self._heap)
+                    album = self._albums.get(key)
+                    if album is None or album.deadline != deadline:
+                        continue
+
+                    if deadline >= album.first_at + self.max_wait:
+                        self.closed_timeout += 1
+                    else:
+                        self.closed_gap += 1
+                    await self._close(album, now)
+
+                timeout = None
+                if self._heap:
+                    timeout = max(0.0, self._heap[0][0] - time.monotonic())
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"❌ 媒体组聚合出错: {e}")
+                await asyncio.sleep(1)
+
+    @staticmethod
+    def _percentile(samples: List[float], percent: float) -> float:
+        if not samples:
+            return 0.0
+        index = min(len(samples) - 1, max(0, round(percent / 100 * len(samples) + 0.5) - 1))
+        return samples[index]
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """聚合统计，延迟为第一项到达至相册关闭的时间（毫秒）"""
+        latencies = sorted(self._latencies)
+        return {
+            'pending_albums': len(self._albums),
+            'albums': self.albums,
+            'items': self.items,
+            'closed_full': self.closed_full,
+            'closed_gap': self.closed_gap,
+            'closed_timeout': self.closed_timeout,
+            'late_items': self.late_items,
+            'learned_channels': len(self._channel_gaps),
+            'latency_p50_ms': round(self._percentile(latencies, 50) * 1000, 1),
+            'latency_p99_ms': round(self._percentile(latencies, 99) * 1000, 1),
+            'max_wait': self.max_wait
+        }
@@ -0,0 +1,193 @@
+"""
+调度引擎 - 用最小堆管理所有组的调度窗口边界，单个任务批量切换组状态
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from utils.schedule_window import ScheduleWindow, SCHEDULER_TIMEZONE, SCHEDULE_TZINFO, resolve_timezone
+
+# 最长睡眠时间（秒），到时重新核对堆顶，应对系统时间调整
+MAX_SLEEP = 60
+
+
+class ScheduleEngine:
+    """组调度边界引擎
+
+    每个有调度的组在堆中只有一项: 它的下一个窗口边界（窗口开始的那一秒、结束后的下一秒）。
+    单个 asyncio 任务睡眠到堆顶的时刻，弹出所有已到期的边界，
+    计算这些组的新状态后调用一次 apply_transitions 批量更新，再把各组的下一个边界放回堆中。
+    重新设置或移除调度时旧的堆项不删除，按版本号在弹出时丢弃。
+    """
+
+    def __init__(self, apply_transitions: Callable[[List[Tuple[int, str]]], Awaitable], timezone: str = SCHEDULER_TIMEZONE):
+        self.apply_transitions = apply_transitions
+        self.logger = logging.getLogger(__name__)
+
+        # 与 GroupProcessor 的调度计时共用同一个时区
+        self.timezone = SCHEDULE_TZINFO if timezone == SCHEDULER_TIMEZONE else resolve_timezone(timezone)
+
+        # 堆项: (边界时间戳, 组ID, 版本号)
+        self._heap: List[Tuple[float, int, int]] = []
+        self._windows: Dict[int, Tuple[ScheduleWindow, int]] = {}
+        self._versions = itertools.count()
+
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._last_wall_time = 0.0
+
+        # 统计
+        self.batches = 0
+        self.transitions = 0
+        self.stale_entries = 0
+        self.last_batch_size = 0
+        self.last_batch_at: Optional[str] = None
+
+    async def start(self):
+        """启动边界计时任务"""
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止边界计时任务"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._heap.clear()
+        self._windows.clear()
+
+    def now(self) -> datetime:
+        return datetime.now(self.timezone)
+
+    @staticmethod
+    def status_for(window: ScheduleWindow, moment: datetime) -> str:
+        """某一时刻组应处于的状态"""
+        return 'active' if window.contains(ScheduleWindow.second_of_day(moment)) else 'scheduled'
+
+    def _next_boundary(self, window: ScheduleWindow, moment: datetime) -> datetime:
+        """moment 之后（不含）的下一个窗口边界"""
+        midnight = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        candidates = []
+        for boundary in window.boundaries:
+            at = midnight + timedelta(seconds=boundary)
+            if at <= moment:
+                at += timedelta(days=1)
+            candidates.append(at)
+        return min(candidates)
+
+    def set_schedule(self, group_id: int, window: ScheduleWindow) -> str:
+        """设置（或替换）组的调度窗口，返回当前应处于的状态"""
+        version = next(self._versions)
+        self._windows[group_id] = (window, version)
+
+        now = self.now()
+        boundary = self._next_boundary(window, now).timestamp()
+        heapq.heappush(self._heap, (boundary, group_id, version))
+
+        # 新边界早于当前等待的时刻时唤醒计时任务
+        if self._wakeup and self._heap[0][1] == group_id and self._heap[0][2] == version:
+            self._wakeup.set()
+
+        return self.status_for(window, now)
+
+    def remove_schedule(self, group_id: int):
+        """移除组的调度（堆中的旧项在弹出时丢弃）"""
+        self._windows.pop(group_id, None)
+
+    def has_schedule(self, group_id: int) -> bool:
+        return group_id in self._windows
+
+    def _rebuild(self):
+        """系统时间回拨后按当前时间重建堆"""
+        now = self.now()
+        self._heap = [
+            (self._next_boundary(window, now).timestamp(), group_id, version)
+            for group_id, (window, version) in self._windows.items()
+        ]
+        heapq.heapify(self._heap)
+
+    def _pop_due(self, now: float) -> Dict[int, str]:
+        """弹出所有已到期的边界，返回 {组ID: 新状态}"""
+        due: Dict[int, str] = {}
+        while self._heap and self._heap[0][0] <= now:
+            boundary, group_id, version = heapq.heappop(self._heap)
+            current = self._windows.get(group_id)
+            if not current or current[1] != version:
+                self.stale_entries += 1
+                continue
+
+            window = current[0]
+            moment = datetime.fromtimestamp(boundary, self.timezone)
+            due[group_id] = self.status_for(window, moment)
+
+            next_boundary = self._next_boundary(window, moment).timestamp()
+            heapq.heappush(self._heap, (next_boundary, group_id, version))
+        return due
+
+    async def _run(self):
+        """睡眠到最近的边界，批量应用到期的状态切换"""
+        while True:
+            try:
+                self._wakeup.clear()
+                now = time.time()
+
+                if now < self._last_wall_time - 1:
+                    self.logger.warning("⚠️ 检测到系统时间回拨，重建调度边界")
+                    self._rebuild()
+                self._last_wall_time = now
+
+                due = self._pop_due(now)
+                if due:
+                    batch = sorted(due.items())
+                    self.batches += 1
+                    self.transitions += len(batch)
+                    self.last_batch_size = len(batch)
+                    self.last_batch_at = self.now().isoformat()
+                    await self.apply_transitions(batch)
+
+                delay = MAX_SLEEP
+                if self._heap:
+                    delay = min(MAX_SLEEP, max(0.0, self._heap[0][0] - time.time()))
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"❌ 调度引擎出错: {e}")
+                await asyncio.sleep(1)
+
+    def get_statistics(self) -> Dict:
+        """引擎统计"""
+        next_boundary = None
+        while self._heap:
+            boundary, group_id, version = self._heap[0]
+            current = self._windows.get(group_id)
+            if current and current[1] == version:
+                next_boundary = datetime.fromtimestamp(boundary, self.timezone).isoformat()
+                break
+            heapq.heappop(self._heap)
+            self.stale_entries += 1
+
+        return {
+            'timezone': str(self.timezone) if self.timezone else 'local',
+            'scheduled_groups': len(self._windows),
+            'heap_size': len(self._heap),
+            'next_boundary': next_boundary,
+            'batches': self.batches,
+            'transitions': self.transitions,
+            'last_batch_size': self.last_batch_size,
+            'last_batch_at': self.last_batch_at,
+            'stale_entries': self.stale_entries
+        }
@@ -5,10 +5,13 @@
 import asyncio
 import logging
 from datetime import datetime, time as dt_time
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 
+from utils.schedule_window import ScheduleWindow
+from .schedule_engine import ScheduleEngine, SCHEDULER_TIMEZONE
+
 
 class TaskScheduler:
     """任务调度器"""
@@ -18,13 +21,19 @@ class TaskScheduler:
         self.database = database
         self.logger = logging.getLogger(__name__)
         
-        # 调度器
-        self.scheduler = AsyncIOScheduler(timezone='Asia/Shanghai')
+        # 调度器（系统任务）
+        self.scheduler = AsyncIOScheduler(timezone=SCHEDULER_TIMEZONE)
         self.is_running = False
         
+        # 组调度: 所有组的窗口边界由一个引擎任务驱动
+        self.schedule_engine = ScheduleEngine(self._apply_transitions)
+        
         # 任务状态
         self.scheduled_jobs = {}
         self.job_status = {}
+        
+        # 正在由本调度器写入状态的组（忽略这些组自身触发的变更通知）
+        self._applying: set = set()
 
     async def start(self):
         """启动任务调度器"""
@@ -36,8 +45,10 @@ class TaskScheduler:
         # 添加系统任务
         await self._add_system_jobs()
         
-        # 加载组调度任务
+        # 加载组调度，之后由变更通知增量更新
+        await self.schedule_engine.start()
         await self._load_group_schedules()
+        self.database.subscribe(self._on_database_change)
         
         self.is_running = True
         self.logger.info("✅ 任务调度器启动完成")
@@ -47,6 +58,9 @@ class TaskScheduler:
         self.logger.info("🛑 停止任务调度器...")
         self.is_running = False
         
+        self.database.unsubscribe(self._on_database_change)
+        await self.schedule_engine.stop()
+        
         # 停止调度器
         if self.scheduler.running:
             self.scheduler.shutdown(wait=True)
@@ -68,7 +82,7 @@ class TaskScheduler:
                 max_instances=1
             )
             
-            # 每小时状态检查任务
+            # 每小时状态检查任务（含调度配置核对）
             self.scheduler.add_job(
                 self._hourly_check_task,
                 CronTrigger(minute=0),
@@ -77,142 +91,128 @@ class TaskScheduler:
                 max_instances=1
             )
             
-            # 每10分钟配置同步任务
-            self.scheduler.add_job(
-                self._config_sync_task,
-                CronTrigger(minute='*/10'),
-                id='config_sync',
-                name='配置同步检查',
-                max_instances=1
-            )
-            
             self.logger.info("📅 系统任务添加完成")
             
         except Exception as e:
             self.logger.error(f"❌ 添加系统任务失败: {e}")
 
     async def _load_group_schedules(self):
-        """加载组调度任务"""
+        """加载组调度，启动时的状态修正合并为一次批量更新"""
         try:
             groups = await self.database.get_forwarding_groups()
             
+            transitions = []
             for group in groups:
                 if group['schedule_start'] and group['schedule_end']:
-                    await self._add_group_schedule(
+                    status = await self._add_group_schedule(
                         group['id'],
                         group['schedule_start'],
-                        group['schedule_end']
+                        group['schedule_end'],
+                        apply=False
                     )
+                    if status and status != group['status']:
+                        transitions.append((group['id'], status))
+            
+            await self._apply_transitions(transitions)
             
-            self.logger.info(f"📅 加载 {len([g for g in groups if g['schedule_start']])} 个组调度任务")
+            self.logger.info(f"📅 加载 {len(self.scheduled_jobs)} 个组调度任务")
             
         except Exception as e:
             self.logger.error(f"❌ 加载组调度任务失败: {e}")
 
-    async def _add_group_schedule(self, group_id: int, start_time: str, end_time: str):
-        """添加组调度任务"""
+    async def _add_group_schedule(self, group_id: int, start_time: str, end_time: str, apply: bool = True) -> Optional[str]:
+        """添加组调度，返回当前应处于的状态（apply 时立即写入）"""
         try:
-            # 解析时间
-            start_hour, start_minute = map(int, start_time.split(':'))
-            end_hour, end_minute = map(int, end_time.split(':'))
+            window = ScheduleWindow.parse(start_time, end_time)
+            if window is None:
+                return None
             
-            # 启动任务
-            start_job_id = f'group_{group_id}_start'
-            self.scheduler.add_job(
-                self._activate_group,
-                CronTrigger(hour=start_hour, minute=start_minute),
-                args=[group_id],
-                id=start_job_id,
-                name=f'启动组{group_id}',
-                max_instances=1,
-                replace_existing=True
-            )
-            
-            # 停止任务
-            end_job_id = f'group_{group_id}_end'
-            self.scheduler.add_job(
-                self._deactivate_group,
-                CronTrigger(hour=end_hour, minute=end_minute),
-                args=[group_id],
-                id=end_job_id,
-                name=f'停止组{group_id}',
-                max_instances=1,
-                replace_existing=True
-            )
+            status = self.schedule_engine.set_schedule(group_id, window)
             
             # 记录任务
             self.scheduled_jobs[group_id] = {
-                'start_job_id': start_job_id,
-                'end_job_id': end_job_id,
                 'start_time': start_time,
                 'end_time': end_time
             }
             
             # 检查当前是否在调度时间内
-            await self._check_current_schedule_status(group_id, start_time, end_time)
+            if apply:
+                await self._apply_transitions([(group_id, status)])
+                self.logger.info(f"📅 添加组调度: 组{group_id} ({start_time}-{end_time})")
             
-            self.logger.info(f"📅 添加组调度: 组{group_id} ({start_time}-{end_time})")
+            return status
             
         except Exception as e:
             self.logger.error(f"❌ 添加组调度失败: {e}")
+            return None
 
-    async def _check_current_schedule_status(self, group_id: int, start_time: str, end_time: str):
-        """检查当前调度状态"""
+    async def _apply_transitions(self, transitions: List[Tuple[int, str]]):
+        """批量切换组状态（一次数据库事务）"""
+        if not transitions:
+            return
+        
         try:
-            now = datetime.now().time()
-            start = dt_time.fromisoformat(start_time)
-            end = dt_time.fromisoformat(end_time)
-            
-            is_active = False
-            if start <= end:
-                # 同一天的时间段
-                is_active = start <= now <= end
-            else:
-                # 跨天的时间段
-                is_active = now >= start or now <= end
+            self._applying.update(group_id for group_id, _ in transitions)
+            try:
+                if not await self.database.update_group_statuses(transitions):
+                    return
+            finally:
+                self._applying.difference_update(group_id for group_id, _ in transitions)
             
-            # 更新组状态
-            status = 'active' if is_active else 'scheduled'
-            await self._update_group_status(group_id, status)
+            # 更新任务状态
+            updated_at = datetime.now().isoformat()
+            for group_id, status in transitions:
+                self.job_status[group_id] = {
+                    'status': status,
+                    'updated_at': updated_at
+                }
             
-        except Exception as e:
-            self.logger.error(f"❌ 检查当前调度状态失败: {e}")
-
-    async def _activate_group(self, group_id: int):
-        """激活组"""
-        try:
-            await self._update_group_status(group_id, 'active')
-            self.logger.info(f"🟢 组{group_id} 已按调度激活")
+            if len(transitions) <= 10:
+                for group_id, status in transitions:
+                    if status == 'active':
+                        self.logger.info(f"🟢 组{group_id} 已按调度激活")
+                    else:
+                        self.logger.info(f"🔴 组{group_id} 已按调度停用")
+            else:
+                activated = sum(1 for _, status in transitions if status == 'active')
+                self.logger.info(f"⏰ 调度切换 {len(transitions)} 个组: 激活 {activated}，停用 {len(transitions) - activated}")
             
         except Exception as e:
-            self.logger.error(f"❌ 激活组失败: {e}")
+            self.logger.error(f"❌ 更新组状态失败: {e}")
 
-    async def _deactivate_group(self, group_id: int):
-        """停用组"""
-        try:
-            await self._update_group_status(group_id, 'scheduled')
-            self.logger.info(f"🔴 组{group_id} 已按调度停用")
-            
-        except Exception as e:
-            self.logger.error(f"❌ 停用组失败: {e}")
+    async def _on_database_change(self, entity: str, entity_id):
+        """数据库变更通知: 只重新核对受影响组的调度（跳过自身正在应用的状态切换）"""
+        if entity == 'group':
+            group_ids = [entity_id]
+        elif entity == 'groups':
+            group_ids = entity_id
+        else:
+            return
+        
+        for group_id in group_ids:
+            if group_id in self._applying:
+                continue
+            try:
+                group = await self.database.get_forwarding_group(group_id)
+                await self._sync_group_schedule(group_id, group)
+            except Exception as e:
+                self.logger.error(f"❌ 同步组调度失败 {group_id}: {e}")
 
-    async def _update_group_status(self, group_id: int, status: str):
-        """更新组状态"""
-        try:
-            await self.database._connection.execute(
-                'UPDATE forwarding_groups SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
-                (status, group_id)
-            )
-            await self.database._connection.commit()
-            
-            # 更新任务状态
-            self.job_status[group_id] = {
-                'status': status,
-                'updated_at': datetime.now().isoformat()
-            }
+    async def _sync_group_schedule(self, group_id: int, group: Optional[Dict[str, Any]]):
+        """让引擎中的调度与组配置一致"""
+        job_info = self.scheduled_jobs.get(group_id)
+        
+        if group and group['schedule_start'] and group['schedule_end']:
+            if job_info and (job_info['start_time'], job_info['end_time']) == (group['schedule_start'], group['schedule_end']):
+                return
             
-        except Exception as e:
-            self.logger.error(f"❌ 更新组状态失败: {e}")
+            status = await self._add_group_schedule(group_id, group['schedule_start'], group['schedule_end'], apply=False)
+            if status and status != group['status']:
+                await self._apply_transitions([(group_id, status)])
+            self.logger.info(f"📅 更新组调度: 组{group_id} ({group['schedule_start']}-{group['schedule_end']})")
+        
+        elif job_info:
+            await self._remove_group_schedule(group_id)
 
     async def _cleanup_daily_task(self):
         """每日清理任务"""
@@ -243,6 +243,9 @@ class TaskScheduler:
             # 检查系统状态
             # 这里可以添加系统健康检查逻辑
             
+            # 核对调度配置（兜底: 绕过数据库层直接修改的配置不会产生变更通知）
+            await self._config_sync_task()
+            
             self.logger.debug("✅ 每小时状态检查完成")
             
         except Exception as e:
@@ -253,26 +256,15 @@ class TaskScheduler:
         try:
             self.logger.debug("🔄 开始配置同步检查...")
             
-            # 检查是否有新的组调度需要加载
             current_groups = await self.database.get_forwarding_groups()
             
             for group in current_groups:
-                group_id = group['id']
-                
-                # 检查是否有调度但未添加任务
-                if group['schedule_start'] and group['schedule_end']:
-                    if group_id not in self.scheduled_jobs:
-                        await self._add_group_schedule(
-                            group_id,
-                            group['schedule_start'],
-                            group['schedule_end']
-                        )
-                        self.logger.info(f"📅 自动添加新的组调度: 组{group_id}")
-                
-                # 检查是否取消了调度
-                elif group_id in self.scheduled_jobs:
-                    await self._remove_group_schedule(group_id)
-                    self.logger.info(f"📅 自动移除组调度: 组{group_id}")
+                await self._sync_group_schedule(group['id'], group)
+            
+            # 已删除的组
+            existing = {group['id'] for group in current_groups}
+            for group_id in [group_id for group_id in self.scheduled_jobs if group_id not in existing]:
+                await self._remove_group_schedule(group_id)
             
             self.logger.debug("✅ 配置同步检查完成")
             
@@ -314,6 +306,9 @@ class TaskScheduler:
             # 备份数据库
             db_file = Path('data/forwarder.db')
             if db_file.exists():
+                # WAL模式下先将日志写回主文件
+                await self.database.checkpoint()
+                
                 timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
                 backup_file = backup_dir / f'forwarder_{timestamp}.db'
                 shutil.copy2(db_file, backup_file)
@@ -339,7 +334,7 @@ class TaskScheduler:
             except ValueError:
                 return {'status': 'error', 'message': '时间格式错误，请使用 HH:MM 格式'}
             
-            # 添加到调度器
+            # 添加到调度引擎（先于数据库更新，变更通知到达时调度已一致）
             await self._add_group_schedule(group_id, start_time, end_time)
             
             # 更新数据库
@@ -372,14 +367,8 @@ class TaskScheduler:
         """移除组调度任务"""
         try:
             if group_id in self.scheduled_jobs:
-                job_info = self.scheduled_jobs[group_id]
-                
-                # 移除调度任务
-                try:
-                    self.scheduler.remove_job(job_info['start_job_id'])
-                    self.scheduler.remove_job(job_info['end_job_id'])
-                except:
-                    pass  # 任务可能已经不存在
+                # 移除调度（堆中的旧边界在到期时丢弃）
+                self.schedule_engine.remove_schedule(group_id)
                 
                 # 清理记录
                 del self.scheduled_jobs[group_id]
@@ -431,6 +420,7 @@ class TaskScheduler:
                 return {
                     'total_scheduled': len(all_schedules),
                     'scheduler_running': self.scheduler.running,
+                    'engine': self.schedule_engine.get_statistics(),
                     'schedules': all_schedules
                 }
                 
@@ -443,15 +433,14 @@ class TaskScheduler:
         try:
             jobs = self.scheduler.get_jobs()
             
-            system_jobs = [j for j in jobs if j.id in ['daily_cleanup', 'hourly_check', 'config_sync']]
-            group_jobs = [j for j in jobs if j.id not in ['daily_cleanup', 'hourly_check', 'config_sync']]
-            
+            # 组调度不再占用 APScheduler 任务，全部由调度引擎的一个任务驱动
             return {
                 'total_jobs': len(jobs),
-                'system_jobs': len(system_jobs),
-                'group_jobs': len(group_jobs),
+                'system_jobs': len(jobs),
+                'group_jobs': 0,
                 'scheduled_groups': len(self.scheduled_jobs),
                 'scheduler_running': self.scheduler.running,
+                'engine': self.schedule_engine.get_statistics(),
                 'is_running': self.is_running
             }
             
@@ -11,6 +11,11 @@ from telegram import Bot
 from telegram.constants import ParseMode
 from telegram.error import TelegramError, RetryAfter, Forbidden
 
+from utils.keyed_executor import KeyedExecutor
+
+# 每个发送通道缓存的消息数，满时 send_message 等待（背压传到监听通道）
+SEND_LANE_CAPACITY = 100
+
 
 class MessageSender:
     """消息发送器"""
@@ -25,8 +30,15 @@ class MessageSender:
         self.current_bot_index = 0
         self.bot_status: Dict[str, Dict] = {}
         
+        # 发送队列: 按目标频道分到串行通道，同一目标的消息按提交顺序发送
+        self.send_queue = KeyedExecutor(
+            self._process_send_message,
+            lanes=settings.sender_workers,
+            capacity=SEND_LANE_CAPACITY,
+            name='发送'
+        )
+        
         # 发送限制
-        self.send_queue = asyncio.Queue()
         self.hourly_count = 0
         self.last_hour_reset = time.time()
         self.last_send_time = 0
@@ -43,9 +55,7 @@ class MessageSender:
         await self._load_bots()
         
         # 启动发送队列处理器
-        for i in range(2):  # 启动2个发送器
-            task = asyncio.create_task(self._send_processor())
-            self.sender_tasks.append(task)
+        await self.send_queue.start()
         
         # 启动限制重置任务
         reset_task = asyncio.create_task(self._hourly_reset_task())
@@ -66,6 +76,7 @@ class MessageSender:
         # 等待任务完成
         if self.sender_tasks:
             await asyncio.gather(*self.sender_tasks, return_exceptions=True)
+        await self.send_queue.stop()
         
         self.sender_tasks.clear()
         self.bots.clear()
@@ -148,7 +159,7 @@ class MessageSender:
             'parse_mode': parse_mode
         }
         
-        await self.send_queue.put(message_data)
+        await self.send_queue.put(chat_id, message_data)
         
         return {'status': 'queued', 'message': '消息已加入发送队列'}
 
@@ -161,29 +172,10 @@ class MessageSender:
             'caption': caption
         }
         
-        await self.send_queue.put(message_data)
+        await self.send_queue.put(chat_id, message_data)
         
         return {'status': 'queued', 'message': '媒体组已加入发送队列'}
 
-    async def _send_processor(self):
-        """发送处理器"""
-        while self.is_running:
-            try:
-                # 从队列获取消息
-                message_data = await asyncio.wait_for(
-                    self.send_queue.get(),
-                    timeout=1.0
-                )
-                
-                await self._process_send_message(message_data)
-                
-            except asyncio.TimeoutError:
-                continue
-            except asyncio.CancelledError:
-                break
-            except Exception as e:
-                self.logger.error(f"❌ 发送处理器异常: {e}")
-
     async def _process_send_message(self, message_data: Dict):
         """处理发送消息"""
         try:
@@ -386,7 +378,8 @@ class MessageSender:
                 'active_bots': len([b for b in bot_stats if b['status'] == 'active']),
                 'hourly_count': self.hourly_count,
                 'hourly_limit': self.settings.hourly_limit,
-                'queue_size': self.send_queue.qsize(),
+                'queue_size': self.send_queue.depth,
+                'lanes': self.send_queue.get_statistics(),
                 'bots': bot_stats
             }
             
@@ -27,7 +27,22 @@ from web.auth import set_auth_manager, AuthManager
 class TelegramForwarder:
     def __init__(self):
         self.settings = Settings()
-        self.database = Database()
+        self.database = Database(
+            write_batch_size=self.settings.db_write_batch_size,
+            write_flush_interval=self.settings.db_write_flush_interval,
+            write_max_pending=self.settings.db_write_max_pending,
+            # Bloom过滤器按保留期内的消息量估算容量
+            dedup_capacity=self.settings.dedup_expected_daily_messages * self.settings.log_retention_days,
+            dedup_lru_size=self.settings.dedup_lru_size,
+            storage_mode=self.settings.db_storage_mode,
+            read_pool_size=self.settings.db_read_pool_size,
+            cache_size_kb=self.settings.db_cache_size_kb,
+            mmap_size=self.settings.db_mmap_size,
+            cleanup_batch_size=self.settings.db_cleanup_batch_size,
+            cleanup_pause=self.settings.db_cleanup_pause,
+            partition_mode=self.settings.db_partition_mode,
+            migration_vacuum=self.settings.db_migration_vacuum
+        )
         self.manager = None
         self.web_app = None
         self.running = False
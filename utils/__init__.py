@@ -2,9 +2,19 @@
 工具模块
 """
 
-from .filters import MessageFilter
+from .filters import MessageFilter, FilterPlan
 from .logger import setup_logging
 from .config_watcher import ConfigWatcher
 from .security import SecurityUtils
+from .dedup import BloomFilter, DedupIndex
+from .keyword_matcher import KeywordMatcher
+from .filter_cache import FilterResultCache
+from .filter_profiler import FilterProfiler
+from .spam_scorer import LinearScorer
+from .schedule_window import ScheduleWindow
+from .regex_guard import check_regex
+from .hash_ring import HashRing
+from .fair_queue import FairQueue
+from .keyed_executor import KeyedExecutor
 
-__all__ = ['MessageFilter', 'setup_logging', 'ConfigWatcher', 'SecurityUtils']
\ No newline at end of file
+__all__ = ['MessageFilter', 'FilterPlan', 'setup_logging', 'ConfigWatcher', 'SecurityUtils', 'BloomFilter', 'DedupIndex', 'KeywordMatcher', 'FilterResultCache', 'FilterProfiler', 'LinearScorer', 'ScheduleWindow', 'check_regex', 'HashRing', 'FairQueue', 'KeyedExecutor']
\ No newline at end of file
@@ -0,0 +1,131 @@
+"""
+去重索引 - 消息去重的内存前置缓存 (Bloom过滤器 + LRU)
+"""
+
+import math
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+
+class BloomFilter:
+    """Bloom过滤器"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = max(1, capacity)
+        self.error_rate = min(max(error_rate, 1e-6), 0.5)
+
+        # 按容量和期望误判率计算位数和哈希函数个数
+        self.num_bits = max(8, int(-self.capacity * math.log(self.error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        """双重哈希生成位位置"""
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: str):
+        """添加元素"""
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        for pos in self._positions(key):
+            if not self._bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def estimated_error_rate(self) -> float:
+        """按当前元素数估算误判率"""
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+
+class DedupIndex:
+    """两级去重索引
+
+    LRU保存最近确认已转发的内容哈希（命中即为已转发），
+    Bloom过滤器覆盖保留期内的全部哈希（未命中即为未转发），
+    两者都无法确定时才需要查询数据库。
+    """
+
+    def __init__(self, capacity: int, lru_size: int = 50000, error_rate: float = 0.01):
+        self.capacity = capacity
+        self.lru_size = max(1, lru_size)
+        self.error_rate = error_rate
+        self.bloom = BloomFilter(capacity, error_rate)
+        self._recent: OrderedDict = OrderedDict()
+
+        # 统计
+        self.lookups = 0
+        self.lru_hits = 0
+        self.bloom_negatives = 0
+        self.db_lookups = 0
+        self.false_positives = 0
+
+    def add(self, key: str):
+        """记录已转发的内容哈希"""
+        if not key:
+            return
+        self.bloom.add(key)
+        self._remember(key)
+
+    def _remember(self, key: str):
+        """写入LRU"""
+        self._recent[key] = None
+        self._recent.move_to_end(key)
+        if len(self._recent) > self.lru_size:
+            self._recent.popitem(last=False)
+
+    def lookup(self, key: str) -> Optional[bool]:
+        """查询索引，返回 True/False 表示确定结果，None 表示需要查询数据库"""
+        self.lookups += 1
+
+        if key in self._recent:
+            self._recent.move_to_end(key)
+            self.lru_hits += 1
+            return True
+
+        if key not in self.bloom:
+            self.bloom_negatives += 1
+            return False
+
+        self.db_lookups += 1
+        return None
+
+    def record_db_result(self, key: str, found: bool):
+        """记录数据库查询结果"""
+        if found:
+            self._remember(key)
+        else:
+            # Bloom过滤器判断存在但数据库中没有
+            self.false_positives += 1
+
+    def needs_rebuild(self) -> bool:
+        """元素数超过容量时误判率会明显上升"""
+        return self.bloom.count > self.capacity
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取命中率统计"""
+        lookups = self.lookups
+        negatives = self.bloom_negatives + self.false_positives
+        return {
+            'lookups': lookups,
+            'lru_hits': self.lru_hits,
+            'bloom_negatives': self.bloom_negatives,
+            'db_lookups': self.db_lookups,
+            'false_positives': self.false_positives,
+            'hit_ratio': round((self.lru_hits + self.bloom_negatives) / lookups, 4) if lookups else 0,
+            'miss_ratio': round(self.db_lookups / lookups, 4) if lookups else 0,
+            'false_positive_rate': round(self.false_positives / negatives, 4) if negatives else 0,
+            'estimated_false_positive_rate': round(self.bloom.estimated_error_rate(), 6),
+            'bloom_items': self.bloom.count,
+            'bloom_capacity': self.capacity,
+            'lru_items': len(self._recent),
+            'lru_size': self.lru_size
+        }
@@ -0,0 +1,334 @@
+"""
+组公平队列 - 每个组一个有界队列，按赤字轮询 (DRR) 在组之间分配处理机会
+"""
+
+import asyncio
+import json
+import logging
+from collections import deque
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+
+# 队列满时的处理方式
+OVERFLOW_POLICIES = ('block', 'drop_oldest', 'spill')
+
+
+class FairQueue:
+    """按组划分的有界队列
+
+    get() 按赤字轮询选择下一个组: 轮到的组每轮获得 quantum * 权重 的额度，
+    额度足够时取出队首项并扣除其成本（cost 回调，默认 1）。
+    一个组的消息再多，也只能占用与其权重成比例的处理机会。
+    get(ready) 跳过队首项暂时不能处理的组（组内顺序不变），下游有空位时调用 notify() 唤醒。
+
+    队列满时按 overflow 处理:
+        block       - put() 等待该组有空位。只有逐个等待 put() 的调用方才会被限速；
+                      Telethon 默认每个更新的处理器是独立任务，等待中的任务不受限制，
+                      所以 block 不限制内存，需要限制内存时用 drop_oldest 或 spill
+        drop_oldest - 丢弃该组最旧的一项
+        spill       - 写入磁盘（spill_record 回调序列化），队列降到一半时由后台任务调用 restore 恢复；
+                      已有溢出记录或正在恢复时新项也写入磁盘，保持组内顺序
+    """
+
+    def __init__(self, max_depth: int = 1000, overflow: str = 'block', weights: Optional[Dict] = None,
+                 quantum: float = 1.0, cost: Optional[Callable[[Any], float]] = None,
+                 spill_dir: Optional[str] = None,
+                 spill_record: Optional[Callable[[int, Any], Awaitable[Optional[Dict]]]] = None,
+                 restore: Optional[Callable[[int, List[Dict]], Awaitable[List[Any]]]] = None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"未知的溢出策略: {overflow}")
+        if overflow == 'spill' and not (spill_dir and spill_record and restore):
+            raise ValueError("spill 策略需要 spill_dir、spill_record 和 restore")
+
+        self.max_depth = max(1, max_depth)
+        self.overflow = overflow
+        self.weights = {int(group_id): float(weight) for group_id, weight in (weights or {}).items()}
+        self.quantum = quantum
+        self.cost = cost or (lambda item: 1)
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self.spill_record = spill_record
+        self.restore = restore
+        self.logger = logging.getLogger(__name__)
+
+        self._queues: Dict[int, Deque] = {}
+        self._deficits: Dict[int, float] = {}
+        self._ring: Deque[int] = deque()
+        self._in_ring = set()
+        self._has_items = asyncio.Event()
+        self._space: Dict[int, asyncio.Event] = {}
+
+        # 溢出文件: 组ID -> 未读记录数 / 已读字节偏移
+        self._spilled: Dict[int, int] = {}
+        self._spill_offsets: Dict[int, int] = {}
+        self._refilling = set()
+        self._refill_tasks = set()
+
+        # 统计: 组ID -> 计数
+        self._stats: Dict[int, Dict[str, int]] = {}
+
+    def load_spill(self):
+        """登记上次运行留下的溢出文件"""
+        if self.overflow != 'spill' or not self.spill_dir.exists():
+            return
+
+        for path in self.spill_dir.glob('*.jsonl'):
+            try:
+                group_id = int(path.stem)
+                with path.open('rb') as f:
+                    count = sum(1 for line in f if line.strip())
+            except (ValueError, OSError) as e:
+                self.logger.warning(f"⚠️ 跳过溢出文件 {path}: {e}")
+                continue
+
+            if count:
+                self._spilled[group_id] = count
+                self._spill_offsets[group_id] = 0
+                self.logger.info(f"💾 组{group_id} 有 {count} 条待恢复的溢出消息")
+        if self._spilled:
+            self._has_items.set()
+
+    async def close(self):
+        """取消进行中的恢复任务（未恢复的记录留在溢出文件中）"""
+        for task in list(self._refill_tasks):
+            task.cancel()
+        if self._refill_tasks:
+            await asyncio.gather(*self._refill_tasks, return_exceptions=True)
+        self._refill_tasks.clear()
+
+    def _group_stats(self, group_id: int) -> Dict[str, int]:
+        stats = self._stats.get(group_id)
+        if stats is None:
+            stats = self._stats[group_id] = {
+                'enqueued': 0, 'dispatched': 0, 'dropped': 0, 'spilled': 0,
+                'restored': 0, 'lost': 0, 'blocked': 0, 'high_watermark': 0
+            }
+        return stats
+
+    def weight(self, group_id: int) -> float:
+        return self.weights.get(group_id, 1.0)
+
+    def depth(self, group_id: int) -> int:
+        queue = self._queues.get(group_id)
+        return len(queue) if queue else 0
+
+    def _append(self, group_id: int, item: Any):
+        """放入内存队列并加入轮询"""
+        queue = self._queues.get(group_id)
+        if queue is None:
+            queue = self._queues[group_id] = deque()
+            self._deficits[group_id] = 0.0
+        queue.append(item)
+
+        stats = self._group_stats(group_id)
+        if len(queue) > stats['high_watermark']:
+            stats['high_watermark'] = len(queue)
+
+        if group_id not in self._in_ring:
+            self._in_ring.add(group_id)
+            self._ring.append(group_id)
+        self._has_items.set()
+
+    async def put(self, group_id: int, item: Any) -> bool:
+        """放入一项，返回是否进入内存队列（溢出到磁盘或丢弃时为 False）"""
+        stats = self._group_stats(group_id)
+        stats['enqueued'] += 1
+
+        if self.overflow == 'spill' and (self._spilled.get(group_id) or group_id in self._refilling):
+            await self._spill(group_id, item)
+            return False
+
+        if self.depth(group_id) >= self.max_depth:
+            if self.overflow == 'block':
+                stats['blocked'] += 1
+                while self.depth(group_id) >= self.max_depth:
+                    space = self._space.setdefault(group_id, asyncio.Event())
+                    space.clear()
+                    await space.wait()
+            elif self.overflow == 'drop_oldest':
+                self._queues[group_id].popleft()
+                stats['dropped'] += 1
+            else:
+                await self._spill(group_id, item)
+                return False
+
+        self._append(group_id, item)
+        return True
+
+    def notify(self):
+        """下游状态变化，唤醒等待中的 get()"""
+        self._has_items.set()
+
+    async def get(self, ready: Optional[Callable[[Any], bool]] = None) -> Tuple[int, Any]:
+        """按赤字轮询取出下一项，返回 (组ID, 项)；ready(项) 为 False 的组本次跳过"""
+        while True:
+            picked = self._dequeue(ready)
+            if picked is not None:
+                group_id, _ = picked
+                if self._spilled.get(group_id) and self.depth(group_id) <= self.max_depth // 2:
+                    self._schedule_refill(group_id)
+                return picked
+
+            # 磁盘上还有溢出记录、内存中不到半个队列的组（组内的项都在等下游时不恢复，避免把溢出文件全部读进内存）
+            for group_id, count in list(self._spilled.items()):
+                if count and self.depth(group_id) <= self.max_depth // 2:
+                    self._schedule_refill(group_id)
+
+            # 队列为空或所有组的队首项都在等下游: 等待新项或 notify()
+            self._has_items.clear()
+            await self._has_items.wait()
+
+    def _dequeue(self, ready: Optional[Callable[[Any], bool]] = None) -> Optional[Tuple[int, Any]]:
+        """赤字轮询: 队首组额度足够则取一项，否则补充额度并轮到下一组"""
+        skipped = 0
+        while self._ring:
+            group_id = self._ring[0]
+            queue = self._queues.get(group_id)
+            if not queue:
+                self._leave_ring(group_id)
+                continue
+
+            # 队首项暂时不能处理: 不补充额度，轮到下一组；所有组都不能处理时返回
+            if ready is not None and not ready(queue[0]):
+                skipped += 1
+                if skipped >= len(self._ring):
+                    return None
+                self._ring.rotate(-1)
+                continue
+
+            cost = self.cost(queue[0])
+            if self._deficits[group_id] >= cost:
+                self._deficits[group_id] -= cost
+                item = queue.popleft()
+                self._group_stats(group_id)['dispatched'] += 1
+
+                if not queue:
+                    self._leave_ring(group_id)
+                space = self._space.get(group_id)
+                if space:
+                    space.set()
+                return group_id, item
+
+            self._deficits[group_id] += self.quantum * self.weight(group_id)
+            self._ring.rotate(-1)
+            skipped = 0
+        return None
+
+    def _leave_ring(self, group_id: int):
+        """队列空了的组退出轮询，额度清零（不能把额度攒到下次）"""
+        self._ring.remove(group_id)
+        self._in_ring.discard(group_id)
+        self._deficits[group_id] = 0.0
+
+    def _spill_path(self, group_id: int) -> Path:
+        return self.spill_dir / f"{group_id}.jsonl"
+
+    async def _spill(self, group_id: int, item: Any):
+        """把一项写入该组的溢出文件"""
+        stats = self._group_stats(group_id)
+        try:
+            record = await self.spill_record(group_id, item)
+            if record is None:
+                stats['dropped'] += 1
+                return
+
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            with self._spill_path(group_id).open('a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+            self._spilled[group_id] = self._spilled.get(group_id, 0) + 1
+            self._spill_offsets.setdefault(group_id, 0)
+            stats['spilled'] += 1
+
+        except Exception as e:
+            stats['lost'] += 1
+            self.logger.error(f"❌ 写入溢出文件失败 组{group_id}: {e}")
+
+    def _schedule_refill(self, group_id: int):
+        """在后台任务中恢复该组的溢出记录，get() 不等待恢复（restore 可能需要网络请求）"""
+        if group_id in self._refilling:
+            return
+        # 立即登记，恢复完成前 put() 的新项继续写入溢出文件，排在待恢复的记录之后
+        self._refilling.add(group_id)
+        task = asyncio.create_task(self._refill(group_id))
+        self._refill_tasks.add(task)
+        task.add_done_callback(self._refill_tasks.discard)
+
+    async def _refill(self, group_id: int):
+        """从溢出文件恢复最多半个队列的记录
+
+        恢复的项放入内存队列之后才推进读取位置和未读计数；
+        读完所有记录（包括恢复期间新写入的）时删除溢出文件。
+        """
+        self._refilling.add(group_id)
+        stats = self._group_stats(group_id)
+        path = self._spill_path(group_id)
+        try:
+            limit = self.max_depth - self.depth(group_id) - self.max_depth // 4
+            if limit <= 0:
+                return
+            records = []
+            with path.open('rb') as f:
+                f.seek(self._spill_offsets.get(group_id, 0))
+                while len(records) < limit:
+                    line = f.readline()
+                    if not line:
+                        break
+                    if line.strip():
+                        records.append(json.loads(line))
+                offset = f.tell()
+
+            items = []
+            if records:
+                try:
+                    items = await self.restore(group_id, records)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # 读过的记录不再重试，计入丢失
+                    self.logger.error(f"❌ 恢复溢出消息失败 组{group_id}: {e}")
+                for item in items:
+                    self._append(group_id, item)
+                stats['restored'] += len(items)
+                stats['lost'] += len(records) - len(items)
+
+            self._spill_offsets[group_id] = offset
+            remaining = self._spilled.get(group_id, 0) - len(records)
+            if not records or remaining <= 0:
+                # 没有可读的记录: 计数与文件不一致（如空行），以文件为准
+                self._spilled[group_id] = 0
+                self._spill_offsets.pop(group_id, None)
+                path.unlink(missing_ok=True)
+            else:
+                self._spilled[group_id] = remaining
+
+        except FileNotFoundError:
+            self._spilled[group_id] = 0
+            self._spill_offsets.pop(group_id, None)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.error(f"❌ 读取溢出文件失败 组{group_id}: {e}")
+        finally:
+            self._refilling.discard(group_id)
+            # 唤醒 get()；恢复期间写入的新项也可能需要继续恢复
+            self._has_items.set()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """队列统计: 各组深度、权重和计数"""
+        groups = {}
+        for group_id in sorted(set(self._stats) | set(self._queues) | set(self._spilled)):
+            groups[group_id] = {
+                'depth': self.depth(group_id),
+                'spilled_pending': self._spilled.get(group_id, 0),
+                'weight': self.weight(group_id),
+                **self._group_stats(group_id)
+            }
+
+        return {
+            'max_depth': self.max_depth,
+            'overflow': self.overflow,
+            'total_depth': sum(len(queue) for queue in self._queues.values()),
+            'active_groups': len(self._ring),
+            'groups': groups
+        }
@@ -0,0 +1,97 @@
+"""
+过滤结果缓存 - 相同文本和相同过滤配置只计算一次
+"""
+
+import sys
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+
+class FilterResultCache:
+    """过滤结果LRU缓存
+
+    键为 (文本内容哈希, 过滤计划指纹, 广告关键词版本, 规则暂停版本)，
+    同一源频道的消息被多个配置相同的搬运组处理时只过滤一次。
+    按条目数和结果总字节数两个上限淘汰。
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max(0, max_entries)
+        self.max_bytes = max(0, max_bytes)
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes = 0
+
+        # 统计
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    @staticmethod
+    def make_key(text: str, fingerprint: str, version: int = 0, extra: Optional[Tuple] = None,
+                 rules_version: int = 0) -> Tuple[bytes, str, int, int]:
+        """生成缓存键
+
+        extra 为影响结果的附加输入，如消息实体中的链接位置；
+        rules_version 为过滤计划中规则暂停/恢复的版本，暂停期间的结果在规则恢复后不再命中。
+        """
+        hasher = hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16)
+        if extra is not None:
+            hasher.update(b'\x00' + repr(extra).encode('ascii'))
+        return hasher.digest(), fingerprint, version, rules_version
+
+    def get(self, key: Tuple) -> Optional[str]:
+        """查询缓存，未命中返回 None"""
+        result = self._entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key: Tuple, result: str):
+        """写入缓存"""
+        if not self.enabled:
+            return
+
+        size = sys.getsizeof(result)
+        if size > self.max_bytes:
+            return
+
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= sys.getsizeof(old)
+
+        self._entries[key] = result
+        self._bytes += size
+
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= sys.getsizeof(evicted)
+            self.evictions += 1
+
+    def clear(self):
+        """清空缓存"""
+        self._entries.clear()
+        self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取命中率统计"""
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0
+        }
@@ -0,0 +1,123 @@
+"""
+过滤性能采样 - 按组、按阶段/规则统计耗时和命中情况
+"""
+
+import itertools
+import threading
+from collections import deque
+from typing import Dict, Any, Optional
+
+
+class _StageStats:
+    """单个阶段或规则的采样统计"""
+
+    __slots__ = ('samples', 'total_time', 'matches', 'chars_removed', 'latencies')
+
+    def __init__(self, window: int):
+        self.samples = 0
+        self.total_time = 0.0
+        self.matches = 0
+        self.chars_removed = 0
+        self.latencies = deque(maxlen=window)
+
+
+class FilterProfiler:
+    """过滤性能采样器
+
+    每 1/sample_rate 次过滤采样一次，未采样的调用只有一次计数器自增的开销。
+    采样的调用记录每个阶段和每条自定义规则的耗时、命中次数和删除字符数，
+    延迟分位数由最近 window 个采样计算。
+    """
+
+    def __init__(self, sample_rate: float = 0.01, window: int = 512):
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.sample_every = round(1 / self.sample_rate) if self.sample_rate > 0 else 0
+        self.window = max(1, window)
+
+        self._calls = itertools.count()
+        self._lock = threading.Lock()
+        self._groups: Dict[Any, Dict[str, _StageStats]] = {}
+        self.sampled_calls = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_every > 0
+
+    def sample(self) -> bool:
+        """本次调用是否采样"""
+        return self.sample_every > 0 and next(self._calls) % self.sample_every == 0
+
+    def begin(self):
+        """记录一次被采样的过滤调用"""
+        with self._lock:
+            self.sampled_calls += 1
+
+    def record(self, group_id: Optional[int], stage: str, elapsed: float, matches: int = 0, chars_removed: int = 0):
+        """记录一个阶段或规则的一次采样"""
+        with self._lock:
+            stages = self._groups.setdefault(group_id, {})
+            stats = stages.get(stage)
+            if stats is None:
+                stats = stages[stage] = _StageStats(self.window)
+
+            stats.samples += 1
+            stats.total_time += elapsed
+            stats.matches += matches
+            stats.chars_removed += max(0, chars_removed)
+            stats.latencies.append(elapsed)
+
+    def reset(self):
+        """清空采样数据"""
+        with self._lock:
+            self._groups.clear()
+            self.sampled_calls = 0
+
+    @staticmethod
+    def _percentile(ordered: list, q: float) -> float:
+        if not ordered:
+            return 0.0
+        return ordered[int(q * (len(ordered) - 1))]
+
+    def get_profile(self, group_id: Optional[int] = None) -> Dict[str, Any]:
+        """获取采样统计，阶段按累计耗时降序
+
+        estimated_* 为按采样率放大的估计值；阶段的 matches 为改动了文本（或拒绝了消息）的次数，
+        自定义规则的 matches 为匹配次数。
+        """
+        with self._lock:
+            groups = {
+                gid: {
+                    stage: (stats.samples, stats.total_time, stats.matches, stats.chars_removed, sorted(stats.latencies))
+                    for stage, stats in stages.items()
+                }
+                for gid, stages in self._groups.items()
+                if group_id is None or gid == group_id
+            }
+            sampled_calls = self.sampled_calls
+
+        scale = self.sample_every or 1
+        report = {}
+        for gid, stages in groups.items():
+            rows = []
+            for stage, (samples, total_time, matches, chars_removed, latencies) in stages.items():
+                rows.append({
+                    'stage': stage,
+                    'samples': samples,
+                    'estimated_invocations': samples * scale,
+                    'total_ms': round(total_time * 1000, 3),
+                    'estimated_total_ms': round(total_time * scale * 1000, 3),
+                    'avg_ms': round(total_time / samples * 1000, 4) if samples else 0,
+                    'p50_ms': round(self._percentile(latencies, 0.5) * 1000, 4),
+                    'p99_ms': round(self._percentile(latencies, 0.99) * 1000, 4),
+                    'matches': matches,
+                    'chars_removed': chars_removed
+                })
+            rows.sort(key=lambda row: row['total_ms'], reverse=True)
+            report[str(gid) if gid is not None else 'unknown'] = rows
+
+        return {
+            'enabled': self.enabled,
+            'sample_rate': self.sample_rate,
+            'sampled_calls': sampled_calls,
+            'groups': report
+        }
@@ -3,13 +3,191 @@
 """
 
 import re
+import json
+import time
+import hashlib
 import logging
-from typing import Dict, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple, Any, Iterable, Union
+
+from .keyword_matcher import KeywordMatcher
+from .regex_guard import check_regex, compile_rule_pattern, subn_with_timeout
+from .filter_profiler import FilterProfiler
+from .spam_scorer import LinearScorer, build_features
+
+
+# 统计英文字母用的字节删除表（与 [a-zA-Z] 一致）
+_ASCII_NON_LETTERS = bytes(code for code in range(256) if not (65 <= code <= 90 or 97 <= code <= 122))
+_ASCII_UPPER = bytes(range(65, 91))
+
+# 超出时间预算的正则规则在过滤计划中暂停的时长（秒），到期后恢复执行
+SLOW_RULE_SUSPEND = 600
+
+
+class FilterPlan:
+    """编译后的过滤计划
+
+    由组的过滤器配置编译一次: 预编译自定义正则、整理关键词替换和删除行规则，
+    并按执行顺序列出启用的阶段。配置不变时可重复使用。
+    """
+    
+    # 文本处理阶段的执行顺序
+    STAGE_ORDER = ('remove_links', 'remove_emojis', 'remove_special_chars', 'custom_rules')
+    
+    def __init__(self, filters: Optional[Dict] = None):
+        filters = filters or {}
+        self.fingerprint = self.fingerprint_of(filters)
+        
+        # 拒绝类检查
+        self.ad_detection = bool(filters.get('ad_detection', False))
+        self.smart_filter = bool(filters.get('smart_filter', False))
+        
+        # 自定义规则: (类型, 模式或已编译正则, 替换文本)
+        # 静态检查判定为灾难性回溯的正则不参与执行，记入 rejected_rules
+        self.rejected_rules: Dict[str, str] = {}
+        self.custom_rules = self.compile_rules(filters.get('custom_rules') or [], self.rejected_rules)
+        
+        # 执行超出时间预算的正则: 模式 -> 耗时(毫秒)，记录后在本计划中暂停，SLOW_RULE_SUSPEND 秒后恢复
+        self.slow_rules: Dict[str, float] = {}
+        # 尚未取走的超时记录: 模式 -> (耗时(毫秒), 是否被 regex 模块的超时中断)
+        self._slow_reports: Dict[str, Tuple[float, bool]] = {}
+        self._resume_at = 0.0
+        # 规则暂停或恢复时加一，缓存键包含它
+        self.rules_version = 0
+        
+        self._filters = filters
+        self._update_stages()
+
+    def _update_stages(self):
+        self.stages: List[str] = [
+            stage for stage in self.STAGE_ORDER
+            if (self.custom_rules if stage == 'custom_rules' else self._filters.get(stage, False))
+        ]
+
+    @staticmethod
+    def fingerprint_of(filters: Optional[Dict]) -> str:
+        """过滤器配置指纹（键顺序无关）"""
+        normalized = json.dumps(filters or {}, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def compile_rules(rules, rejected: Optional[Dict[str, str]] = None) -> List[Tuple[str, Any, str]]:
+        """编译自定义规则，无效、已停用和存在灾难性回溯风险的规则跳过"""
+        compiled = []
+        for rule in rules:
+            if not isinstance(rule, dict) or rule.get('disabled'):
+                continue
+            
+            rule_type = rule.get('type')
+            pattern = rule.get('pattern')
+            replacement = rule.get('replacement', '')
+            
+            if not pattern:
+                continue
+            
+            if rule_type == 'regex':
+                issues = check_regex(pattern)
+                if issues['errors']:
+                    logging.getLogger(__name__).warning(f"⚠️ 跳过正则规则 {pattern!r}: {'; '.join(issues['errors'])}")
+                    if rejected is not None:
+                        rejected[pattern] = '; '.join(issues['errors'])
+                    continue
+                compiled.append(('regex', compile_rule_pattern(pattern), replacement))
+            elif rule_type in ('keyword', 'remove_line'):
+                compiled.append((rule_type, pattern, replacement))
+        
+        return FilterPlan._group_literal_rules(compiled)
+
+    @staticmethod
+    def _group_literal_rules(rules: List[Tuple[str, Any, Any]]) -> List[Tuple[str, Any, Any]]:
+        """把连续的关键词/删除行规则合并为一组，用一个多关键词匹配器一次扫描"""
+        grouped, run = [], []
+        
+        def close_run():
+            if len(run) >= 2:
+                grouped.append(('literal', KeywordMatcher(pattern for _, pattern, _ in run), list(run)))
+            else:
+                grouped.extend(run)
+            run.clear()
+        
+        for rule in rules:
+            if rule[0] in ('keyword', 'remove_line'):
+                run.append(rule)
+            else:
+                close_run()
+                grouped.append(rule)
+        close_run()
+        
+        return grouped
+
+    def disable_rule(self, pattern: str, elapsed_ms: float, timed_out: bool = False):
+        """暂停超出时间预算的正则规则（替换规则列表而不是原地修改，正在执行的过滤不受影响）"""
+        self.slow_rules[pattern] = max(elapsed_ms, self.slow_rules.get(pattern, 0))
+        previous_ms, previous_timed_out = self._slow_reports.get(pattern, (0, False))
+        self._slow_reports[pattern] = (max(elapsed_ms, previous_ms), timed_out or previous_timed_out)
+        self._resume_at = time.monotonic() + SLOW_RULE_SUSPEND
+        self.rules_version += 1
+        self.custom_rules = [
+            rule for rule in self.custom_rules
+            if not (rule[0] == 'regex' and rule[1].pattern == pattern)
+        ]
+        self._update_stages()
+
+    def take_slow_rules(self) -> Dict[str, Tuple[float, bool]]:
+        """取出上次调用以来新记录的超时规则: 模式 -> (耗时(毫秒), 是否被超时中断)"""
+        reports, self._slow_reports = self._slow_reports, {}
+        return reports
+
+    def merge_slow_rules(self, slow_rules: Dict[str, Tuple[float, bool]]):
+        """合并工作进程中记录的超时规则"""
+        for pattern, (elapsed_ms, timed_out) in slow_rules.items():
+            self.disable_rule(pattern, elapsed_ms, timed_out)
+
+    def resume_slow_rules(self) -> bool:
+        """暂停到期后恢复被暂停的正则规则，返回是否恢复"""
+        if not self.slow_rules or time.monotonic() < self._resume_at:
+            return False
+        self.slow_rules = {}
+        self.rules_version += 1
+        self.custom_rules = self.compile_rules(self._filters.get('custom_rules') or [])
+        self._update_stages()
+        return True
+
+    @property
+    def cost_weight(self) -> int:
+        """每个字符的相对处理成本，用于估算过滤耗时（空白清理计 1）"""
+        weight = 1 + len([stage for stage in self.stages if stage != 'custom_rules'])
+        weight += int(self.ad_detection) + int(self.smart_filter)
+        for rule_type, _, _ in self.custom_rules:
+            weight += 4 if rule_type == 'regex' else 1
+        return weight
+
+    def estimate_cost(self, text: str) -> int:
+        """估算过滤一段文本的成本"""
+        return len(text) * self.cost_weight
+
+    @property
+    def is_noop(self) -> bool:
+        """没有任何启用的阶段"""
+        return not (self.ad_detection or self.smart_filter or self.stages)
 
 
 class MessageFilter:
     """消息过滤器"""
     
+    # 可以在拼接后的整批文本上执行的逐字符删除阶段
+    # （链接阶段逐条执行，以便利用逐条的子串预检跳过大部分文本）
+    BATCH_STAGES = ('remove_emojis', 'remove_special_chars')
+    
+    # 批量拼接分隔符: 空白字符，不会被逐字符删除阶段删掉
+    BATCH_SEPARATOR = '\x1e'
+    
+    # 删除链接时按偏移量裁掉的 Telethon 消息实体（按类名匹配，工作进程无需导入 Telethon）
+    LINK_ENTITY_TYPES = frozenset({'MessageEntityUrl', 'MessageEntityMention'})
+    
+    # 文字链接: 链接地址只在实体中，原始文本里是要保留的锚文字
+    HIDDEN_LINK_ENTITY_TYPES = frozenset({'MessageEntityTextUrl'})
+    
     def __init__(self, settings):
         self.settings = settings
         self.logger = logging.getLogger(__name__)
@@ -28,6 +206,30 @@ class MessageFilter:
             '发票', '***', '微商', '淘宝客', '返利'
         ]
         
+        # 典型广告短语
+        self.ad_phrases = [
+            '加我微信', '联系客服', '免费咨询', '立即下单',
+            '扫码关注', '点击购买', '限时特价', '包邮到家'
+        ]
+        
+        # 多关键词匹配器（关键词变化时重建，版本号用于使过滤结果缓存失效）
+        self._ad_keyword_matcher = KeywordMatcher(self.ad_keywords)
+        self.keywords_version = 0
+        
+        # 单条正则规则的执行时间预算（毫秒）
+        self.regex_budget_ms = settings.filter_regex_budget_ms if settings else 50
+        
+        # 按组、按阶段/规则的采样性能统计
+        self.profiler = FilterProfiler(settings.filter_profile_sample_rate if settings else 0)
+        
+        # 广告/垃圾内容打分模型
+        self.set_scoring_models(settings.filter_scoring_models if settings else None)
+        
+        # 批量过滤的进程池（按需创建）
+        self._batch_executor: Optional[ProcessPoolExecutor] = None
+        self._batch_workers = 0
+        self._ad_phrase_matcher = KeywordMatcher(self.ad_phrases)
+        
         # 特殊符号（保留#号）
         self.special_chars_pattern = re.compile(r'[^\w\s\u4e00-\u9fff#]', re.UNICODE)
         
@@ -36,21 +238,29 @@ class MessageFilter:
             r'[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001F1E0-\U0001F1FF\U00002600-\U000027BF\U0001f900-\U0001f9ff\U0001f600-\U0001f64f\U0001f680-\U0001f6ff\u2600-\u27bf]',
             re.UNICODE
         )
+        
+        # ASCII文本删除特殊符号用的转换表（表情符号都不在ASCII范围内）
+        self._ascii_special_table = str.maketrans('', '', ''.join(
+            chr(code) for code in range(128) if self.special_chars_pattern.match(chr(code))
+        ))
 
     def _compile_patterns(self):
         """预编译正则表达式"""
-        # URL链接匹配
+        # URL链接匹配（单个字符类，%XX 转义的字符都已包含在 $-_ 范围内）
         self.url_pattern = re.compile(
-            r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+',
+            r'https?://[a-zA-Z0-9$-_@.&+!*\\(),]+',
             re.IGNORECASE
         )
         
-        # Telegram链接
+        # Telegram链接（前瞻 [htw] 让不可能的起始位置快速失败）
         self.telegram_link_pattern = re.compile(
-            r'(?:https?://)?(?:www\.)?(?:t\.me|telegram\.me)/\S+',
+            r'(?=[htw])(?:https?://)?(?:www\.)?(?:t\.me|telegram\.me)/\S+',
             re.IGNORECASE
         )
         
+        # Telegram链接预检（t.me/ 与 telegram.me/ 都以 .me/ 结尾）
+        self.telegram_link_hint = re.compile(r'\.me/', re.IGNORECASE)
+        
         # @提及
         self.mention_pattern = re.compile(r'@\w+')
         
@@ -62,41 +272,51 @@ class MessageFilter:
         
         # 微信号
         self.wechat_pattern = re.compile(r'[微V信]{1,2}[:：\s]*[a-zA-Z0-9_-]{6,20}')
+        
+        # 任一联系方式（一次扫描代替三个正则分别查找）
+        self.contact_pattern = re.compile('|'.join(
+            f'(?:{pattern.pattern})' for pattern in (self.phone_pattern, self.qq_pattern, self.wechat_pattern)
+        ))
+
+    def compile_plan(self, filters: Dict) -> FilterPlan:
+        """编译过滤计划"""
+        return FilterPlan(filters)
 
     def filter_text(self, text: str, filters: Dict) -> str:
         """过滤文本内容"""
+        return self.apply_plan(text, self.compile_plan(filters))
+
+    def apply_plan(self, text: str, plan: FilterPlan, group_id: Optional[int] = None,
+                   link_spans: Optional[Tuple[Tuple[int, int], ...]] = None) -> str:
+        """按编译好的过滤计划过滤文本
+
+        group_id 用于性能采样归类；link_spans 为 link_spans_from_entities 得到的链接位置，
+        提供时删除链接按偏移量裁剪，为 None 时用正则查找。
+        """
         if not text:
             return ""
         
+        if self.profiler.sample():
+            return self._apply_plan_profiled(text, plan, group_id, link_spans)
+        
         try:
             filtered_text = text
             
-            # 广告检测
-            if filters.get('ad_detection', False):
-                if self._is_advertisement(filtered_text):
-                    return ""
-            
-            # 智能过滤
-            if filters.get('smart_filter', False):
-                if self._is_spam_content(filtered_text):
+            # 广告检测 / 智能过滤（特征只提取一次）
+            if plan.ad_detection or plan.smart_filter:
+                if self._is_rejected(filtered_text, plan):
                     return ""
             
-            # 删除链接
-            if filters.get('remove_links', False):
-                filtered_text = self._remove_links(filtered_text)
-            
-            # 删除表情符号
-            if filters.get('remove_emojis', False):
-                filtered_text = self._remove_emojis(filtered_text)
-            
-            # 删除特殊符号
-            if filters.get('remove_special_chars', False):
-                filtered_text = self._remove_special_chars(filtered_text)
-            
-            # 自定义过滤规则
-            custom_rules = filters.get('custom_rules', [])
-            if custom_rules:
-                filtered_text = self._apply_custom_rules(filtered_text, custom_rules)
+            # 链接阶段总是第一个文本阶段，实体偏移量对应的仍是原文
+            for stage in plan.stages:
+                if stage == 'remove_links':
+                    filtered_text = self._strip_links(filtered_text, link_spans)
+                elif stage == 'remove_emojis':
+                    filtered_text = self._remove_emojis(filtered_text)
+                elif stage == 'remove_special_chars':
+                    filtered_text = self._remove_special_chars(filtered_text)
+                elif stage == 'custom_rules':
+                    filtered_text = self._apply_compiled_rules(filtered_text, plan.custom_rules, plan)
             
             # 清理多余空行
             filtered_text = self._clean_whitespace(filtered_text)
@@ -107,43 +327,237 @@ class MessageFilter:
             self.logger.error(f"❌ 过滤文本失败: {e}")
             return text
 
-    def _is_advertisement(self, text: str) -> bool:
-        """检测是否为广告内容"""
+    def _apply_plan_profiled(self, text: str, plan: FilterPlan, group_id: Optional[int],
+                             link_spans: Optional[Tuple[Tuple[int, int], ...]] = None) -> str:
+        """apply_plan 的采样版本: 逐阶段、逐规则计时"""
+        profiler = self.profiler
+        profiler.begin()
+        
         try:
-            text_lower = text.lower()
-            
-            # 检查广告关键词
-            ad_count = sum(1 for keyword in self.ad_keywords if keyword in text_lower)
-            
-            # 如果包含2个或以上广告关键词，认为是广告
-            if ad_count >= 2:
-                return True
-            
-            # 检查联系方式
-            contact_patterns = [
-                self.phone_pattern,
-                self.qq_pattern,
-                self.wechat_pattern
-            ]
-            
-            contact_count = sum(1 for pattern in contact_patterns if pattern.search(text))
+            filtered_text = text
             
-            # 包含联系方式且有广告关键词
-            if contact_count > 0 and ad_count > 0:
-                return True
+            if plan.ad_detection or plan.smart_filter:
+                start = time.perf_counter()
+                rejected = self._is_rejected(filtered_text, plan)
+                profiler.record(group_id, 'content_scoring', time.perf_counter() - start,
+                                int(rejected), len(filtered_text) if rejected else 0)
+                if rejected:
+                    return ""
             
-            # 检查典型广告短语
-            ad_phrases = [
-                '加我微信', '联系客服', '免费咨询', '立即下单',
-                '扫码关注', '点击购买', '限时特价', '包邮到家'
-            ]
+            for stage in plan.stages:
+                if stage == 'custom_rules':
+                    filtered_text = self._apply_compiled_rules(filtered_text, plan.custom_rules, plan, group_id, True)
+                    continue
+                
+                start = time.perf_counter()
+                before = len(filtered_text)
+                if stage == 'remove_links':
+                    filtered_text = self._strip_links(filtered_text, link_spans)
+                elif stage == 'remove_emojis':
+                    filtered_text = self._remove_emojis(filtered_text)
+                elif stage == 'remove_special_chars':
+                    filtered_text = self._remove_special_chars(filtered_text)
+                removed = before - len(filtered_text)
+                profiler.record(group_id, stage, time.perf_counter() - start, int(removed > 0), removed)
+            
+            start = time.perf_counter()
+            before = len(filtered_text)
+            filtered_text = self._clean_whitespace(filtered_text).strip()
+            removed = before - len(filtered_text)
+            profiler.record(group_id, 'clean_whitespace', time.perf_counter() - start, int(removed > 0), removed)
+            
+            return filtered_text
             
-            phrase_count = sum(1 for phrase in ad_phrases if phrase in text)
-            if phrase_count >= 2:
-                return True
+        except Exception as e:
+            self.logger.error(f"❌ 过滤文本失败: {e}")
+            return text
+
+    def filter_batch(self, texts: Iterable[str], filters: Union[Dict, FilterPlan],
+                     workers: int = 1, chunk_size: int = 500,
+                     link_spans: Optional[List[Optional[Tuple]]] = None) -> List[str]:
+        """批量过滤文本，结果与逐条 filter_text 一致且顺序与输入相同
+
+        过滤计划只编译一次；表情/特殊符号阶段在拼接后的整批文本上各执行一次。
+        workers > 1 且数量超过 chunk_size 时按块分发到进程池并行处理。
+        link_spans 与 texts 一一对应（实体给出的链接位置），可省略。
+        """
+        texts = list(texts)
+        plan = filters if isinstance(filters, FilterPlan) else self.compile_plan(filters)
+        
+        if workers <= 1 or len(texts) <= chunk_size:
+            return self._filter_chunk(texts, plan, link_spans)
+        
+        executor = self._get_batch_executor(workers)
+        chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+        if link_spans is None:
+            span_chunks = [None] * len(chunks)
+        else:
+            span_chunks = [link_spans[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+        results = []
+        for chunk_result, slow_rules in executor.map(
+            _filter_batch_worker, chunks,
+            [plan] * len(chunks), [self.ad_keywords] * len(chunks),
+            [self.regex_budget_ms] * len(chunks), span_chunks,
+            [self.scoring_models] * len(chunks)
+        ):
+            results.extend(chunk_result)
+            plan.merge_slow_rules(slow_rules)
+        return results
+
+    def _filter_chunk(self, texts: List[str], plan: FilterPlan,
+                      link_spans: Optional[List[Optional[Tuple]]] = None) -> List[str]:
+        """在当前进程中批量过滤一块文本（link_spans 与 texts 一一对应，可省略）"""
+        separator = self.BATCH_SEPARATOR
+        batch_stages = [stage for stage in plan.stages if stage in self.BATCH_STAGES]
+        if link_spans is None:
+            link_spans = [None] * len(texts)
+        
+        # 文本本身含有分隔符时无法拆分，逐条处理
+        if not batch_stages or any(separator in text for text in texts if text):
+            return [self.apply_plan(text, plan, link_spans=spans) for text, spans in zip(texts, link_spans)]
+        
+        try:
+            # 拒绝类检查: 逐条提取特征，整批打分
+            results: List[Optional[str]] = [None] * len(texts)
+            pending: List[int] = []
+            for index, text in enumerate(texts):
+                if text:
+                    pending.append(index)
+                else:
+                    results[index] = ""
+            
+            if plan.ad_detection or plan.smart_filter:
+                rejected = self._rejected_batch([texts[index] for index in pending], plan)
+                for index, is_rejected in zip(pending, rejected):
+                    if is_rejected:
+                        results[index] = ""
+                pending = [index for index, is_rejected in zip(pending, rejected) if not is_rejected]
+            
+            if not pending:
+                return results
+            
+            # 链接阶段逐条执行，逐字符阶段整批执行
+            if 'remove_links' in plan.stages:
+                joined = separator.join(self._strip_links(texts[index], link_spans[index]) for index in pending)
+            else:
+                joined = separator.join(texts[index] for index in pending)
+            
+            for stage in batch_stages:
+                if stage == 'remove_emojis':
+                    joined = self._remove_emojis(joined)
+                elif stage == 'remove_special_chars':
+                    joined = self._remove_special_chars(joined)
+            
+            parts = joined.split(separator)
+            if len(parts) != len(pending):
+                raise ValueError('批量拆分数量不一致')
+            
+            # 自定义规则和空白清理逐条执行
+            for index, text in zip(pending, parts):
+                if 'custom_rules' in plan.stages:
+                    text = self._apply_compiled_rules(text, plan.custom_rules, plan)
+                results[index] = self._clean_whitespace(text).strip()
+            
+            return results
             
+        except Exception as e:
+            self.logger.error(f"❌ 批量过滤失败，改为逐条处理: {e}")
+            return [self.apply_plan(text, plan, link_spans=spans) for text, spans in zip(texts, link_spans)]
+
+    def submit_to_pool(self, executor: ProcessPoolExecutor, text: str, plan: FilterPlan,
+                       link_spans: Optional[Tuple[Tuple[int, int], ...]] = None):
+        """把单条文本提交到进程池过滤，返回 concurrent.futures.Future
+
+        结果为 (过滤后文本的列表, 超时规则)，超时规则需用 plan.merge_slow_rules 合并回本进程的计划。
+        """
+        return executor.submit(
+            _filter_batch_worker, [text], plan, self.ad_keywords, self.regex_budget_ms, [link_spans], self.scoring_models
+        )
+
+    def _get_batch_executor(self, workers: int) -> ProcessPoolExecutor:
+        """获取批量过滤进程池（工作进程数变化时重建）"""
+        if self._batch_executor is None or self._batch_workers != workers:
+            self.close()
+            self._batch_executor = ProcessPoolExecutor(max_workers=workers)
+            self._batch_workers = workers
+        return self._batch_executor
+
+    def close(self):
+        """关闭批量过滤进程池"""
+        if self._batch_executor is not None:
+            self._batch_executor.shutdown(wait=False, cancel_futures=True)
+            self._batch_executor = None
+            self._batch_workers = 0
+
+    def set_scoring_models(self, models: Optional[Dict]):
+        """设置广告/垃圾内容打分模型，配置无效时使用默认模型"""
+        try:
+            self.scorer = LinearScorer(models)
+            self.scoring_models = models
+        except (ValueError, TypeError, AttributeError) as e:
+            self.logger.error(f"❌ 打分模型配置无效，使用默认模型: {e}")
+            self.scorer = LinearScorer()
+            self.scoring_models = None
+        self._ad_output = self.scorer.index_of('ad')
+        self._spam_output = self.scorer.index_of('spam')
+        
+        # 联系方式正则只在模型用到时执行（默认模型只在出现广告关键词时需要）
+        self._contact_always = self.scorer.uses('has_contact')
+        self._contact_with_keywords = self.scorer.uses('rule_contact_keyword')
+        
+        # 判定结果变化，使过滤结果缓存失效
+        self.keywords_version += 1
+
+    def extract_features(self, text: str) -> List[float]:
+        """提取打分特征向量（各项计数都只扫描一次文本，模型用不到的联系方式特征跳过）"""
+        ad_count = self._ad_keyword_matcher.count(text.lower())
+        
+        has_contact = False
+        if self._contact_always or (self._contact_with_keywords and ad_count):
+            has_contact = self.contact_pattern.search(text) is not None
+        
+        letters = text.encode('ascii', 'ignore').translate(None, _ASCII_NON_LETTERS)
+        
+        return build_features(
+            ad_count,
+            self._ad_phrase_matcher.count(text),
+            has_contact,
+            len(text),
+            len(set(text)),
+            text.count('!') + text.count('！') + text.count('?') + text.count('？'),
+            len(letters),
+            len(letters) - len(letters.translate(None, _ASCII_UPPER))
+        )
+
+    def score_text(self, text: str) -> Dict[str, float]:
+        """各打分模型对文本的得分（> 0 判定为真）"""
+        return dict(zip(self.scorer.names, self.scorer.score(self.extract_features(text))))
+
+    def _decide(self, scores: List[float], plan: FilterPlan) -> bool:
+        return (plan.ad_detection and scores[self._ad_output] > 0) or \
+            (plan.smart_filter and scores[self._spam_output] > 0)
+
+    def _is_rejected(self, text: str, plan: FilterPlan) -> bool:
+        """按计划中启用的检查判断是否拒绝整条消息"""
+        try:
+            return self._decide(self.scorer.score(self.extract_features(text)), plan)
+        except Exception as e:
+            self.logger.error(f"❌ 内容打分失败: {e}")
             return False
-            
+
+    def _rejected_batch(self, texts: List[str], plan: FilterPlan) -> List[bool]:
+        """批量判断是否拒绝"""
+        try:
+            rows = [self.extract_features(text) for text in texts]
+            return [self._decide(scores, plan) for scores in self.scorer.score_batch(rows)]
+        except Exception as e:
+            self.logger.error(f"❌ 批量内容打分失败: {e}")
+            return [False] * len(texts)
+
+    def _is_advertisement(self, text: str) -> bool:
+        """检测是否为广告内容"""
+        try:
+            return self.scorer.score(self.extract_features(text))[self._ad_output] > 0
         except Exception as e:
             self.logger.error(f"❌ 广告检测失败: {e}")
             return False
@@ -151,38 +565,86 @@ class MessageFilter:
     def _is_spam_content(self, text: str) -> bool:
         """检测是否为垃圾内容"""
         try:
-            # 检查重复字符
-            if len(set(text)) / len(text) < 0.3 and len(text) > 10:
-                return True
-            
-            # 检查过多感叹号或问号
-            if text.count('!') + text.count('！') + text.count('?') + text.count('？') > len(text) * 0.2:
-                return True
-            
-            # 检查全大写英文（超过一定比例）
-            english_chars = re.findall(r'[a-zA-Z]', text)
-            if len(english_chars) > 10:
-                upper_ratio = sum(1 for c in english_chars if c.isupper()) / len(english_chars)
-                if upper_ratio > 0.8:
-                    return True
-            
-            return False
-            
+            return self.scorer.score(self.extract_features(text))[self._spam_output] > 0
         except Exception as e:
             self.logger.error(f"❌ 垃圾内容检测失败: {e}")
             return False
 
+    @classmethod
+    def link_spans_from_entities(cls, entities) -> Optional[Tuple[Tuple[int, int], ...]]:
+        """从 Telethon 消息实体中取出链接和提及的 (UTF-16 偏移, 长度)
+
+        消息没有链接类实体时返回 None，删除链接回退到正则
+        （实体缺失或只有格式实体时，文本中仍可能有未被标出的链接）。
+        文字链接不在其中: 删除它的区间会删掉锚文字。
+        """
+        if not entities:
+            return None
+        spans = tuple(sorted(
+            (entity.offset, entity.length) for entity in entities
+            if type(entity).__name__ in cls.LINK_ENTITY_TYPES
+        ))
+        return spans or None
+
+    @classmethod
+    def has_hidden_links(cls, entities) -> bool:
+        """消息实体中是否有文字链接"""
+        return any(type(entity).__name__ in cls.HIDDEN_LINK_ENTITY_TYPES for entity in entities or ())
+
+    @staticmethod
+    def strip_utf16_spans(text: str, spans: Tuple[Tuple[int, int], ...]) -> str:
+        """按 UTF-16 偏移量一次线性扫描删除若干区间（区间可重叠，需按偏移排序）"""
+        if not spans:
+            return text
+        
+        # 只有 BMP 字符时 UTF-16 偏移与字符下标一致，直接切片字符串；否则在 UTF-16 编码上切片
+        encoded = None
+        if not text.isascii():
+            encoded = text.encode('utf-16-le', 'surrogatepass')
+            if len(encoded) == 2 * len(text):
+                encoded = None
+        data, unit = (text, 1) if encoded is None else (encoded, 2)
+        
+        parts = []
+        position = 0
+        for offset, length in spans:
+            start, end = offset * unit, (offset + length) * unit
+            if end <= position:
+                continue
+            if start > position:
+                parts.append(data[position:start])
+            position = end
+        parts.append(data[position:])
+        
+        if encoded is None:
+            return ''.join(parts)
+        return b''.join(parts).decode('utf-16-le', 'surrogatepass')
+
+    def _strip_links(self, text: str, link_spans: Optional[Tuple[Tuple[int, int], ...]]) -> str:
+        """删除链接: 有实体位置时按偏移量裁剪，否则用正则查找"""
+        if link_spans is None:
+            return self._remove_links(text)
+        try:
+            return self.strip_utf16_spans(text, link_spans)
+        except Exception as e:
+            self.logger.error(f"❌ 按实体删除链接失败，改用正则: {e}")
+            return self._remove_links(text)
+
     def _remove_links(self, text: str) -> str:
         """删除链接"""
         try:
+            # 每一步先用子串预检，不可能匹配时跳过完整的正则扫描
             # 删除HTTP链接
-            text = self.url_pattern.sub('', text)
+            if '://' in text:
+                text = self.url_pattern.sub('', text)
             
             # 删除Telegram链接
-            text = self.telegram_link_pattern.sub('', text)
+            if self.telegram_link_hint.search(text):
+                text = self.telegram_link_pattern.sub('', text)
             
             # 删除@提及
-            text = self.mention_pattern.sub('', text)
+            if '@' in text:
+                text = self.mention_pattern.sub('', text)
             
             return text
             
@@ -193,6 +655,8 @@ class MessageFilter:
     def _remove_emojis(self, text: str) -> str:
         """删除表情符号（保留#号）"""
         try:
+            if text.isascii():
+                return text
             return self.emoji_pattern.sub('', text)
         except Exception as e:
             self.logger.error(f"❌ 删除表情符号失败: {e}")
@@ -201,6 +665,8 @@ class MessageFilter:
     def _remove_special_chars(self, text: str) -> str:
         """删除特殊符号（保留#号）"""
         try:
+            if text.isascii():
+                return text.translate(self._ascii_special_table)
             return self.special_chars_pattern.sub('', text)
         except Exception as e:
             self.logger.error(f"❌ 删除特殊符号失败: {e}")
@@ -208,18 +674,24 @@ class MessageFilter:
 
     def _apply_custom_rules(self, text: str, rules: List[Dict]) -> str:
         """应用自定义过滤规则"""
+        return self._apply_compiled_rules(text, FilterPlan.compile_rules(rules))
+
+    def _apply_compiled_rules(self, text: str, rules: List[Tuple[str, Any, str]],
+                              plan: Optional[FilterPlan] = None,
+                              group_id: Optional[int] = None, profiled: bool = False) -> str:
+        """应用已编译的自定义规则
+
+        每条正则都有执行时间预算（超时会被中断，该规则本次不生效），
+        超出预算的规则记录到 plan 中并立即停用。profiled 时逐条规则采样。
+        """
+        if profiled:
+            return self._apply_rules_profiled(text, rules, plan, group_id)
+        
         try:
-            for rule in rules:
-                rule_type = rule.get('type')
-                pattern = rule.get('pattern')
-                replacement = rule.get('replacement', '')
-                
-                if not pattern:
-                    continue
-                
+            for rule_type, pattern, replacement in rules:
                 if rule_type == 'regex':
                     # 正则表达式替换
-                    text = re.sub(pattern, replacement, text)
+                    text, _ = self._apply_regex_rule(text, pattern, replacement, plan)
                 elif rule_type == 'keyword':
                     # 关键词替换
                     text = text.replace(pattern, replacement)
@@ -228,6 +700,51 @@ class MessageFilter:
                     lines = text.split('\n')
                     lines = [line for line in lines if pattern not in line]
                     text = '\n'.join(lines)
+                elif rule_type == 'literal':
+                    text = self._apply_literal_rules(text, pattern, replacement)
+            
+            return text
+            
+        except Exception as e:
+            self.logger.error(f"❌ 应用自定义规则失败: {e}")
+            return text
+
+    def _apply_rules_profiled(self, text: str, rules: List[Tuple[str, Any, str]],
+                              plan: Optional[FilterPlan], group_id: Optional[int]) -> str:
+        """逐条执行自定义规则并记录每条规则的耗时、匹配次数和删除字符数
+
+        合并的关键词组在这里按组内规则逐条执行，结果与合并执行一致。
+        """
+        flattened = []
+        for rule in rules:
+            if rule[0] == 'literal':
+                flattened.extend(rule[2])
+            else:
+                flattened.append(rule)
+        
+        try:
+            for rule_type, pattern, replacement in flattened:
+                start = time.perf_counter()
+                before = len(text)
+                if rule_type == 'regex':
+                    text, matches = self._apply_regex_rule(text, pattern, replacement, plan)
+                    source = pattern.pattern
+                elif rule_type == 'keyword':
+                    matches = text.count(pattern)
+                    if matches:
+                        text = text.replace(pattern, replacement)
+                    source = pattern
+                else:
+                    lines = text.split('\n')
+                    kept = [line for line in lines if pattern not in line]
+                    matches = len(lines) - len(kept)
+                    text = '\n'.join(kept)
+                    source = pattern
+                
+                self.profiler.record(
+                    group_id, f"rule:{rule_type}:{source[:60]}",
+                    time.perf_counter() - start, matches, before - len(text)
+                )
             
             return text
             
@@ -235,9 +752,60 @@ class MessageFilter:
             self.logger.error(f"❌ 应用自定义规则失败: {e}")
             return text
 
+    def _apply_regex_rule(self, text: str, pattern, replacement: str, plan: Optional[FilterPlan]) -> Tuple[str, int]:
+        """在时间预算内执行一条正则替换，返回 (结果, 替换次数)"""
+        budget = self.regex_budget_ms / 1000 if self.regex_budget_ms > 0 else None
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            result, matches = subn_with_timeout(pattern, replacement, text, budget)
+        except TimeoutError:
+            result, matches = text, 0
+            timed_out = True
+        elapsed = time.perf_counter() - start
+        
+        if budget and elapsed > budget:
+            elapsed_ms = round(elapsed * 1000, 1)
+            self.logger.warning(
+                f"⚠️ 正则规则 {pattern.pattern!r} 耗时 {elapsed_ms}ms，超过预算 {self.regex_budget_ms}ms"
+                f"{'（已被超时中断）' if timed_out else ''}，已暂停"
+            )
+            if plan is not None:
+                plan.disable_rule(pattern.pattern, elapsed_ms, timed_out)
+        
+        return result, matches
+
+    def _apply_literal_rules(self, text: str, matcher: KeywordMatcher, rules: List[Tuple[str, str, str]]) -> str:
+        """应用一组连续的关键词/删除行规则
+
+        先一次扫描找出出现的关键词；在本组规则改动文本之前，未出现的关键词规则不会生效可直接跳过，
+        文本被改动后替换结果可能产生新的匹配，其后的规则逐条执行。
+        """
+        present = matcher.find(text)
+        changed = False
+        
+        for rule_type, pattern, replacement in rules:
+            if not changed and pattern not in present:
+                continue
+            
+            if rule_type == 'keyword':
+                new_text = text.replace(pattern, replacement)
+            else:
+                new_text = '\n'.join(line for line in text.split('\n') if pattern not in line)
+            
+            if new_text != text:
+                changed = True
+                text = new_text
+        
+        return text
+
     def _clean_whitespace(self, text: str) -> str:
         """清理多余空白字符"""
         try:
+            # 单行文本只需去掉首尾空白
+            if '\n' not in text:
+                return text.strip()
+            
             # 删除多余空行
             lines = text.split('\n')
             cleaned_lines = []
@@ -293,7 +861,7 @@ class MessageFilter:
                 'qq_numbers': len(self.qq_pattern.findall(text)),
                 'wechat_ids': len(self.wechat_pattern.findall(text)),
                 'emojis': len(self.emoji_pattern.findall(text)),
-                'ad_keywords': sum(1 for keyword in self.ad_keywords if keyword in text.lower())
+                'ad_keywords': self._ad_keyword_matcher.count(text.lower())
             }
             
             return stats
@@ -305,14 +873,40 @@ class MessageFilter:
     def update_ad_keywords(self, keywords: List[str]):
         """更新广告关键词列表"""
         try:
-            self.ad_keywords.extend(keywords)
-            # 去重
-            self.ad_keywords = list(set(self.ad_keywords))
+            self.set_ad_keywords(self.ad_keywords + list(keywords))
             self.logger.info(f"📝 广告关键词已更新，当前数量: {len(self.ad_keywords)}")
             
         except Exception as e:
             self.logger.error(f"❌ 更新广告关键词失败: {e}")
 
+    def set_ad_keywords(self, keywords: List[str]):
+        """替换广告关键词列表（去重并保持顺序）并重建匹配器"""
+        self.ad_keywords = list(dict.fromkeys(keywords))
+        self._ad_keyword_matcher = KeywordMatcher(self.ad_keywords)
+        self.keywords_version += 1
+
     def get_ad_keywords(self) -> List[str]:
         """获取广告关键词列表"""
-        return self.ad_keywords.copy()
\ No newline at end of file
+        return self.ad_keywords.copy()
+
+
+# 批量过滤工作进程内复用的过滤器实例
+_worker_filter: Optional[MessageFilter] = None
+
+
+def _filter_batch_worker(texts: List[str], plan: FilterPlan, ad_keywords: List[str],
+                         regex_budget_ms: float = 50,
+                         link_spans: Optional[List[Optional[Tuple]]] = None,
+                         scoring_models: Optional[Dict] = None) -> Tuple[List[str], Dict[str, Tuple[float, bool]]]:
+    """进程池工作函数: 过滤一块文本，返回 (结果, 本块中超出时间预算的规则)"""
+    global _worker_filter
+    if _worker_filter is None:
+        _worker_filter = MessageFilter(None)
+    if _worker_filter.ad_keywords != ad_keywords:
+        _worker_filter.set_ad_keywords(ad_keywords)
+    _worker_filter.regex_budget_ms = regex_budget_ms
+    if _worker_filter.scoring_models != scoring_models:
+        _worker_filter.set_scoring_models(scoring_models)
+    # 计划副本中带有主进程尚未取走的记录，只返回本块新产生的
+    plan.take_slow_rules()
+    return _worker_filter._filter_chunk(texts, plan, link_spans), plan.take_slow_rules()
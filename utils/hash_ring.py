@@ -0,0 +1,86 @@
+"""
+一致性哈希环 - 把键（源频道）稳定地分配给节点（监听账号）
+"""
+
+import bisect
+import hashlib
+from typing import Dict, Hashable, Iterable, List, Optional
+
+
+class HashRing:
+    """一致性哈希环
+
+    每个节点在环上放置 replicas 个虚拟节点，键顺时针归属于第一个虚拟节点。
+    增加或移除一个节点时只有落在它的虚拟节点区间内的键改变归属（约 1/N）。
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = 100):
+        self.replicas = max(1, replicas)
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        self._nodes: Dict[str, List[int]] = {}
+
+        for node in nodes:
+            self.add_node(node)
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self._nodes)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __contains__(self, node: str) -> bool:
+        return node in self._nodes
+
+    def add_node(self, node: str) -> bool:
+        """加入节点，已存在时返回 False"""
+        if node in self._nodes:
+            return False
+
+        points = [self._hash(f"{node}#{index}") for index in range(self.replicas)]
+        for point in points:
+            position = bisect.bisect(self._points, point)
+            self._points.insert(position, point)
+            self._owners.insert(position, node)
+        self._nodes[node] = points
+        return True
+
+    def remove_node(self, node: str) -> bool:
+        """移除节点，不存在时返回 False"""
+        if self._nodes.pop(node, None) is None:
+            return False
+
+        kept = [(point, owner) for point, owner in zip(self._points, self._owners) if owner != node]
+        self._points = [point for point, _ in kept]
+        self._owners = [owner for _, owner in kept]
+        return True
+
+    def get_node(self, key: Hashable) -> Optional[str]:
+        """键所属的节点，环为空时返回 None"""
+        if not self._points:
+            return None
+
+        position = bisect.bisect(self._points, self._hash(str(key)))
+        if position == len(self._points):
+            position = 0
+        return self._owners[position]
+
+    def get_nodes(self, key: Hashable) -> List[str]:
+        """键的候选节点: 从所属节点开始顺时针经过的各个不同节点，用于所属节点不可用时依次回退"""
+        if not self._points:
+            return []
+
+        start = bisect.bisect(self._points, self._hash(str(key)))
+        nodes: List[str] = []
+        for offset in range(len(self._points)):
+            owner = self._owners[(start + offset) % len(self._points)]
+            if owner not in nodes:
+                nodes.append(owner)
+                if len(nodes) == len(self._nodes):
+                    break
+        return nodes
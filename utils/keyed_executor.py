@@ -0,0 +1,153 @@
+"""
+按键串行执行器 - 同一个键的任务在同一通道内按提交顺序执行，不同通道并行
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional
+
+
+class _Lane:
+    """一个串行通道"""
+
+    __slots__ = ('items', 'wakeup', 'space', 'busy_since', 'busy_time', 'processed', 'errors', 'high_watermark')
+
+    def __init__(self):
+        self.items: Deque = deque()
+        self.wakeup = asyncio.Event()
+        self.space = asyncio.Event()
+        self.busy_since: Optional[float] = None
+        self.busy_time = 0.0
+        self.processed = 0
+        self.errors = 0
+        self.high_watermark = 0
+
+
+class KeyedExecutor:
+    """按键串行执行器
+
+    键经哈希映射到 lanes 个通道之一，每个通道由一个协程依次 await handler(item)，
+    同一个键的任务因此严格按提交顺序执行，不同通道互不等待。
+    每个通道最多缓存 capacity 项: submit() 在通道满时返回 False，put() 等待空位；
+    通道处理完一项后调用 on_space，供上游重新尝试提交。
+    """
+
+    def __init__(self, handler: Callable[[Any], Awaitable], lanes: int = 4, capacity: int = 16,
+                 on_space: Optional[Callable[[], None]] = None, name: str = 'executor'):
+        self.handler = handler
+        self.lanes = max(1, lanes)
+        self.capacity = max(1, capacity)
+        self.on_space = on_space
+        self.name = name
+        self.logger = logging.getLogger(__name__)
+
+        self._lanes: List[_Lane] = [_Lane() for _ in range(self.lanes)]
+        self._tasks: List[asyncio.Task] = []
+        self._started_at = time.monotonic()
+
+    async def start(self):
+        """启动所有通道"""
+        self._started_at = time.monotonic()
+        self._tasks = [asyncio.create_task(self._run_lane(lane)) for lane in self._lanes]
+
+    async def stop(self):
+        """停止所有通道（未执行的任务丢弃）"""
+        for task in self._tasks:
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        for lane in self._lanes:
+            lane.items.clear()
+
+    def lane_of(self, key: Hashable) -> int:
+        """键所在的通道"""
+        return hash(key) % self.lanes
+
+    def has_space(self, key: Hashable) -> bool:
+        """键所在的通道是否还能提交"""
+        return len(self._lanes[self.lane_of(key)].items) < self.capacity
+
+    def submit(self, key: Hashable, item: Any) -> bool:
+        """提交一项，通道已满时返回 False"""
+        lane = self._lanes[self.lane_of(key)]
+        if len(lane.items) >= self.capacity:
+            return False
+        self._push(lane, item)
+        return True
+
+    async def put(self, key: Hashable, item: Any):
+        """提交一项，通道已满时等待空位"""
+        lane = self._lanes[self.lane_of(key)]
+        while len(lane.items) >= self.capacity:
+            lane.space.clear()
+            await lane.space.wait()
+        self._push(lane, item)
+
+    @staticmethod
+    def _push(lane: _Lane, item: Any):
+        lane.items.append(item)
+        if len(lane.items) > lane.high_watermark:
+            lane.high_watermark = len(lane.items)
+        lane.wakeup.set()
+
+    async def _run_lane(self, lane: _Lane):
+        """通道协程: 依次执行队列中的任务"""
+        while True:
+            if not lane.items:
+                lane.wakeup.clear()
+                await lane.wakeup.wait()
+                continue
+
+            item = lane.items[0]
+            lane.busy_since = time.monotonic()
+            try:
+                await self.handler(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                lane.errors += 1
+                self.logger.error(f"❌ {self.name} 通道任务失败: {e}")
+            finally:
+                lane.busy_time += time.monotonic() - lane.busy_since
+                lane.busy_since = None
+
+            # 执行完才出队，队列长度包含正在执行的一项
+            lane.items.popleft()
+            lane.processed += 1
+            lane.space.set()
+            if self.on_space:
+                self.on_space()
+
+    @property
+    def depth(self) -> int:
+        return sum(len(lane.items) for lane in self._lanes)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """通道占用统计: 各通道的积压、是否正在执行、累计繁忙比例"""
+        now = time.monotonic()
+        uptime = max(now - self._started_at, 1e-9)
+
+        lanes = []
+        for index, lane in enumerate(self._lanes):
+            busy_time = lane.busy_time + (now - lane.busy_since if lane.busy_since is not None else 0.0)
+            lanes.append({
+                'lane': index,
+                'depth': len(lane.items),
+                'busy': lane.busy_since is not None,
+                'utilization': round(busy_time / uptime, 4),
+                'processed': lane.processed,
+                'errors': lane.errors,
+                'high_watermark': lane.high_watermark
+            })
+
+        return {
+            'lanes': self.lanes,
+            'capacity': self.capacity,
+            'depth': sum(lane['depth'] for lane in lanes),
+            'busy_lanes': sum(1 for lane in lanes if lane['busy']),
+            'full_lanes': sum(1 for lane in lanes if lane['depth'] >= self.capacity),
+            'lane_stats': lanes
+        }
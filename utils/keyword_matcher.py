@@ -0,0 +1,91 @@
+"""
+多关键词匹配 - Aho-Corasick 自动机，一次扫描找出文本中出现的全部关键词
+"""
+
+from collections import deque
+from typing import Iterable, List, Set, Dict
+
+
+class KeywordMatcher:
+    """多关键词匹配器
+
+    关键词集合构建一次自动机，之后每次匹配只扫描文本一遍，
+    耗时与关键词数量无关。关键词较少时逐个 `in` 查找（C实现）更快，
+    因此少于 SCAN_THRESHOLD 个关键词时使用逐个查找。
+    """
+
+    SCAN_THRESHOLD = 100
+
+    def __init__(self, keywords: Iterable[str], force_automaton: bool = False):
+        # 去重并保留原有顺序
+        self.keywords: List[str] = list(dict.fromkeys(k for k in keywords if k))
+        self.use_automaton = force_automaton or len(self.keywords) >= self.SCAN_THRESHOLD
+
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[frozenset] = [frozenset()]
+
+        if self.use_automaton:
+            self._build()
+
+    def _build(self):
+        """构建 goto / fail / output 表"""
+        goto, output = self._goto, [set()]
+
+        for keyword in self.keywords:
+            state = 0
+            for ch in keyword:
+                next_state = goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][ch] = next_state
+                    goto.append({})
+                    output.append(set())
+                state = next_state
+            output[state].add(keyword)
+
+        # BFS 计算失败指针（第一层指向根），并把后缀状态的输出合并进来
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in goto[state].items():
+                queue.append(next_state)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[next_state] = goto[f].get(ch, 0)
+                output[next_state] |= output[fail[next_state]]
+
+        self._fail = fail
+        self._output = [frozenset(o) for o in output]
+
+    def find(self, text: str) -> Set[str]:
+        """返回文本中出现的关键词集合"""
+        if not text or not self.keywords:
+            return set()
+
+        if not self.use_automaton:
+            return {keyword for keyword in self.keywords if keyword in text}
+
+        goto, fail, output = self._goto, self._fail, self._output
+        root = goto[0]
+        found = set()
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0) if state else root.get(ch, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+    def count(self, text: str) -> int:
+        """文本中出现的不同关键词数量"""
+        return len(self.find(text))
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+    def __bool__(self) -> bool:
+        return bool(self.keywords)
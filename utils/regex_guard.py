@@ -0,0 +1,268 @@
+"""
+正则安全检查 - 自定义规则的灾难性回溯静态检测与执行时间预算
+"""
+
+import re
+import string
+from typing import Dict, List, Optional, Set, Tuple
+
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+# 自定义正则用 regex 模块编译，执行超时时可以中断
+import regex
+
+
+# 判断字符集重叠时使用的样本字符（再加上模式中出现的字符）
+_SAMPLE_CHARS = frozenset(string.printable + '中文é０　\xa0')
+
+_REPEAT_OPS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+_CHAR_OPS = {sre_constants.LITERAL, sre_constants.NOT_LITERAL, sre_constants.ANY, sre_constants.IN}
+
+# 模式长度上限
+MAX_PATTERN_LENGTH = 1000
+
+# 按无界循环对待的外层重复次数
+LARGE_REPEAT = 10
+
+
+class _Analyzer:
+    """基于 sre 解析树的启发式分析"""
+
+    def __init__(self, pattern: str, parsed):
+        self.universe = frozenset(_SAMPLE_CHARS | set(pattern))
+        self.parsed = parsed
+        self.errors: List[str] = []
+        self.warnings: List[str] = []
+
+    def run(self):
+        self._walk(self.parsed)
+        self._check_adjacent(self.parsed)
+
+    # 字符集
+    def _atom_chars(self, op, av) -> Set[str]:
+        if op == sre_constants.LITERAL:
+            return {chr(av)}
+        if op == sre_constants.NOT_LITERAL:
+            return set(self.universe) - {chr(av)}
+        if op == sre_constants.ANY:
+            return set(self.universe) - {'\n'}
+        if op == sre_constants.IN:
+            return {ch for ch in self.universe if self._in_match(av, ch)}
+        return set()
+
+    @staticmethod
+    def _category_match(category, ch: str) -> bool:
+        name = str(category)
+        if 'DIGIT' in name:
+            result = ch.isdecimal()
+        elif 'SPACE' in name:
+            result = ch.isspace()
+        elif 'WORD' in name:
+            result = ch.isalnum() or ch == '_'
+        elif 'LINEBREAK' in name:
+            result = ch == '\n'
+        else:
+            result = True
+        return not result if 'NOT' in name else result
+
+    def _in_match(self, items, ch: str) -> bool:
+        negate = False
+        matched = False
+        for op, av in items:
+            if op == sre_constants.NEGATE:
+                negate = True
+            elif op == sre_constants.LITERAL:
+                matched |= ord(ch) == av
+            elif op == sre_constants.RANGE:
+                matched |= av[0] <= ord(ch) <= av[1]
+            elif op == sre_constants.CATEGORY:
+                matched |= self._category_match(av, ch)
+            else:
+                matched = True
+        return matched != negate
+
+    def _chars(self, sub) -> Set[str]:
+        """子模式可能消耗的全部字符"""
+        chars: Set[str] = set()
+        for op, av in sub:
+            if op in _CHAR_OPS:
+                chars |= self._atom_chars(op, av)
+            for child in self._children(op, av):
+                chars |= self._chars(child)
+        return chars
+
+    def _first(self, sub) -> Set[str]:
+        """子模式可能匹配的第一个字符"""
+        first: Set[str] = set()
+        for op, av in sub:
+            if op in _CHAR_OPS:
+                return first | self._atom_chars(op, av)
+            if op in (sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+                continue
+            if op == sre_constants.GROUPREF:
+                return set(self.universe)
+            children = self._children(op, av)
+            if not children:
+                continue
+            for child in children:
+                first |= self._first(child)
+            if min(self._min_width(child) for child in children) > 0 and not (op in _REPEAT_OPS and av[0] == 0):
+                return first
+        return first
+
+    @staticmethod
+    def _min_width(sub) -> int:
+        return sub.getwidth()[0]
+
+    def _item_min_width(self, op, av) -> int:
+        return sre_parse.SubPattern(self.parsed.state, [(op, av)]).getwidth()[0]
+
+    @staticmethod
+    def _children(op, av) -> list:
+        """子模式（不进入占有量词和原子组，它们不会回溯）"""
+        if op in _REPEAT_OPS:
+            return [av[2]]
+        if op == sre_constants.SUBPATTERN:
+            return [av[-1]]
+        if op == sre_constants.BRANCH:
+            return list(av[1])
+        if op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            return [av[1]]
+        if op == sre_constants.GROUPREF_EXISTS:
+            return [child for child in av[1:] if child is not None]
+        return []
+
+    @staticmethod
+    def _is_unbounded(op, av) -> bool:
+        return op in _REPEAT_OPS and av[1] == sre_constants.MAXREPEAT
+
+    @staticmethod
+    def _is_large_repeat(op, av) -> bool:
+        """外层循环次数很多时嵌套量词同样会指数级回溯: (.*a){12}"""
+        return op in _REPEAT_OPS and (av[1] == sre_constants.MAXREPEAT or av[1] >= LARGE_REPEAT)
+
+    # 检查
+    def _walk(self, sub):
+        for op, av in sub:
+            if self._is_large_repeat(op, av):
+                self._check_repeat_body(av[2])
+            for child in self._children(op, av):
+                self._walk(child)
+
+    def _top_items(self, body) -> list:
+        """展开只包含一个分组的循环体"""
+        items = list(body)
+        while len(items) == 1 and items[0][0] == sre_constants.SUBPATTERN:
+            items = list(items[0][1][-1])
+        return items
+
+    def _find(self, sub, predicate) -> list:
+        found = []
+        for op, av in sub:
+            if predicate(op, av):
+                found.append((op, av))
+            for child in self._children(op, av):
+                found.extend(self._find(child, predicate))
+        return found
+
+    def _find_branches(self, sub) -> list:
+        """查找全部分支，返回 [(分支参数, 前面是否紧跟非空部分)]"""
+        found = []
+        previous = None
+        for op, av in sub:
+            if op == sre_constants.BRANCH:
+                found.append((av, previous is not None and self._item_min_width(*previous) > 0))
+            for child in self._children(op, av):
+                found.extend(self._find_branches(child))
+            previous = (op, av)
+        return found
+
+    def _check_repeat_body(self, body):
+        items = self._top_items(body)
+
+        # 嵌套无界量词: (a+)+ / (\w+\s?)+ ，除非循环体中有与内层字符集不相交的必需部分分隔
+        for inner_op, inner_av in self._find(body, self._is_unbounded):
+            inner_chars = self._chars(inner_av[2])
+            separators: Set[str] = set()
+            for op, av in items:
+                if (op, av) == (inner_op, inner_av):
+                    continue
+                contains_inner = self._find([(op, av)], lambda o, a: (o, a) == (inner_op, inner_av))
+                if self._item_min_width(op, av) > 0 and not contains_inner:
+                    separators |= self._chars([(op, av)])
+            if not separators or separators & inner_chars:
+                self.errors.append('嵌套的无界量词可能导致灾难性回溯')
+                return
+
+        # 无界循环中的分支可以匹配相同的开头或空串: (a|ab)* / (\w|\d)+
+        for av, factored in self._find_branches(body):
+            alternatives = av[1]
+            if any(self._min_width(alt) == 0 for alt in alternatives):
+                # 解析时公共前缀会被提到分支前面: (a|ab) 变成 a(?:|b)，空分支来自重叠的开头
+                self.errors.append('无界循环中的分支开头可以重叠' if factored else '无界循环中的分支可以匹配空串')
+                return
+            firsts = [self._first(alt) for alt in alternatives]
+            for i in range(len(firsts)):
+                for j in range(i + 1, len(firsts)):
+                    if firsts[i] & firsts[j]:
+                        self.errors.append('无界循环中的分支开头可以重叠')
+                        return
+
+    def _check_adjacent(self, sub):
+        """相邻（中间只有可选部分）的无界量词字符集重叠: .*.* / \\d+\\s*\\d+"""
+        items = list(sub)
+        for i, (op, av) in enumerate(items):
+            if not self._is_unbounded(op, av):
+                continue
+            chars = self._chars(av[2])
+            for next_op, next_av in items[i + 1:]:
+                if self._is_unbounded(next_op, next_av) and chars & self._chars(next_av[2]):
+                    self.warnings.append('相邻的无界量词字符集重叠，匹配失败时耗时可能随长度平方增长')
+                    return
+                if self._item_min_width(next_op, next_av) > 0:
+                    break
+
+        for op, av in items:
+            for child in self._children(op, av):
+                self._check_adjacent(child)
+
+
+def check_regex(pattern: str) -> Dict[str, List[str]]:
+    """静态检查自定义正则，返回 {'errors': [...], 'warnings': [...]}
+
+    errors 表示模式无效或极可能出现灾难性回溯，应拒绝保存；warnings 仅提示。
+    """
+    if len(pattern) > MAX_PATTERN_LENGTH:
+        return {'errors': [f'正则长度超过 {MAX_PATTERN_LENGTH} 个字符'], 'warnings': []}
+
+    try:
+        re.compile(pattern)
+        compile_rule_pattern(pattern)
+        parsed = sre_parse.parse(pattern)
+    except (re.error, regex.error, RecursionError) as e:
+        return {'errors': [f'正则无效: {e}'], 'warnings': []}
+
+    analyzer = _Analyzer(pattern, parsed)
+    try:
+        analyzer.run()
+    except RecursionError:
+        analyzer.errors.append('正则嵌套层级过深')
+
+    return {
+        'errors': list(dict.fromkeys(analyzer.errors)),
+        'warnings': list(dict.fromkeys(analyzer.warnings))
+    }
+
+
+def compile_rule_pattern(pattern: str):
+    """编译自定义规则正则（regex 模块，VERSION0 与 re 语法兼容）"""
+    return regex.compile(pattern, regex.VERSION0)
+
+
+def subn_with_timeout(compiled, replacement: str, text: str, timeout: Optional[float]) -> Tuple[str, int]:
+    """执行替换并返回 (结果, 替换次数)，超过 timeout 秒时中断并抛出 TimeoutError"""
+    return compiled.subn(replacement, text, timeout=timeout)
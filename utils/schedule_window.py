@@ -0,0 +1,92 @@
+"""
+每日调度时间窗口 - 组加载时编译一次，按一天中的秒数判断
+"""
+
+import logging
+from datetime import datetime, time as dt_time, tzinfo
+from typing import Optional
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# 调度窗口所用的时区，与 APScheduler 系统任务一致
+SCHEDULER_TIMEZONE = 'Asia/Shanghai'
+
+
+def resolve_timezone(name: str) -> Optional[tzinfo]:
+    """时区名转为 tzinfo，不可用时返回 None（使用本地时间）"""
+    if ZoneInfo is None:
+        return None
+    try:
+        return ZoneInfo(name)
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"⚠️ 时区 {name} 不可用，使用本地时间: {e}")
+        return None
+
+
+SCHEDULE_TZINFO = resolve_timezone(SCHEDULER_TIMEZONE)
+
+
+class ScheduleWindow:
+    """编译后的每日时间窗口
+
+    start / end 为一天中的秒数，两端都包含（end 所在的那一秒仍在窗口内）；
+    start > end 表示跨天的窗口。
+    """
+
+    __slots__ = ('start', 'end')
+
+    def __init__(self, start: int, end: int):
+        self.start = start % SECONDS_PER_DAY
+        self.end = end % SECONDS_PER_DAY
+
+    @classmethod
+    def parse(cls, start_time: Optional[str], end_time: Optional[str]) -> Optional['ScheduleWindow']:
+        """由 'HH:MM' / 'HH:MM:SS' 编译窗口，未设置调度时返回 None，格式无效时抛出 ValueError"""
+        if not start_time or not end_time:
+            return None
+        return cls(cls._seconds(dt_time.fromisoformat(start_time)), cls._seconds(dt_time.fromisoformat(end_time)))
+
+    @staticmethod
+    def _seconds(value) -> int:
+        return value.hour * 3600 + value.minute * 60 + value.second
+
+    @staticmethod
+    def now() -> datetime:
+        """调度时区的当前时间"""
+        return datetime.now(SCHEDULE_TZINFO)
+
+    @classmethod
+    def second_of_day(cls, moment: Optional[datetime] = None) -> int:
+        """当前（或指定时刻）是调度时区一天中的第几秒"""
+        return cls._seconds(moment or cls.now())
+
+    def contains(self, second: int) -> bool:
+        """该秒是否在窗口内"""
+        if self.start <= self.end:
+            # 同一天的时间段
+            return self.start <= second <= self.end
+        # 跨天的时间段
+        return second >= self.start or second <= self.end
+
+    @property
+    def boundaries(self):
+        """窗口状态发生变化的时刻: 开始的那一秒和结束后的下一秒"""
+        return self.start, (self.end + 1) % SECONDS_PER_DAY
+
+    def seconds_until_change(self, second: int) -> int:
+        """距下一次状态变化的秒数（1 到 86400）"""
+        return min((boundary - second) % SECONDS_PER_DAY or SECONDS_PER_DAY for boundary in self.boundaries)
+
+    def __eq__(self, other):
+        return isinstance(other, ScheduleWindow) and (self.start, self.end) == (other.start, other.end)
+
+    def __hash__(self):
+        return hash((self.start, self.end))
+
+    def __repr__(self):
+        return f"ScheduleWindow({self.start}, {self.end})"
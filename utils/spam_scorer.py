@@ -0,0 +1,145 @@
+"""
+广告/垃圾内容打分 - 固定长度特征向量 + 可配置的线性模型
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+try:
+    # 可选依赖: 批量打分时用矩阵乘法
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# 特征向量的各维（顺序固定）
+FEATURE_NAMES = (
+    # 原始特征
+    'ad_keywords',          # 广告关键词出现次数
+    'ad_phrases',           # 典型广告短语出现次数
+    'has_contact',          # 是否包含电话/QQ/微信号
+    'length',               # 字符数
+    'unique_ratio',         # 不同字符数 / 字符数
+    'punctuation_ratio',    # 感叹号和问号数 / 字符数
+    'upper_ratio',          # 英文字母中大写的比例
+    'english_letters',      # 英文字母数
+    # 规则特征（取值 0/1，对应原启发式规则的阈值）
+    'rule_ad_keywords',     # 广告关键词 >= 2
+    'rule_contact_keyword', # 有联系方式且有广告关键词
+    'rule_ad_phrases',      # 广告短语 >= 2
+    'rule_repetitive',      # 字符重复率高（不同字符 < 30% 且长度 > 10）
+    'rule_punctuation',     # 感叹号和问号超过 20%
+    'rule_uppercase',       # 英文字母 > 10 且大写超过 80%
+)
+
+FEATURE_INDEX = {name: index for index, name in enumerate(FEATURE_NAMES)}
+
+# 默认模型: 任一规则特征成立即判定（得分 > 0），与原启发式规则一致
+DEFAULT_MODELS = {
+    'ad': {
+        'weights': {'rule_ad_keywords': 1.0, 'rule_contact_keyword': 1.0, 'rule_ad_phrases': 1.0},
+        'bias': -0.5
+    },
+    'spam': {
+        'weights': {'rule_repetitive': 1.0, 'rule_punctuation': 1.0, 'rule_uppercase': 1.0},
+        'bias': -0.5
+    }
+}
+
+# 少于这个数量的批量用纯 Python 计算（numpy 的转换开销更大）
+NUMPY_MIN_BATCH = 64
+
+
+def build_features(ad_count: int, phrase_count: int, has_contact: bool, length: int, unique_chars: int,
+                   punctuation: int, english_letters: int, upper_letters: int) -> List[float]:
+    """由计数构造特征向量"""
+    unique_ratio = unique_chars / length if length else 0.0
+    upper_ratio = upper_letters / english_letters if english_letters else 0.0
+
+    return [
+        float(ad_count),
+        float(phrase_count),
+        float(has_contact),
+        float(length),
+        unique_ratio,
+        punctuation / length if length else 0.0,
+        upper_ratio,
+        float(english_letters),
+        float(ad_count >= 2),
+        float(has_contact and ad_count > 0),
+        float(phrase_count >= 2),
+        float(unique_ratio < 0.3 and length > 10),
+        float(punctuation > length * 0.2),
+        float(english_letters > 10 and upper_ratio > 0.8),
+    ]
+
+
+class LinearScorer:
+    """多输出线性模型: 得分 = 特征 · 权重 + 偏置，得分 > 0 判定为真
+
+    models 形如 {'ad': {'weights': {特征名: 权重}, 'bias': 偏置}}，
+    未配置的输出使用 DEFAULT_MODELS，配置的权重覆盖默认值中的同名项。
+    """
+
+    def __init__(self, models: Optional[Dict] = None):
+        models = models or {}
+        self.names: List[str] = []
+        self.weights: List[List[float]] = []
+        self.bias: List[float] = []
+
+        for name in dict.fromkeys(list(DEFAULT_MODELS) + list(models)):
+            default = DEFAULT_MODELS.get(name, {'weights': {}, 'bias': 0.0})
+            custom = models.get(name) or {}
+            weights = dict(default['weights'])
+            weights.update(custom.get('weights') or {})
+
+            unknown = set(weights) - set(FEATURE_INDEX)
+            if unknown:
+                raise ValueError(f"未知特征: {sorted(unknown)}")
+
+            self.names.append(name)
+            self.weights.append([float(weights.get(feature, 0.0)) for feature in FEATURE_NAMES])
+            self.bias.append(float(custom.get('bias', default['bias'])))
+
+        # 单条打分只遍历非零权重
+        self._sparse = [
+            [(index, weight) for index, weight in enumerate(row) if weight]
+            for row in self.weights
+        ]
+        self._used = {index for sparse in self._sparse for index, _ in sparse}
+        self._matrix = numpy.array(self.weights).T if numpy is not None else None
+        self._bias_vector = numpy.array(self.bias) if numpy is not None else None
+
+    def index_of(self, name: str) -> int:
+        return self.names.index(name)
+
+    def uses(self, feature: str) -> bool:
+        """是否有模型用到该特征（未用到的特征可以不计算）"""
+        return FEATURE_INDEX[feature] in self._used
+
+    def score(self, features: Sequence[float]) -> List[float]:
+        """单条打分，返回每个输出的得分"""
+        scores = []
+        for sparse, bias in zip(self._sparse, self.bias):
+            score = bias
+            for index, weight in sparse:
+                score += features[index] * weight
+            scores.append(score)
+        return scores
+
+    def score_batch(self, rows: Sequence[Sequence[float]]) -> List[List[float]]:
+        """批量打分，安装 numpy 且数量较多时一次矩阵乘法完成"""
+        if self._matrix is None or len(rows) < NUMPY_MIN_BATCH:
+            return [self.score(row) for row in rows]
+        scores = numpy.asarray(rows, dtype=float) @ self._matrix + self._bias_vector
+        return scores.tolist()
+
+    def get_config(self) -> Dict[str, Dict]:
+        """当前模型配置（只列出非零权重）"""
+        return {
+            name: {
+                'weights': {FEATURE_NAMES[index]: weight for index, weight in sparse},
+                'bias': bias
+            }
+            for name, sparse, bias in zip(self.names, self._sparse, self.bias)
+        }
+
@@ -21,6 +21,9 @@ from config.database import Database
 from web.auth import AuthManager
 from utils.logger import get_recent_logs, get_log_stats, filter_logs_by_level
 
+# 测试过滤器接口中单条正则的最长执行时间（毫秒）
+TEST_FILTER_REGEX_BUDGET_MS = 200
+
 
 class WebApp:
     """Web应用管理器"""
@@ -687,27 +690,81 @@ class WebApp:
                 text = data['text']
                 filters = data['filters']
                 
+                # 先静态检查自定义正则，不安全的模式不执行
+                from utils.regex_guard import check_regex
+                regex_issues = {
+                    rule['pattern']: check_regex(rule['pattern'])
+                    for rule in filters.get('custom_rules') or []
+                    if isinstance(rule, dict) and rule.get('type') == 'regex' and rule.get('pattern')
+                }
+                if any(issues['errors'] for issues in regex_issues.values()):
+                    return jsonify({'error': '自定义正则不安全', 'regex_issues': regex_issues}), 400
+                
                 # 使用MessageFilter测试
                 from utils.filters import MessageFilter
                 message_filter = MessageFilter(self.settings)
+                # 正则在 Web 工作线程中同步执行，始终限制单条正则的耗时（超时中断）
+                if not 0 < message_filter.regex_budget_ms <= TEST_FILTER_REGEX_BUDGET_MS:
+                    message_filter.regex_budget_ms = TEST_FILTER_REGEX_BUDGET_MS
                 
                 # 更新关键词
                 if 'ad_keywords' in filters:
                     message_filter.update_ad_keywords(filters['ad_keywords'])
                 
                 # 应用过滤器
-                filtered_text = message_filter.filter_text(text, filters)
+                plan = message_filter.compile_plan(filters)
+                filtered_text = message_filter.apply_plan(text, plan)
                 
                 return jsonify({
                     'original': text,
                     'filtered': filtered_text,
                     'removed_count': len(text) - len(filtered_text),
-                    'stats': message_filter.get_filter_stats(text)
+                    'stats': message_filter.get_filter_stats(text),
+                    'scores': message_filter.score_text(text),
+                    'regex_issues': regex_issues,
+                    'slow_rules': {pattern: elapsed_ms for pattern, (elapsed_ms, _) in plan.take_slow_rules().items()}
                 })
                 
             except Exception as e:
                 return jsonify({'error': str(e)}), 500
 
+        @self.app.route('/api/filters/disabled-rules')
+        def api_disabled_filter_rules():
+            """获取因超时或静态检查而停用的自定义规则"""
+            if not self._is_authenticated():
+                return jsonify({'error': 'Unauthorized'}), 401
+            
+            try:
+                from core.manager import ForwarderManager
+                
+                if ForwarderManager.instance:
+                    rules = asyncio.run(ForwarderManager.instance.get_disabled_filter_rules())
+                    return jsonify(rules)
+                else:
+                    return jsonify({'error': 'System not initialized'}), 500
+                    
+            except Exception as e:
+                return jsonify({'error': str(e)}), 500
+
+        @self.app.route('/api/filters/profile')
+        def api_filter_profile():
+            """获取过滤阶段和自定义规则的采样性能统计"""
+            if not self._is_authenticated():
+                return jsonify({'error': 'Unauthorized'}), 401
+            
+            try:
+                group_id = request.args.get('group_id', type=int)
+                from core.manager import ForwarderManager
+                
+                if ForwarderManager.instance:
+                    profile = asyncio.run(ForwarderManager.instance.get_filter_profile(group_id))
+                    return jsonify(profile)
+                else:
+                    return jsonify({'error': 'System not initialized'}), 500
+                    
+            except Exception as e:
+                return jsonify({'error': str(e)}), 500
+
         # 系统信息API
         @self.app.route('/api/system-info')
         def api_system_info():